@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /proc/net connection counter against synthetic fixtures
+
+Usage: python benchmarks/connstats.py [rows ...]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+# Add the src directory to the path so we can import the package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from muninn.monitors.connstats import count_proc_net, count_netlink  # noqa: E402
+
+HEADER = (
+    "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt"
+    "   uid  timeout inode\n"
+)
+STATES = ["01"] * 70 + ["06"] * 20 + ["08"] * 5 + ["0A"] * 5
+
+def write_fixture(path, rows):
+    """Write a /proc/net/tcp style file with the given number of rows."""
+    rng = random.Random(rows)
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for i in range(rows):
+            f.write(
+                f"{i:4d}: {rng.getrandbits(32):08X}:{rng.getrandbits(16):04X} "
+                f"{rng.getrandbits(32):08X}:{rng.getrandbits(16):04X} {rng.choice(STATES)} "
+                f"00000000:00000000 00:00000000 00000000  1000        0 {rng.getrandbits(24)} "
+                f"1 0000000000000000 20 4 30 10 -1\n"
+            )
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            path = os.path.join(directory, f"tcp-{rows}")
+            write_fixture(path, rows)
+            size_mb = os.path.getsize(path) / (1024 ** 2)
+
+            start = time.perf_counter()
+            counts = count_proc_net([(path, "TCP")])
+            elapsed = time.perf_counter() - start
+
+            total = sum(counts["TCP"].values())
+            assert total == rows, f"counted {total} of {rows} rows"
+            print(f"/proc/net fixture: {rows:>9,} rows ({size_mb:7.1f} MB) in {elapsed * 1000:8.1f} ms")
+
+    try:
+        start = time.perf_counter()
+        counts = count_netlink()
+        elapsed = time.perf_counter() - start
+        total = sum(sum(statuses.values()) for statuses in counts.values())
+        print(f"netlink (this host): {total:>7,} sockets in {elapsed * 1000:8.1f} ms")
+    except OSError as e:
+        print(f"netlink (this host): unavailable ({e})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+List containers through DockerMonitor against a fake Docker socket
+
+Usage: python benchmarks/docker_socket.py [containers] [listings]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import socketserver
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+
+# Add the src directory to the path so we can import the package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from muninn.monitors.docker import DockerMonitor, get_docker_info  # noqa: E402
+from muninn.monitors.snapshots import Docker  # noqa: E402
+
+def fake_containers(count):
+    """Build /containers/json entries spread over a few images."""
+    return [
+        {
+            "Id": f"{i:064x}", "Names": [f"/service-{i}"], "Image": f"sha256:{i % 5:064x}",
+            "ImageID": f"sha256:{i % 5:064x}", "State": "running", "Status": "Up 2 hours (healthy)",
+            "Created": 1700000000 + i, "Ports": [{"PrivatePort": 80, "PublicPort": 8000 + i, "Type": "tcp"}],
+        }
+        for i in range(count)
+    ]
+
+def fake_images():
+    return [{"Id": f"sha256:{i:064x}", "RepoTags": [f"registry.example.com/app{i}:1.0"]} for i in range(5)]
+
+class FakeDocker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Just enough of the Engine API for DockerMonitor, counting every call."""
+
+    daemon_threads = True
+
+    def __init__(self, path, containers):
+        self.containers = containers
+        self.calls = Counter()
+        self.connections = 0
+        super().__init__(path, Handler)
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        # Strip the API version prefix, e.g. /v1.43/containers/json
+        if path.startswith("/v1."):
+            path = "/" + path.split("/", 2)[2]
+        self.server.calls[path] += 1
+        if path == "/version":
+            body = {"ApiVersion": "1.43", "Version": "24.0.0"}
+        elif path == "/images/json":
+            body = fake_images()
+        elif path == "/containers/json":
+            body = self.server.containers
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    listings = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "docker.sock")
+        server = FakeDocker(path, fake_containers(count))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        monitor = DockerMonitor(base_url=f"unix://{path}")
+        started = time.perf_counter()
+        for _ in range(listings):
+            docker = get_docker_info(monitor)
+        elapsed = time.perf_counter() - started
+        monitor.close()
+        server.shutdown()
+
+    assert isinstance(docker, Docker), docker
+    assert len(docker.containers) == count, f"listed {len(docker.containers)} of {count} containers"
+    assert docker.containers[0].image.startswith("registry.example.com/"), docker.containers[0].image
+    print(f"containers per listing:  {count}")
+    print(f"listings:                {listings} ({elapsed / listings * 1000:.1f} ms each)")
+    print(f"API calls:               {dict(server.calls)}")
+    print(f"connections opened:      {server.connections}")
+    # One version probe, one image map load and one list call per listing
+    assert server.calls["/version"] == 1, server.calls
+    assert server.calls["/images/json"] == 1, server.calls
+    assert server.calls["/containers/json"] == listings, server.calls
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Run an aggregator and many simulated agents on localhost
+
+Usage: python benchmarks/fleet.py [agents] [seconds] [interval]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import resource
+
+# Add the src directory to the path so we can import the package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from muninn.fleet.agent import Agent  # noqa: E402
+from muninn.fleet.aggregator import FleetServer  # noqa: E402
+from muninn.monitors.cgroups import ContainerUsage  # noqa: E402
+from muninn.monitors.snapshots import (  # noqa: E402
+    Container, Disk, Docker, Interface, Load, Network, Partition, ListeningPort,
+)
+from muninn.render.data import to_data  # noqa: E402
+
+PORT = 17077
+TOKEN = "benchmark"
+
+def fake_snapshots(rng, containers):
+    """Build plausible snapshot data with a little noise, like a real host."""
+    load = Load(
+        rng.uniform(0, 4), rng.uniform(0, 4), rng.uniform(0, 4), 8, round(rng.uniform(0, 100), 1),
+        round(rng.uniform(0, 100), 1), [["1m", [1.0, 5.0, 9.0]]], 4 * 2 ** 30, 16 * 2 ** 30, 25.0,
+        [20.0, 25.0, 30.0], [],
+    )
+    disk = Disk(
+        [Partition(f"/mnt/data{i}", 2 ** 40, 2 ** 39 + i, 2 ** 39 - i, 50.0, None, False, None) for i in range(4)],
+        2 ** 35 + rng.randrange(2 ** 20), 2 ** 34 + rng.randrange(2 ** 20), 1024.0, 2048.0, None,
+    )
+    docker = Docker([
+        Container(
+            f"{i:064x}", f"service-{i}", "registry.example.com/app:1.2.3", "running (healthy)",
+            ContainerUsage(f"{i:064x}", round(rng.uniform(0, 50), 1), 2 ** 28 + rng.randrange(2 ** 20),
+                           2 ** 30, 0, None, None),
+            [f"0.0.0.0:{8000 + i}->80/tcp"],
+        )
+        for i in range(containers)
+    ], None)
+    network = Network(
+        "203.0.113.7",
+        [Interface("eth0", True, 10000, [["IPv4", "10.0.0.2"]], 2 ** 33 + rng.randrange(2 ** 24),
+                   2 ** 34 + rng.randrange(2 ** 24), None, None, None, None)],
+        [ListeningPort("0.0.0.0", 22, "TCP", "ssh", "sshd", None, "/usr/sbin/sshd -D")],
+        {"TCP": {"ESTABLISHED": rng.randrange(100), "LISTEN": 5}},
+    )
+    return {name: to_data(value) for name, value in
+            (("load", load), ("disk", disk), ("docker", docker), ("network", network))}
+
+async def measure_lag(samples, stop):
+    """Record how late the event loop wakes up, a proxy for how busy it is."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.05)
+        samples.append(time.perf_counter() - started - 0.05)
+
+async def main():
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    server = FleetServer(port=PORT, address="127.0.0.1", token=TOKEN)
+    await server.start()
+
+    latest = {}
+    pool = []
+    for i in range(agents):
+        rng = random.Random(i)
+        name = f"host{i:04d}"
+
+        async def collect(name=name, rng=rng):
+            latest[name] = fake_snapshots(rng, containers=10)
+            return latest[name]
+
+        agent = Agent(collect, name=name, server=f"127.0.0.1:{PORT}", token=TOKEN, interval=interval)
+        pool.append(agent)
+
+    lag = []
+    stop = asyncio.Event()
+    lag_task = asyncio.ensure_future(measure_lag(lag, stop))
+    tasks = [asyncio.ensure_future(agent.run()) for agent in pool]
+    await asyncio.sleep(seconds)
+    summary_started = time.perf_counter()
+    fleet = server.summary(0, 40)
+    summary_time = time.perf_counter() - summary_started
+    stop.set()
+    for task in tasks + [lag_task]:
+        task.cancel()
+    await asyncio.gather(*tasks, lag_task, return_exceptions=True)
+
+    pushes = sum(agent.stats["pushes"] for agent in pool)
+    full = sum(agent.stats["full"] for agent in pool)
+    sent = sum(agent.stats["bytes_sent"] for agent in pool)
+    connected = sum(1 for host in server.hosts.values() if host.data is not None)
+    mismatched = sum(
+        1 for name, host in server.hosts.items()
+        if host.data is not None and host.data != latest[name] and host.seq is not None
+    )
+    raw = len(str(latest["host0000"]))
+    lag.sort()
+
+    print(f"agents connected:        {connected}/{agents}")
+    print(f"pushes:                  {pushes} ({pushes / seconds:.0f}/s, {full} full)")
+    print(f"resyncs:                 {server.stats['resyncs']}")
+    print(f"bytes per push:          {sent / max(pushes, 1):.0f} (snapshot ~{raw} bytes uncompressed)")
+    print(f"hosts out of date:       {mismatched}")
+    # The simulated agents share the loop, so this overstates the aggregator's own load
+    if lag:
+        print(f"event loop lag p50/p99:  {lag[len(lag) // 2] * 1000:.1f} / {lag[int(len(lag) * 0.99)] * 1000:.1f} ms")
+    print(f"/report all page:        {summary_time * 1000:.1f} ms "
+          f"({fleet.online} of {fleet.total} online)")
+    await server.stop()
+
+if __name__ == "__main__":
+    # Two sockets per agent on localhost
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, 65536), hard))
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Post recorded updates to the webhook listener, backed by a fake Bot API
+
+Usage: python benchmarks/webhook.py [updates] [handler seconds]
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+
+# Add the src directory to the path so we can import the package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from telegram.ext import ApplicationBuilder, CommandHandler  # noqa: E402
+
+from muninn.utils.http import read_request, write_response  # noqa: E402
+from muninn.utils.webhook import WebhookServer, run_application  # noqa: E402
+
+API_PORT = 18081
+WEBHOOK_PORT = 18443
+SECRET = "benchmark-secret"
+
+# A /ping command as Telegram delivers it
+RECORDED_UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1, "date": 1700000000, "text": "/ping",
+        "chat": {"id": 7, "type": "private"},
+        "from": {"id": 7, "is_bot": False, "first_name": "Admin"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": 5}],
+    },
+}
+
+class FakeBotAPI:
+    """Answer the Bot API methods the bot calls, counting them."""
+
+    def __init__(self, accept_webhook=True):
+        self.accept_webhook = accept_webhook
+        self.calls = {}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader, 1024 * 1024)
+                if request is None:
+                    break
+                method = request.path.rsplit("/", 1)[-1]
+                self.calls[method] = self.calls.get(method, 0) + 1
+                status, reply = "200 OK", {"ok": True, "result": True}
+                if method == "getMe":
+                    reply["result"] = {"id": 1, "is_bot": True, "first_name": "Muninn", "username": "muninn_bot"}
+                elif method == "setWebhook" and not self.accept_webhook:
+                    status = "400 Bad Request"
+                    reply = {"ok": False, "error_code": 400, "description": "Bad Request: bad webhook"}
+                elif method == "getUpdates":
+                    await asyncio.sleep(0.2)
+                    reply["result"] = []
+                elif method == "sendMessage":
+                    reply["result"] = {
+                        "message_id": 2, "date": 1700000000, "text": "pong", "chat": {"id": 7, "type": "private"},
+                    }
+                await write_response(
+                    writer, status, json.dumps(reply), "application/json", keep_alive=request.keep_alive()
+                )
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def post(update, secret):
+    """POST an update to the webhook and return the status code."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", WEBHOOK_PORT)
+    body = json.dumps(update).encode()
+    writer.write(
+        f"POST /telegram HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+def build_application(handled, delay):
+    async def ping(update, context):
+        # Stands in for a command that waits on a collector
+        await asyncio.sleep(delay)
+        handled.append(update.update_id)
+        await update.message.reply_text("pong")
+
+    application = (
+        ApplicationBuilder().token("1:benchmark").base_url(f"http://127.0.0.1:{API_PORT}/bot")
+        .concurrent_updates(32).build()
+    )
+    application.add_handler(CommandHandler("ping", ping))
+    return application
+
+async def run(api, count, delay):
+    handled = []
+    application = build_application(handled, delay)
+    server = WebhookServer(
+        application, url="https://bot.example.com/telegram", port=WEBHOOK_PORT, secret=SECRET
+    )
+    runner = asyncio.ensure_future(run_application(application, server))
+    await asyncio.sleep(0.5)
+
+    results = {}
+    if server.server is not None:
+        results["right secret"] = await post(RECORDED_UPDATE, SECRET)
+        results["wrong secret"] = await post(RECORDED_UPDATE, "wrong")
+        await asyncio.sleep(delay + 0.2)
+        results["queued"] = server.stats["updates"]
+
+        handled.clear()
+        started = time.perf_counter()
+        statuses = await asyncio.gather(
+            *(post(dict(RECORDED_UPDATE, update_id=100 + i), SECRET) for i in range(count))
+        )
+        acknowledged = time.perf_counter() - started
+        while len(handled) < count and time.perf_counter() - started < 30:
+            await asyncio.sleep(0.01)
+        results["burst"] = (statuses.count(200), acknowledged, time.perf_counter() - started, len(handled))
+
+    os.kill(os.getpid(), signal.SIGTERM)
+    await runner
+    return results
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    api = FakeBotAPI()
+    api_server = await asyncio.start_server(api.handle, "127.0.0.1", API_PORT)
+    results = await run(api, count, delay)
+    ok, acknowledged, elapsed, handled = results["burst"]
+    print(f"recorded update, right secret:  HTTP {results['right secret']}")
+    print(f"recorded update, wrong secret:  HTTP {results['wrong secret']}")
+    print(f"updates queued:                 {results['queued']}")
+    print(f"burst of {count} updates:          {ok} acknowledged in {acknowledged * 1000:.0f} ms, "
+          f"{handled} handled in {elapsed:.2f}s ({delay}s per handler)")
+    assert (results["right secret"], results["wrong secret"], results["queued"]) == (200, 403, 1)
+
+    # Telegram refusing the webhook makes the bot poll on the same loop
+    api.accept_webhook = False
+    api.calls.clear()
+    await run(api, count, delay)
+    print(f"setWebhook refused:             polled {api.calls.get('getUpdates', 0)} times instead")
+    assert api.calls.get("getUpdates", 0) > 0
+    api_server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
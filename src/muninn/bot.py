@@ -4,14 +4,26 @@ Muninn - A lightweight Telegram bot for server monitoring
 """
 
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
-from telegram.ext import ApplicationBuilder, CommandHandler
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler
 
 from muninn.monitors.all import Monitors
+from muninn.utils.alerts import container_alert_listener
+from muninn.utils.delivery import DeliveryQueue
+from muninn.utils.exporter import MetricsExporter, METRICS_PORT
+from muninn.fleet.agent import run_agent
+from muninn.fleet.aggregator import FleetServer
+from muninn.utils.reporting import ReportBuilder, send_report
+from muninn.utils.scheduler import Scheduler
+from muninn.utils.watch import Watcher
+from muninn.utils.config import env_int
+from muninn.utils.webhook import WEBHOOK_URL, WebhookServer, run_application
 from muninn.handlers.commands import (
     start, status_command, docker_command, load_command,
-    disk_command, network_command, report_command, schedule_command, help_command
+    disk_command, network_command, report_command, history_command, du_command,
+    refresh_command, schedule_command, watch_command, watch_button, help_command
 )
 
 # Configure logging
@@ -26,43 +38,119 @@ load_dotenv()
 
 # Get token from environment variable
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-if not TOKEN:
-    raise ValueError("No token provided. Set the TELEGRAM_BOT_TOKEN environment variable.")
 
-def create_handler_with_monitors(handler_func):
+# Bot API endpoint, e.g. a local Bot API server or a fake one for testing
+BASE_URL = os.getenv("TELEGRAM_BASE_URL")
+
+# "bot" monitors this server, "aggregator" also answers for connected
+# agents, and "agent" only pushes this server's snapshots to an aggregator
+MUNINN_MODE = os.getenv("MUNINN_MODE", "bot").strip().lower()
+
+# Updates processed at the same time, so one slow command does not hold up others
+CONCURRENT_UPDATES = env_int("CONCURRENT_UPDATES", 32)
+
+def create_handler_with_monitors(handler_func, monitors):
     """Create a handler function that includes the monitors instance."""
-    monitors = Monitors()
-    
     async def wrapper(update, context):
         return await handler_func(update, context, monitors)
     
     return wrapper
 
 def main():
-    """Start the bot."""
+    """Start the bot, or the agent in agent mode."""
+    if MUNINN_MODE == "agent":
+        logger.info("Agent starting. Press Ctrl+C to stop.")
+        try:
+            asyncio.run(run_agent())
+        except KeyboardInterrupt:
+            pass
+        return
+    if MUNINN_MODE not in ("bot", "aggregator"):
+        raise ValueError(f"Unknown MUNINN_MODE {MUNINN_MODE!r}. Use 'bot', 'aggregator' or 'agent'.")
+    if not TOKEN:
+        raise ValueError("No token provided. Set the TELEGRAM_BOT_TOKEN environment variable.")
+    
+    # One monitors instance shared by every handler
+    monitors = Monitors()
+    scheduler = Scheduler()
+    reports = ReportBuilder(monitors)
+    watcher = Watcher(monitors)
+    exporter = MetricsExporter(monitors) if METRICS_PORT else None
+    fleet = FleetServer() if MUNINN_MODE == "aggregator" else None
+    delivery = None
+
+    async def run_scheduled_report(subscription):
+        await send_report(reports, delivery, subscription.chat_id)
+
+    async def post_init(application):
+        nonlocal delivery
+        delivery = DeliveryQueue(application.bot)
+        delivery.start()
+        monitors.docker.add_listener(
+            container_alert_listener(delivery, asyncio.get_running_loop())
+        )
+        monitors.start()
+        application.bot_data["scheduler"] = scheduler
+        scheduler.start(run_scheduled_report)
+        application.bot_data["watcher"] = watcher
+        watcher.start(application.bot)
+        if exporter is not None:
+            exporter.delivery = delivery
+            await exporter.start()
+        if fleet is not None:
+            application.bot_data["fleet"] = fleet
+            await fleet.start()
+
+    async def post_shutdown(application):
+        if fleet is not None:
+            await fleet.stop()
+        if exporter is not None:
+            await exporter.stop()
+        await scheduler.stop()
+        await watcher.stop()
+        if delivery is not None:
+            await delivery.stop()
+        monitors.close()
+
     # Create the application and pass it your bot's token
-    application = ApplicationBuilder().token(TOKEN).build()
+    builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(max(1, CONCURRENT_UPDATES))
+    )
+    if BASE_URL:
+        builder = builder.base_url(BASE_URL)
+    application = builder.build()
 
     # Create handler functions with monitors included
     handlers = {
-        "start": create_handler_with_monitors(start),
-        "status": create_handler_with_monitors(status_command),
-        "docker": create_handler_with_monitors(docker_command),
-        "load": create_handler_with_monitors(load_command),
-        "disk": create_handler_with_monitors(disk_command),
-        "network": create_handler_with_monitors(network_command),
-        "report": create_handler_with_monitors(report_command),
-        "schedule": create_handler_with_monitors(schedule_command),
-        "help": create_handler_with_monitors(help_command),
+        "start": start,
+        "status": status_command,
+        "docker": docker_command,
+        "load": load_command,
+        "disk": disk_command,
+        "network": network_command,
+        "report": report_command,
+        "history": history_command,
+        "du": du_command,
+        "refresh": refresh_command,
+        "schedule": schedule_command,
+        "watch": watch_command,
+        "help": help_command,
     }
 
     # Register command handlers
     for command, handler in handlers.items():
-        application.add_handler(CommandHandler(command, handler))
+        application.add_handler(
+            CommandHandler(command, create_handler_with_monitors(handler, monitors))
+        )
+    application.add_handler(CallbackQueryHandler(watch_button, pattern=r"^watch:"))
 
     # Start the Bot
     logger.info("Bot starting. Press Ctrl+C to stop.")
-    application.run_polling()
+    asyncio.run(run_application(application, WebhookServer(application) if WEBHOOK_URL else None))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Agent and aggregator modes for monitoring several servers from one bot
+"""
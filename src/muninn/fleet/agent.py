@@ -0,0 +1,151 @@
+"""
+Agent mode: run the monitors and push their snapshots to an aggregator
+"""
+
+import os
+import socket
+import random
+import asyncio
+import logging
+
+from muninn.monitors.all import Monitors
+from muninn.fleet.protocol import (
+    FLEET_PORT, PROTOCOL_VERSION, Connection, ProtocolError, client_ssl_context, diff
+)
+from muninn.render.data import to_data
+from muninn.utils.config import env_int, env_float
+
+logger = logging.getLogger(__name__)
+
+# Aggregator to push to, as host:port
+FLEET_SERVER = os.getenv("FLEET_SERVER", "")
+# Shared secret agents present to the aggregator
+FLEET_TOKEN = os.getenv("FLEET_TOKEN", "")
+# Name this server is shown under
+AGENT_NAME = os.getenv("AGENT_NAME", "") or socket.gethostname()
+# Seconds between two pushes
+AGENT_INTERVAL = env_float("AGENT_INTERVAL", 15.0)
+# Pushes between two full snapshots; deltas are sent in between
+AGENT_FULL_EVERY = env_int("AGENT_FULL_EVERY", 40)
+# Collectors whose snapshots are pushed
+AGENT_COLLECTORS = ("load", "disk", "docker", "network")
+# Longest wait between two connection attempts
+AGENT_MAX_BACKOFF = 60.0
+
+def parse_address(address, default_port):
+    """Split 'host:port' (or '[v6]:port'), using the default port when none is given."""
+    host, sep, port = address.rpartition(":")
+    if not sep or "]" in port:
+        return address.strip("[]"), default_port
+    return host.strip("[]"), int(port)
+
+class Agent:
+    """Push snapshots to the aggregator over one persistent connection.
+
+    ``collect`` is a coroutine function returning the snapshot data by
+    collector name. The first push of every connection, every
+    ``full_every``-th push and any push after a ``resync`` request carry
+    the full snapshot; the others only what changed since the last push.
+    The agent reconnects with exponential backoff.
+    """
+
+    def __init__(self, collect, name=AGENT_NAME, server=FLEET_SERVER, token=FLEET_TOKEN,
+                 interval=AGENT_INTERVAL, full_every=AGENT_FULL_EVERY, ssl_context=None):
+        self.collect = collect
+        self.name = name
+        self.host, self.port = parse_address(server, FLEET_PORT)
+        self.token = token
+        # Connects with TLS when FLEET_CA is set unless a context is given
+        self.ssl_context = ssl_context if ssl_context is not None else client_ssl_context()
+        self.interval = interval
+        self.full_every = max(1, full_every)
+        self.connected = asyncio.Event()
+        self.stats = {"pushes": 0, "full": 0, "bytes_sent": 0, "connects": 0}
+
+    async def run(self):
+        """Keep a session with the aggregator open until cancelled."""
+        backoff = 1.0
+        while True:
+            try:
+                await self._session()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except (OSError, EOFError, ProtocolError) as e:
+                logger.warning(f"Connection to aggregator {self.host}:{self.port} lost: {e}")
+            except Exception as e:
+                logger.error(f"Error pushing to aggregator: {e}")
+            self.connected.clear()
+            # Jitter so agents of a restarted aggregator do not reconnect in lockstep
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, AGENT_MAX_BACKOFF)
+
+    async def _session(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl_context)
+        connection = Connection(reader, writer)
+        listener = None
+        try:
+            await connection.send({
+                "type": "hello", "version": PROTOCOL_VERSION, "host": self.name,
+                "token": self.token, "interval": self.interval,
+            })
+            reply = await asyncio.wait_for(connection.receive(), 30)
+            if reply.get("type") != "welcome":
+                raise ProtocolError(f"Rejected by the aggregator: {reply.get('error', reply.get('type'))}")
+            self.stats["connects"] += 1
+            self.connected.set()
+            logger.info(f"Connected to aggregator {self.host}:{self.port} as {self.name}")
+
+            resync = asyncio.Event()
+            listener = asyncio.ensure_future(self._listen(connection, resync))
+            previous = None
+            seq = 0
+            while True:
+                data = await self.collect()
+                if previous is None or resync.is_set() or seq % self.full_every == 0:
+                    resync.clear()
+                    await connection.send({"type": "full", "seq": seq, "data": data})
+                    self.stats["full"] += 1
+                else:
+                    # An empty delta still tells the aggregator the agent is alive
+                    patch = diff(previous, data) if data != previous else {}
+                    await connection.send({"type": "delta", "seq": seq, "data": patch})
+                previous = data
+                seq += 1
+                self.stats["pushes"] += 1
+                self.stats["bytes_sent"] = connection.bytes_sent
+                # Wake up early when the aggregator asks for a full snapshot
+                waiter = asyncio.ensure_future(resync.wait())
+                done, _ = await asyncio.wait(
+                    [listener, waiter], timeout=self.interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                waiter.cancel()
+                if listener in done:
+                    listener.result()
+                    raise EOFError("Aggregator closed the connection")
+        finally:
+            if listener is not None:
+                listener.cancel()
+            await connection.close()
+
+    async def _listen(self, connection, resync):
+        while True:
+            message = await connection.receive()
+            if message.get("type") == "resync":
+                resync.set()
+
+async def run_agent():
+    """Run the monitors and push their snapshots until cancelled."""
+    if not FLEET_SERVER:
+        raise ValueError("No aggregator configured. Set FLEET_SERVER to host:port.")
+    monitors = Monitors()
+    monitors.start()
+
+    async def collect():
+        results = await monitors.collect_many(*AGENT_COLLECTORS)
+        return {name: to_data(result) for name, result in results.items()}
+
+    try:
+        await Agent(collect).run()
+    finally:
+        monitors.close()
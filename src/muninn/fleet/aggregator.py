@@ -0,0 +1,232 @@
+"""
+Aggregator mode: keep the latest snapshots of every agent in memory
+"""
+
+import os
+import hmac
+import time
+import asyncio
+import logging
+
+from muninn.fleet.protocol import (
+    FLEET_PORT, PROTOCOL_VERSION, Connection, ProtocolError, apply, is_loopback, server_ssl_context
+)
+from muninn.monitors.snapshots import CollectorError, Fleet, FleetHost, Status
+from muninn.render.data import from_data
+from muninn.utils.config import env_float
+
+logger = logging.getLogger(__name__)
+
+# Address the aggregator listens on for agents
+FLEET_ADDRESS = os.getenv("FLEET_ADDRESS", "0.0.0.0")
+# Shared secret agents must present
+FLEET_TOKEN = os.getenv("FLEET_TOKEN", "")
+# Missed pushes after which a connected agent is shown as offline
+FLEET_STALE_PUSHES = env_float("FLEET_STALE_PUSHES", 3.0)
+# Seconds an agent gets to introduce itself
+FLEET_HELLO_TIMEOUT = 10.0
+
+class Host:
+    """Latest state of one agent."""
+
+    __slots__ = ("name", "address", "connection", "data", "seq", "interval", "updated", "messages")
+
+    def __init__(self, name):
+        self.name = name
+        self.address = None
+        self.connection = None
+        self.data = None
+        self.seq = None
+        self.interval = None
+        self.updated = None
+        self.messages = 0
+
+    def age(self):
+        """Get the seconds since the last update, or None before the first one."""
+        return time.time() - self.updated if self.updated is not None else None
+
+    def online(self):
+        """Whether the agent is connected and pushed recently."""
+        age = self.age()
+        return (
+            self.connection is not None and age is not None
+            and age < FLEET_STALE_PUSHES * max(self.interval or 0, 1)
+        )
+
+    def get(self, name):
+        """Get the latest snapshot of a collector on this host."""
+        if self.data is None or name not in self.data:
+            return CollectorError(name, f"No {name} data from {self.name} yet.")
+        return from_data(self.data[name])
+
+    def results(self, names):
+        """Get the latest snapshots by collector name, with the host's status."""
+        results = {name: self.get(name) for name in names}
+        if "status" in results:
+            results["status"] = Status(self.online())
+        return results
+
+    def summary(self):
+        """Summarise the host from its raw data, without rebuilding the snapshots."""
+        data = self.data or {}
+        load = data.get("load") or {}
+        disk = data.get("disk") or {}
+        docker = data.get("docker") or {}
+        percents = [
+            partition["percent"] for partition in disk.get("partitions") or []
+            if not partition.get("unresponsive") and partition.get("percent") is not None
+        ]
+        containers = docker.get("containers") if docker.get("type") == "Docker" else None
+        return FleetHost(
+            self.name, self.online(), self.age(),
+            load.get("load1"), load.get("cpu_percent"), load.get("memory_percent"),
+            max(percents) if percents else None,
+            len(containers) if containers is not None else None,
+        )
+
+class FleetServer:
+    """Accept agent connections and apply their snapshots to the fleet state.
+
+    Each agent costs one reader coroutine and one state object, so a single
+    event loop comfortably serves hundreds of agents. A delta that does not
+    follow the last applied push is answered with a ``resync`` request
+    instead of being applied to stale state.
+    """
+
+    def __init__(self, port=FLEET_PORT, address=FLEET_ADDRESS, token=FLEET_TOKEN, ssl_context=None):
+        self.port = port
+        self.address = address
+        self.token = token
+        # Serves TLS with FLEET_CERT and FLEET_KEY unless a context is given
+        self.ssl_context = ssl_context if ssl_context is not None else server_ssl_context()
+        self.hosts = {}
+        self.server = None
+        self.stats = {"connections": 0, "messages": 0, "resyncs": 0, "rejected": 0, "bytes_received": 0}
+
+    async def start(self):
+        """Start accepting agents in the running loop.
+
+        Raises ValueError without a token unless only this host can connect.
+        """
+        if not self.token and not is_loopback(self.address):
+            raise ValueError(
+                f"FLEET_TOKEN is not set, so any host reaching {self.address}:{self.port} could push "
+                "data. Set FLEET_TOKEN, or FLEET_ADDRESS to a loopback address."
+            )
+        if self.ssl_context is None:
+            logger.warning("FLEET_CERT is not set; agent tokens and data are sent in plain text")
+        self.server = await asyncio.start_server(self._handle, self.address, self.port, ssl=self.ssl_context)
+        logger.info(
+            f"Aggregator listening for agents on {self.address}:{self.port}"
+            f"{' with TLS' if self.ssl_context is not None else ''}"
+        )
+
+    async def stop(self):
+        """Stop accepting agents and close their connections."""
+        if self.server is not None:
+            self.server.close()
+            for host in self.hosts.values():
+                if host.connection is not None:
+                    await host.connection.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def get(self, name):
+        """Get a host by name, ignoring case."""
+        return self.hosts.get(name) or next(
+            (host for host in self.hosts.values() if host.name.lower() == name.lower()), None
+        )
+
+    def summary(self, offset=0, limit=None):
+        """Get a Fleet snapshot of the hosts sorted by name, one page at a time."""
+        hosts = sorted(self.hosts.values(), key=lambda host: host.name)
+        page = hosts[offset:offset + limit if limit is not None else None]
+        online = sum(1 for host in hosts if host.online())
+        return Fleet([host.summary() for host in page], len(hosts), online)
+
+    async def _handle(self, reader, writer):
+        connection = Connection(reader, writer)
+        host = None
+        try:
+            hello = await asyncio.wait_for(connection.receive(), FLEET_HELLO_TIMEOUT)
+            host = await self._accept(connection, hello)
+            if host is None:
+                return
+            while True:
+                message = await connection.receive()
+                await self._apply(connection, host, message)
+        except (asyncio.TimeoutError, EOFError, ConnectionError):
+            pass
+        except ProtocolError as e:
+            logger.warning(f"Protocol error from agent {host.name if host else connection.peer()}: {e}")
+        except Exception as e:
+            logger.error(f"Error handling agent {connection.peer()}: {e}")
+        finally:
+            self.stats["bytes_received"] += connection.bytes_received
+            if host is not None and host.connection is connection:
+                host.connection = None
+                logger.info(f"Agent {host.name} disconnected")
+            await connection.close()
+
+    async def _accept(self, connection, hello):
+        name = str(hello.get("host") or "").strip()
+        error = None
+        if hello.get("type") != "hello" or not name:
+            error = "expected hello"
+        elif hello.get("version") != PROTOCOL_VERSION:
+            error = f"unsupported protocol version {hello.get('version')}"
+        elif not hmac.compare_digest(str(hello.get("token", "")).encode(), self.token.encode()):
+            error = "invalid token"
+        if error is not None:
+            self.stats["rejected"] += 1
+            logger.warning(f"Rejected agent {name or '?'} from {connection.peer()}: {error}")
+            await connection.send({"type": "error", "error": error})
+            return None
+
+        host = self.hosts.get(name)
+        if host is None:
+            host = self.hosts[name] = Host(name)
+        elif host.connection is not None:
+            # The agent reconnected before its old connection timed out
+            await host.connection.close()
+        host.connection = connection
+        host.address = connection.peer()
+        host.interval = float(hello.get("interval") or 0)
+        host.seq = None
+        self.stats["connections"] += 1
+        await connection.send({"type": "welcome", "version": PROTOCOL_VERSION})
+        logger.info(f"Agent {name} connected from {host.address}")
+        return host
+
+    async def _apply(self, connection, host, message):
+        kind = message.get("type")
+        seq = message.get("seq")
+        data = message.get("data")
+        if kind == "full" and isinstance(data, dict):
+            host.data = data
+        elif kind == "delta" and isinstance(data, dict):
+            if host.seq is None:
+                # Waiting for the full snapshot of a resync
+                return
+            error = None
+            if seq != host.seq + 1:
+                error = f"expected push {host.seq + 1}, got {seq}"
+            elif data:
+                try:
+                    host.data = apply(host.data, data)
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    error = e
+                    # apply() patches in place, so a failed patch may leave half-updated data
+                    host.data = None
+            if error is not None:
+                logger.warning(f"Resyncing agent {host.name}: {error}")
+                self.stats["resyncs"] += 1
+                host.seq = None
+                await connection.send({"type": "resync"})
+                return
+        else:
+            raise ProtocolError(f"Unexpected message {kind!r}")
+        host.seq = seq
+        host.updated = time.time()
+        host.messages += 1
+        self.stats["messages"] += 1
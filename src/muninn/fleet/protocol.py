@@ -0,0 +1,153 @@
+"""
+Wire protocol between agents and the aggregator
+
+Every message is a JSON object, compressed with one zlib stream per
+connection direction (flushed after each message, so later messages
+reuse the dictionary of earlier ones) and framed with a 4-byte
+big-endian length. After a ``hello``/``welcome`` handshake an agent sends
+``full`` snapshots and, in between, ``delta`` patches against the
+previous snapshot; the aggregator answers ``resync`` when it cannot apply
+a patch.
+"""
+
+import os
+import ssl
+import json
+import zlib
+import struct
+import asyncio
+import ipaddress
+
+from muninn.utils.config import env_int
+
+# Bumped on incompatible protocol changes
+PROTOCOL_VERSION = 1
+# Port the aggregator listens on for agents
+FLEET_PORT = env_int("FLEET_PORT", 7077)
+# Largest accepted message, compressed or not
+FLEET_MAX_MESSAGE = env_int("FLEET_MAX_MESSAGE", 4 * 1024 * 1024)
+
+# Certificate and key the aggregator serves TLS with; agents connect in plain TCP when unset
+FLEET_CERT = os.getenv("FLEET_CERT", "")
+FLEET_KEY = os.getenv("FLEET_KEY", "")
+# CA certificate agents check the aggregator's certificate against; setting it turns on TLS
+FLEET_CA = os.getenv("FLEET_CA", "")
+
+FRAME_HEADER = struct.Struct("!I")
+# Patch keys; snapshot data never uses keys starting with "$"
+DELETED = "$del"
+ITEMS = "$items"
+
+class ProtocolError(Exception):
+    """A peer sent something that does not follow the protocol."""
+
+def server_ssl_context(cert=FLEET_CERT, key=FLEET_KEY):
+    """Get the aggregator's TLS context, or None without a certificate."""
+    if not cert:
+        return None
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key or None)
+    return context
+
+def client_ssl_context(ca=FLEET_CA):
+    """Get an agent's TLS context, or None without a CA certificate."""
+    if not ca:
+        return None
+    return ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=ca)
+
+def is_loopback(address):
+    """Whether a listen address only accepts connections from this host."""
+    if address == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+def diff(old, new):
+    """Get a patch turning ``old`` into ``new``; call only when they differ.
+
+    Dicts are patched key by key and lists of the same length item by
+    item; anything else is replaced.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = {}
+        for key, value in new.items():
+            if key not in old:
+                patch[key] = value
+            elif old[key] != value:
+                patch[key] = diff(old[key], value)
+        deleted = [key for key in old if key not in new]
+        if deleted:
+            patch[DELETED] = deleted
+        return patch
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return {ITEMS: {str(i): diff(a, b) for i, (a, b) in enumerate(zip(old, new)) if a != b}}
+    return new
+
+def apply(target, patch):
+    """Apply a ``diff()`` patch, returning the new value (dicts are updated in place)."""
+    if isinstance(target, dict) and isinstance(patch, dict):
+        for key in patch.get(DELETED, ()):
+            target.pop(key, None)
+        for key, value in patch.items():
+            if key != DELETED:
+                target[key] = apply(target[key], value) if key in target else value
+        return target
+    if isinstance(target, list) and isinstance(patch, dict) and ITEMS in patch:
+        for index, value in patch[ITEMS].items():
+            target[int(index)] = apply(target[int(index)], value)
+        return target
+    return patch
+
+class Connection:
+    """Framed, compressed JSON messages over an asyncio stream pair."""
+
+    def __init__(self, reader, writer, max_message=FLEET_MAX_MESSAGE):
+        self.reader = reader
+        self.writer = writer
+        self.max_message = max_message
+        self.compressor = zlib.compressobj()
+        self.decompressor = zlib.decompressobj()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def peer(self):
+        address = self.writer.get_extra_info("peername")
+        return f"{address[0]}:{address[1]}" if address else "unknown"
+
+    async def send(self, message):
+        payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        data = self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.writer.write(FRAME_HEADER.pack(len(data)) + data)
+        self.bytes_sent += FRAME_HEADER.size + len(data)
+        await self.writer.drain()
+
+    async def receive(self):
+        """Read the next message; raises EOFError when the peer closed the connection."""
+        try:
+            header = await self.reader.readexactly(FRAME_HEADER.size)
+            (size,) = FRAME_HEADER.unpack(header)
+            if size > self.max_message:
+                raise ProtocolError(f"Frame of {size} bytes is too large")
+            data = await self.reader.readexactly(size)
+        except asyncio.IncompleteReadError as e:
+            raise EOFError("Connection closed") from e
+        self.bytes_received += FRAME_HEADER.size + size
+        try:
+            payload = self.decompressor.decompress(data, self.max_message)
+            if self.decompressor.unconsumed_tail:
+                raise ProtocolError("Message is too large")
+            message = json.loads(payload)
+        except (zlib.error, ValueError) as e:
+            raise ProtocolError(f"Invalid message: {e}") from e
+        if not isinstance(message, dict):
+            raise ProtocolError("Messages must be JSON objects")
+        return message
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
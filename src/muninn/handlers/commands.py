@@ -3,14 +3,63 @@ Command handlers for Telegram bot
 """
 
 import logging
+from datetime import datetime
 from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
-from muninn.utils.auth import restricted
-from muninn.utils.reporting import restart_report_thread, report_config, get_full_report
+from muninn.monitors.docker import top_containers
+from muninn.monitors.history import HISTORY_METRICS
+from muninn.monitors.snapshots import CollectorError
+from muninn.render import render_markdown, render_html
+from muninn.render.text import escape_html
+from muninn.utils.admission import admitted
+from muninn.utils.auth import restricted, user_authorized
+from muninn.utils.config import parse_duration
+from muninn.utils.reporting import REPORT_COLLECTORS, collect_full_report, render_report
+from muninn.utils.watch import WATCH_VIEWS, WATCH_INTERVAL, WATCH_MIN_INTERVAL
 
 logger = logging.getLogger(__name__)
 
+# Views that /refresh can collect again
+REFRESH_VIEWS = ("status", "load", "disk", "docker", "network", "report")
+# Hosts listed per message by '/report all'
+FLEET_PAGE_SIZE = 40
+FLEET_DISABLED = "Multi-host mode is off. Run the bot with MUNINN_MODE=aggregator to query agents."
+
+def with_age(message, age, refresh=True):
+    """Append how old a cached result is to a reply."""
+    if age is None or age < 1:
+        return message
+    if not refresh:
+        return f"{message}\n\n🕒 Data from {age:.0f}s ago"
+    return f"{message}\n\n🕒 Data from {age:.0f}s ago (/refresh for fresh data)"
+
+def host_header(host, html=False):
+    """Get the line naming the agent a reply is about."""
+    name = f"<code>{escape_html(host.name)}</code>" if html else f"`{host.name}`"
+    return f"🖥 {name}\n\n"
+
+async def find_host(update, context, name):
+    """Look up an agent in the fleet, replying with the reason when there is none."""
+    fleet = context.bot_data.get("fleet")
+    if fleet is None:
+        await update.message.reply_text(FLEET_DISABLED)
+        return None
+    host = fleet.get(name)
+    if host is None:
+        await update.message.reply_text(f"Unknown host '{name}'. Use '/report all' to list the hosts.")
+    return host
+
+async def host_view(update, context, view, html=False):
+    """Render a view of the agent named by the first command argument, or None if unknown."""
+    host = await find_host(update, context, context.args[0])
+    if host is None:
+        return None
+    snapshot = host.results((view,))[view]
+    message = render_html(snapshot) if html else render_markdown(snapshot)
+    return with_age(host_header(host, html) + message, host.age(), refresh=False)
+
 @restricted
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
     """Send a welcome message when the command /start is issued."""
@@ -19,89 +68,280 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) ->
         f"Hello {user.first_name}! I'm Muninn, your server monitoring bot.\n\n"
         "Available commands:\n"
         "/status - Check if the server is online\n"
-        "/docker - List running Docker containers\n"
+        "/docker - List running Docker containers (/docker cpu|mem [N] for top usage)\n"
         "/load - Show server load average\n"
         "/disk - Show disk usage\n"
         "/network - Show network connections and open ports\n"
-        "/report - Generate a full server report\n"
-        "/schedule - Configure automatic reports (hourly/daily)\n"
+        "/report - Generate a full server report (/report all for every agent)\n"
+        "/history - Show the history of a metric (e.g. /history cpu 24h)\n"
+        "/refresh - Collect fresh data instead of recent cached results\n"
+        "/du - Show what fills a disk (e.g. /du /var)\n"
+        "/watch - Keep a live load, disk, docker or net view updated in one message\n"
+        "/schedule - Configure automatic reports (hourly, daily, every 30m, cron)\n"
         "/help - Display this help message"
     )
 
 @restricted
+@admitted("light")
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Show server status."""
-    message = monitors.get_status_info()
+    """Show server status, or the status of an agent."""
+    if context.args:
+        message = await host_view(update, context, "status")
+        if message is None:
+            return
+    else:
+        message = render_markdown(await monitors.collect("status"))
     await update.message.reply_text(message, parse_mode="Markdown")
 
 @restricted
+@admitted("heavy")
 async def docker_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Show Docker containers status."""
-    message = monitors.get_docker_info()
+    """Show Docker containers status, optionally the top ones by CPU or memory."""
+    args = list(context.args or [])
+    host = None
+    if args and args[0].lower() not in ("cpu", "mem"):
+        # '/docker <host> [cpu|mem [N]]' asks an agent
+        host = await find_host(update, context, args.pop(0))
+        if host is None:
+            return
+    sort = args[0].lower() if args else None
+    if sort is not None and sort not in ("cpu", "mem"):
+        await update.message.reply_text(
+            "Usage: '/docker [host]', '/docker [host] cpu [N]' or '/docker [host] mem [N]'"
+        )
+        return
+    limit = max(1, int(args[1])) if len(args) > 1 and args[1].isdigit() else 10
+    if host is not None:
+        docker = host.get("docker")
+        if not isinstance(docker, CollectorError):
+            docker = top_containers(docker, sort, limit)
+        message = with_age(host_header(host) + render_markdown(docker), host.age(), refresh=False)
+    elif sort is None:
+        docker = await monitors.collect("docker")
+        message = with_age(render_markdown(docker), monitors.age("docker", result=docker))
+    else:
+        docker = await monitors.collect("docker", sort, limit)
+        message = with_age(render_markdown(docker), monitors.age("docker", sort, limit, result=docker))
     await update.message.reply_text(message, parse_mode="Markdown")
 
 @restricted
+@admitted("light")
 async def load_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Show server load average."""
-    message = monitors.get_load_info()
+    """Show server load average, here or on an agent."""
+    if context.args:
+        message = await host_view(update, context, "load")
+        if message is None:
+            return
+    else:
+        load = await monitors.collect("load")
+        message = with_age(render_markdown(load), monitors.age("load", result=load))
     await update.message.reply_text(message, parse_mode="Markdown")
 
 @restricted
+@admitted("light")
 async def disk_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Show disk usage."""
-    message = monitors.get_disk_info()
+    """Show disk usage, here or on an agent."""
+    if context.args:
+        message = await host_view(update, context, "disk")
+        if message is None:
+            return
+    else:
+        disk = await monitors.collect("disk")
+        message = with_age(render_markdown(disk), monitors.age("disk", result=disk))
     await update.message.reply_text(message, parse_mode="Markdown")
 
 @restricted
+@admitted("heavy")
 async def network_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Show network connections and open ports."""
-    message = monitors.get_network_info()
+    """Show network connections and open ports, here or on an agent."""
+    if context.args:
+        message = await host_view(update, context, "network", html=True)
+        if message is None:
+            return
+    else:
+        network = await monitors.collect("network")
+        message = with_age(render_html(network), monitors.age("network", result=network))
     await update.message.reply_text(message, parse_mode="HTML")
 
 @restricted
+@admitted("heavy")
 async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Generate full server report."""
+    """Generate a full server report, an agent's report or a summary of every agent."""
+    if context.args and context.args[0].lower() == "all":
+        fleet = context.bot_data.get("fleet")
+        if fleet is None:
+            await update.message.reply_text(FLEET_DISABLED)
+            return
+        offset = 0
+        while True:
+            page = fleet.summary(offset, FLEET_PAGE_SIZE)
+            await update.message.reply_text(render_markdown(page), parse_mode="Markdown")
+            offset += FLEET_PAGE_SIZE
+            if offset >= page.total:
+                break
+        return
+    
+    if context.args:
+        host = await find_host(update, context, context.args[0])
+        if host is None:
+            return
+        message, network_info = render_report(host.results(REPORT_COLLECTORS))
+        message = with_age(host_header(host) + message, host.age(), refresh=False)
+        if network_info:
+            network_info = host_header(host, html=True) + network_info
+    else:
+        message, network_info = await collect_full_report(monitors)
+    
     # Send main report with Markdown
-    message = get_full_report(monitors)
     await update.message.reply_text(message, parse_mode="Markdown")
     
     # Send network info separately with HTML
-    network_info = monitors.get_network_info()
-    if "Error" not in network_info:
+    if network_info:
         await update.message.reply_text(network_info, parse_mode="HTML")
 
 @restricted
-async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
-    """Configure automatic reporting schedule."""
-    if not context.args or len(context.args) < 1:
-        await update.message.reply_text(
-            "Please specify a schedule: '/schedule hourly' or '/schedule daily' or '/schedule disable'"
-        )
+@admitted("heavy")
+async def refresh_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
+    """Collect a view again, bypassing cached results."""
+    view = context.args[0].lower() if context.args else "report"
+    if view not in REFRESH_VIEWS:
+        await update.message.reply_text(f"Usage: '/refresh [{'|'.join(REFRESH_VIEWS)}]'")
         return
     
-    schedule_type = context.args[0].lower()
+    if view == "report":
+        message, network_info = await collect_full_report(monitors, refresh=True)
+        await update.message.reply_text(message, parse_mode="Markdown")
+        if network_info:
+            await update.message.reply_text(network_info, parse_mode="HTML")
+        return
     
-    if schedule_type not in ["hourly", "daily", "disable"]:
+    result = await monitors.collect(view, refresh=True)
+    if view == "network":
+        await update.message.reply_text(render_html(result), parse_mode="HTML")
+    else:
+        await update.message.reply_text(render_markdown(result), parse_mode="Markdown")
+
+@restricted
+@admitted("light")
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
+    """Show the recorded history of a metric."""
+    if not context.args:
         await update.message.reply_text(
-            "Invalid schedule type. Use '/schedule hourly' or '/schedule daily' or '/schedule disable'"
+            "Please specify a metric and an optional range, e.g. '/history cpu 24h'.\n"
+            f"Metrics: {', '.join(HISTORY_METRICS)}"
         )
         return
     
+    metric = context.args[0].lower()
+    try:
+        seconds = parse_duration(context.args[1]) if len(context.args) > 1 else 86400
+    except ValueError:
+        await update.message.reply_text("Invalid range. Use values like '1h', '24h', '7d' or '30d'.")
+        return
+    
+    message = render_markdown(await monitors.collect("history", metric, seconds))
+    await update.message.reply_text(message, parse_mode="Markdown")
+
+@restricted
+@admitted("scan")
+async def du_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
+    """Show the largest directories and files under a path."""
+    if not context.args:
+        await update.message.reply_text("Please specify a mountpoint or directory, e.g. '/du /var'.")
+        return
+    
+    limit = int(context.args[1]) if len(context.args) > 1 and context.args[1].isdigit() else 10
+    await update.message.reply_text(f"Scanning {context.args[0]}, this may take a while...")
+    message = render_markdown(await monitors.collect("du", context.args[0], max(1, min(limit, 50))))
+    await update.message.reply_text(message, parse_mode="Markdown")
+
+@restricted
+@admitted("light")
+async def watch_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
+    """Post a view that is refreshed in place until stopped."""
+    views = "|".join(WATCH_VIEWS)
+    view = context.args[0].lower() if context.args else "load"
+    if view not in WATCH_VIEWS or (len(context.args) > 1 and not context.args[1].isdigit()):
+        await update.message.reply_text(f"Usage: '/watch [{views}] [seconds]'")
+        return
+    
+    interval = int(context.args[1]) if len(context.args) > 1 else WATCH_INTERVAL
+    interval = max(interval, WATCH_MIN_INTERVAL)
+    try:
+        await context.bot_data["watcher"].add(update.effective_chat.id, view, interval)
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+
+async def watch_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switch the view of a live message or stop it."""
+    query = update.callback_query
+    if not user_authorized(update.effective_user.id):
+        logger.warning(f"Unauthorized access denied for {update.effective_user.id}")
+        await query.answer("You are not authorized to use this bot.")
+        return
+    
+    watcher = context.bot_data["watcher"]
+    action = query.data.partition(":")[2]
+    watch = watcher.get(query.message.chat.id, query.message.message_id)
+    if watch is None:
+        await query.answer("This watch has ended. Start a new one with /watch.")
+        try:
+            await query.edit_message_reply_markup(None)
+        except BadRequest:
+            # The buttons are gone already
+            pass
+    elif action == "stop":
+        await query.answer("Stopped")
+        await watcher.remove(watch, "⏹ Watch stopped")
+    elif action in WATCH_VIEWS:
+        await query.answer()
+        watcher.switch(watch, action)
+    else:
+        await query.answer()
+
+@restricted
+async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
+    """Add, list and remove automatic report schedules."""
+    scheduler = context.bot_data["scheduler"]
     chat_id = update.effective_chat.id
+    action = context.args[0].lower() if context.args else "list"
     
-    if schedule_type == "disable":
-        report_config["enabled"] = False
-        await update.message.reply_text("Automatic reports have been disabled.")
+    if action == "list":
+        subscriptions = scheduler.list(chat_id)
+        if not subscriptions:
+            await update.message.reply_text("No automatic reports are scheduled for this chat.")
+            return
+        reply = "⏰ *Scheduled reports:*\n\n"
+        for subscription in subscriptions:
+            next_run = datetime.fromtimestamp(subscription.next_run).strftime("%Y-%m-%d %H:%M")
+            reply += f"#{subscription.id}: `{subscription.schedule.describe()}` (next: `{next_run}`)\n"
+        await update.message.reply_text(reply, parse_mode="Markdown")
+    elif action == "remove":
+        if len(context.args) < 2 or not context.args[1].lstrip("#").isdigit():
+            await update.message.reply_text("Usage: '/schedule remove <id>' (see '/schedule list')")
+            return
+        if scheduler.remove(chat_id, int(context.args[1].lstrip("#"))):
+            await update.message.reply_text("The scheduled report has been removed.")
+        else:
+            await update.message.reply_text("No such scheduled report in this chat.")
+    elif action == "disable":
+        removed = scheduler.clear(chat_id)
+        await update.message.reply_text(f"Automatic reports have been disabled ({removed} removed).")
     else:
-        report_config["enabled"] = True
-        report_config["interval"] = schedule_type
-        report_config["chat_id"] = chat_id
-        
+        try:
+            subscription = scheduler.add(chat_id, " ".join(context.args))
+        except ValueError as e:
+            await update.message.reply_text(
+                f"Invalid schedule: {e}\n"
+                "Use '/schedule hourly', '/schedule daily', '/schedule every 30m' or "
+                "'/schedule cron 0 9 * * 1-5'."
+            )
+            return
+        next_run = datetime.fromtimestamp(subscription.next_run).strftime("%Y-%m-%d %H:%M")
         await update.message.reply_text(
-            f"Automatic reports have been enabled with {schedule_type} schedule."
+            f"Automatic report #{subscription.id} scheduled {subscription.schedule.describe()}, "
+            f"next at {next_run}."
         )
-    
-    restart_report_thread(context.bot, monitors)
 
 @restricted
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monitors) -> None:
@@ -109,14 +349,23 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE, monit
     await update.message.reply_text(
         "🔍 *Available Commands:*\n\n"
         "/status - Check if the server is online\n"
-        "/docker - List running Docker containers\n"
+        "/docker - List running Docker containers (/docker cpu|mem [N] for top usage)\n"
         "/load - Show server load average\n"
         "/disk - Show disk usage\n"
         "/network - Show network connections and open ports\n"
         "/report - Generate a full server report\n"
-        "/schedule hourly - Configure hourly automatic reports\n"
-        "/schedule daily - Configure daily automatic reports\n"
-        "/schedule disable - Disable automatic reports\n"
+        "/report all - Summarise every agent (aggregator mode)\n"
+        "/status|load|disk|docker|network|report <host> - Ask an agent (aggregator mode)\n"
+        "/history <metric> <range> - Show metric history (e.g. /history cpu 7d)\n"
+        "/refresh [view] - Collect status, load, disk, docker, network or the report again\n"
+        "/du <path> [N] - Show the N largest directories and files under a path\n"
+        "/watch load|disk|docker|net [seconds] - Keep a view updated in one message\n"
+        "/schedule hourly|daily - Add an hourly or daily automatic report\n"
+        "/schedule every <interval> - Add a report every interval (e.g. 30m)\n"
+        "/schedule cron <expr> - Add a cron-style report (e.g. 0 9 \\* \\* 1-5)\n"
+        "/schedule list - List the scheduled reports of this chat\n"
+        "/schedule remove <id> - Remove a scheduled report\n"
+        "/schedule disable - Remove every scheduled report of this chat\n"
         "/help - Display this help message",
         parse_mode="Markdown"
     ) 
\ No newline at end of file
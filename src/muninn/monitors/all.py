@@ -2,36 +2,187 @@
 Combined monitor that provides access to all monitoring functions
 """
 
+import time
+import asyncio
+import logging
+
 from .status import get_status_info
 from .load import get_load_info
 from .disk import get_disk_info
-from .docker import get_docker_info
+from .docker import get_docker_info, DockerMonitor
 from .network import get_network_info
+from .cgroups import CgroupCollector
+from .collector import Collector
+from .diskstats import DiskStats
+from .du import DirectoryScanner, get_du_info, DU_TIME_BUDGET
+from .gpu import GPUSampler
+from .sampler import MetricSampler
+from .history import get_history_info
+from .snapshots import CollectorError
+from muninn.utils.config import env_int, env_map
+from muninn.utils.store import MetricsStore
+
+logger = logging.getLogger(__name__)
+
+# Whether sampled metrics are persisted to disk
+STORE_ENABLED = bool(env_int("STORE_ENABLED", 1))
+
+# Seconds a collector result is reused before it is collected again
+DEFAULT_COLLECTOR_TTLS = {
+    "status": 0, "load": 2, "disk": 30, "docker": 5, "network": 10, "history": 60, "du": 0,
+}
+# Per-collector overrides, e.g. "disk=60,docker=0"
+COLLECTOR_TTLS = dict(DEFAULT_COLLECTOR_TTLS, **env_map("COLLECTOR_TTLS", float))
+# Cached results kept before expired ones are pruned
+COLLECTOR_CACHE_SIZE = 256
 
 class Monitors:
     """Class to access all monitoring functions."""
-    
+
+    # Collectors available through collect(), mapped to their getters
+    COLLECTORS = {
+        "status": "get_status_info",
+        "load": "get_load_info",
+        "disk": "get_disk_info",
+        "docker": "get_docker_info",
+        "network": "get_network_info",
+        "history": "get_history_info",
+        "du": "get_du_info",
+    }
+
+    def __init__(self):
+        self.collector = Collector()
+        self.sampler = MetricSampler()
+        self.store = None
+        self.docker = DockerMonitor()
+        self.cgroups = CgroupCollector()
+        self.gpu = GPUSampler()
+        self.diskstats = DiskStats()
+        self.du = DirectoryScanner()
+        # Let a directory scan use its whole time budget before timing out
+        self.collector.timeouts.setdefault("du", DU_TIME_BUDGET + 5)
+        self.ttls = dict(COLLECTOR_TTLS)
+        self.cache = {}
+        self.inflight = {}
+
     @staticmethod
     def get_status_info():
         """Get server status information."""
         return get_status_info()
-    
-    @staticmethod
-    def get_load_info():
+
+    def get_load_info(self):
         """Get server load information."""
-        return get_load_info()
-    
-    @staticmethod
-    def get_disk_info():
+        return get_load_info(self.sampler, self.gpu)
+
+    def get_disk_info(self):
         """Get disk usage information."""
-        return get_disk_info()
-    
-    @staticmethod
-    def get_docker_info():
+        return get_disk_info(self.sampler, self.diskstats)
+
+    def get_docker_info(self, sort=None, limit=None):
         """Get information about running Docker containers."""
-        return get_docker_info()
-    
-    @staticmethod
-    def get_network_info():
+        return get_docker_info(self.docker, self.cgroups, sort, limit)
+
+    def get_network_info(self):
         """Get network information."""
-        return get_network_info() 
\ No newline at end of file
+        return get_network_info(self.sampler)
+
+    def get_history_info(self, metric, seconds):
+        """Get the stored history of a metric."""
+        return get_history_info(self.store, metric, seconds)
+
+    def get_du_info(self, path, limit=10):
+        """Get the largest directories and files under a path."""
+        return get_du_info(self.du, path, limit)
+
+    async def collect(self, name, *args, refresh=False, max_age=None):
+        """Run the named collector without blocking the event loop.
+
+        Concurrent calls with the same arguments share one run, and a result
+        is reused for the collector's TTL (or ``max_age`` seconds, when
+        given) unless ``refresh`` is set. Errors are never cached; other
+        results are cached when the TTL or ``max_age`` is above zero, so
+        callers passing ``max_age`` reuse results even with a TTL of 0.
+        """
+        key = (name,) + args
+        cached = self.cache.get(key)
+        ttl = self.ttls.get(name, 0)
+        if max_age is None:
+            max_age = ttl
+        if not refresh and cached is not None and time.monotonic() - cached[1] < max_age:
+            return cached[0]
+        pending = self.inflight.get(key)
+        if pending is None:
+            pending = self.inflight[key] = asyncio.ensure_future(
+                self._collect(name, key, args, max(ttl, max_age) > 0)
+            )
+        # Shielded so one cancelled caller does not cancel the shared run
+        return await asyncio.shield(pending)
+
+    async def _collect(self, name, key, args, cache):
+        try:
+            getter = getattr(self, self.COLLECTORS[name])
+            result = await self.collector.run(name, getter, *args)
+            if cache and not isinstance(result, CollectorError):
+                self.cache[key] = (result, time.monotonic())
+                if len(self.cache) > COLLECTOR_CACHE_SIZE:
+                    self.prune_cache()
+            return result
+        finally:
+            del self.inflight[key]
+
+    def prune_cache(self):
+        """Drop cached results older than their TTL."""
+        now = time.monotonic()
+        for key, (_, collected) in list(self.cache.items()):
+            if now - collected >= self.ttls.get(key[0], 0):
+                del self.cache[key]
+
+    def age(self, name, *args, result=None):
+        """Get the seconds since the cached result of a collector was collected, or None.
+
+        With ``result``, the age is only given when that result is the cached
+        one, so a failed run is never labelled with an older success's age.
+        """
+        cached = self.cache.get((name,) + args)
+        if cached is None or (result is not None and cached[0] is not result):
+            return None
+        return time.monotonic() - cached[1]
+
+    async def collect_many(self, *names, refresh=False):
+        """Run several collectors concurrently and return their results by name."""
+        results = await asyncio.gather(*(self.collect(name, refresh=refresh) for name in names))
+        return dict(zip(names, results))
+
+    def sample_containers(self, timestamp, values):
+        """Refresh container usage on every sampler tick (sampler listener)."""
+        if self.docker.synced:
+            self.cgroups.sample(container["Id"] for container in self.docker.list_containers())
+
+    def sample_disks(self, timestamp, values):
+        """Refresh per-device disk I/O on every sampler tick (sampler listener)."""
+        self.diskstats.sample()
+
+    def start(self):
+        """Start background collection."""
+        if STORE_ENABLED and self.sampler.enabled and self.store is None:
+            try:
+                self.store = MetricsStore()
+                self.store.resume(time.time())
+                self.sampler.add_listener(self.store.add)
+            except OSError as e:
+                logger.error(f"Metrics store disabled: {e}")
+                self.store = None
+        self.sampler.add_listener(self.sample_containers)
+        self.sampler.add_listener(self.sample_disks)
+        self.sampler.start()
+        self.gpu.start()
+        self.docker.start()
+
+    def close(self):
+        """Release resources held by the monitors."""
+        self.sampler.stop()
+        self.gpu.stop()
+        if self.store is not None:
+            self.store.close()
+        self.docker.close()
+        self.collector.shutdown()
@@ -0,0 +1,152 @@
+"""
+Per-container resource usage read from cgroup v2
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Mount point of the unified cgroup hierarchy
+CGROUP_ROOT = os.getenv("CGROUP_ROOT", "/sys/fs/cgroup")
+# Parent directories of container cgroups (systemd and cgroupfs drivers)
+CGROUP_PARENTS = ("system.slice", "docker")
+# Container cgroup directory names, e.g. docker-<id>.scope or <id>
+CGROUP_NAME_RE = re.compile(r"^(?:docker-)?([0-9a-f]{64})(?:\.scope)?$")
+# Minimum seconds between two samples; closer calls reuse the last one
+CGROUP_MIN_INTERVAL = 1.0
+
+class ContainerUsage:
+    """Resource usage of one container."""
+
+    __slots__ = ("id", "cpu_percent", "memory", "memory_limit", "oom_kills", "read_rate", "write_rate")
+
+    def __init__(self, id, cpu_percent, memory, memory_limit, oom_kills, read_rate, write_rate):
+        self.id = id
+        self.cpu_percent = cpu_percent
+        self.memory = memory
+        self.memory_limit = memory_limit
+        self.oom_kills = oom_kills
+        self.read_rate = read_rate
+        self.write_rate = write_rate
+
+def read_keyed(path):
+    """Read a flat 'key value' cgroup file into a dict of ints."""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(" ")
+            if value.strip().isdigit():
+                values[key] = int(value)
+    return values
+
+def read_io_bytes(path):
+    """Sum rbytes and wbytes over every device in an io.stat file."""
+    read_bytes = write_bytes = 0
+    with open(path) as f:
+        for line in f:
+            for field in line.split()[1:]:
+                key, _, value = field.partition("=")
+                if key == "rbytes":
+                    read_bytes += int(value)
+                elif key == "wbytes":
+                    write_bytes += int(value)
+    return read_bytes, write_bytes
+
+def read_single(path):
+    """Read a single-value cgroup file, returning None for 'max'."""
+    with open(path) as f:
+        value = f.read().strip()
+    return int(value) if value.isdigit() else None
+
+class CgroupCollector:
+    """Sample container CPU, memory and IO straight from cgroup v2 files.
+
+    Container ids are mapped to their cgroup directories with one scan of
+    the known parent directories, repeated only when an id is missing.
+    CPU percentages (100% = one core) and IO rates come from the deltas
+    between consecutive samples.
+    """
+
+    def __init__(self, root=CGROUP_ROOT):
+        self.root = root
+        self.paths = {}
+        self.previous = {}
+        self.usage = {}
+        self.sampled = 0.0
+        self.lock = threading.Lock()
+
+    def scan(self):
+        """Rebuild the container id to cgroup directory map."""
+        paths = {}
+        for parent in CGROUP_PARENTS:
+            directory = os.path.join(self.root, parent)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        match = CGROUP_NAME_RE.match(entry.name)
+                        if match and entry.is_dir(follow_symlinks=False):
+                            paths[match.group(1)] = entry.path
+            except OSError:
+                continue
+        self.paths = paths
+
+    def read(self, path):
+        """Read the raw counters of one cgroup."""
+        cpu_usec = read_keyed(os.path.join(path, "cpu.stat")).get("usage_usec", 0)
+        memory = read_single(os.path.join(path, "memory.current"))
+        try:
+            memory_limit = read_single(os.path.join(path, "memory.max"))
+        except OSError:
+            memory_limit = None
+        oom_kills = read_keyed(os.path.join(path, "memory.events")).get("oom_kill", 0)
+        try:
+            read_bytes, write_bytes = read_io_bytes(os.path.join(path, "io.stat"))
+        except OSError:
+            read_bytes = write_bytes = 0
+        return cpu_usec, memory, memory_limit, oom_kills, read_bytes, write_bytes
+
+    def sample(self, ids):
+        """Get the usage of the given containers, keyed by id."""
+        with self.lock:
+            now = time.monotonic()
+            ids = list(ids)
+            if now - self.sampled < CGROUP_MIN_INTERVAL and all(i in self.usage for i in ids):
+                return {i: self.usage[i] for i in ids}
+
+            if any(i not in self.paths for i in ids):
+                self.scan()
+
+            usage = {}
+            previous = {}
+            for container_id in ids:
+                path = self.paths.get(container_id)
+                if path is None:
+                    continue
+                try:
+                    cpu_usec, memory, memory_limit, oom_kills, read_bytes, write_bytes = self.read(path)
+                except OSError:
+                    # The container stopped since the last scan
+                    self.paths.pop(container_id, None)
+                    continue
+
+                cpu_percent = read_rate = write_rate = None
+                before = self.previous.get(container_id)
+                if before is not None:
+                    elapsed = now - before[0]
+                    if elapsed > 0:
+                        cpu_percent = max(0, cpu_usec - before[1]) / (elapsed * 1e6) * 100
+                        read_rate = max(0, read_bytes - before[2]) / elapsed
+                        write_rate = max(0, write_bytes - before[3]) / elapsed
+                previous[container_id] = (now, cpu_usec, read_bytes, write_bytes)
+                usage[container_id] = ContainerUsage(
+                    container_id, cpu_percent, memory, memory_limit, oom_kills, read_rate, write_rate
+                )
+
+            self.previous = previous
+            self.usage = usage
+            self.sampled = now
+            return dict(usage)
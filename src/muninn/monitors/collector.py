@@ -0,0 +1,59 @@
+"""
+Asynchronous collector engine that runs blocking monitors off the event loop
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from muninn.monitors.snapshots import CollectorError
+from muninn.utils.config import env_int, env_float, env_map
+
+logger = logging.getLogger(__name__)
+
+# Number of worker threads shared by all collectors
+COLLECTOR_WORKERS = env_int("COLLECTOR_WORKERS", 4)
+# Default per-collector timeout in seconds
+COLLECTOR_TIMEOUT = env_float("COLLECTOR_TIMEOUT", 15.0)
+# Per-collector timeout overrides, e.g. "network=25,docker=10"
+COLLECTOR_TIMEOUTS = env_map("COLLECTOR_TIMEOUTS", float)
+
+class Collector:
+    """Run blocking collector functions in a bounded thread pool."""
+
+    def __init__(self, max_workers=COLLECTOR_WORKERS, timeout=COLLECTOR_TIMEOUT, timeouts=None):
+        self.timeout = timeout
+        self.timeouts = dict(COLLECTOR_TIMEOUTS if timeouts is None else timeouts)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="muninn-collector"
+        )
+
+    def timeout_for(self, name):
+        """Get the timeout in seconds for the named collector."""
+        return self.timeouts.get(name, self.timeout)
+
+    async def run(self, name, func, *args, **kwargs):
+        """Run a collector in the pool, giving up after its timeout.
+
+        Cancelling the awaiting task (or hitting the timeout) cancels the job
+        if it is still queued; a job that already started is left to finish
+        in its worker and its result is discarded.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout_for(name)
+        future = loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Collector {name} timed out after {timeout:g}s")
+            return CollectorError(name, f"Error: {name} collector timed out after {timeout:g}s")
+        except Exception as e:
+            logger.error(f"Error in collector {name}: {e}")
+            return CollectorError(name, f"Error running {name} collector: {e}")
+
+    def shutdown(self):
+        """Stop the worker pool, dropping any queued jobs."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,146 @@
+"""
+Fast connection counting without per-socket process resolution
+"""
+
+import re
+import errno
+import socket
+import struct
+import logging
+from collections import Counter, defaultdict
+
+from muninn.monitors.netsnapshot import NetworkSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Kernel TCP states, named as psutil names them
+TCP_STATES = {
+    1: "ESTABLISHED",
+    2: "SYN_SENT",
+    3: "SYN_RECV",
+    4: "FIN_WAIT1",
+    5: "FIN_WAIT2",
+    6: "TIME_WAIT",
+    7: "CLOSE",
+    8: "CLOSE_WAIT",
+    9: "LAST_ACK",
+    10: "LISTEN",
+    11: "CLOSING",
+    12: "SYN_RECV",  # TCP_NEW_SYN_RECV request sockets
+}
+# psutil reports UDP sockets without a status
+UDP_STATUS = "NONE"
+
+PROC_NET_FILES = (
+    ("/proc/net/tcp", "TCP"),
+    ("/proc/net/tcp6", "TCP"),
+    ("/proc/net/udp", "UDP"),
+    ("/proc/net/udp6", "UDP"),
+)
+# Bytes read from /proc/net files per chunk
+PROC_NET_CHUNK = 4 * 1024 * 1024
+# The "st" column of a /proc/net/{tcp,udp}* row, which follows the remote port
+STATE_RE = re.compile(rb":[0-9A-F]{4} ([0-9A-F]{2}) ")
+
+# Netlink sock_diag constants (linux/netlink.h, linux/sock_diag.h)
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLMSG_HEADER = struct.Struct("=IHHII")
+# inet_diag_req_v2 without the socket id, which is left zeroed
+INET_DIAG_REQ = struct.Struct("=BBBxI48x")
+# Offset of idiag_state: nlmsghdr followed by idiag_family
+INET_DIAG_STATE_OFFSET = NLMSG_HEADER.size + 1
+
+def count_proc_net_file(path):
+    """Count the rows of a /proc/net/{tcp,udp}* file by hex state code."""
+    counts = Counter()
+    with open(path, "rb") as f:
+        remainder = b""
+        while True:
+            chunk = f.read(PROC_NET_CHUNK)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            cut = chunk.rfind(b"\n") + 1
+            remainder = chunk[cut:]
+            counts.update(STATE_RE.findall(chunk, 0, cut))
+        if remainder:
+            counts.update(STATE_RE.findall(remainder))
+    return counts
+
+def count_proc_net(files=PROC_NET_FILES):
+    """Count connections per protocol and status from /proc/net."""
+    grouped = defaultdict(lambda: defaultdict(int))
+    for path, proto in files:
+        try:
+            counts = count_proc_net_file(path)
+        except FileNotFoundError:
+            # No IPv6 support, for example
+            continue
+        for state, count in counts.items():
+            status = UDP_STATUS if proto == "UDP" else TCP_STATES.get(int(state, 16), "UNKNOWN")
+            grouped[proto][status] += count
+    return grouped
+
+def count_netlink_family(family, protocol):
+    """Count the sockets of one family and protocol by state via NETLINK_INET_DIAG."""
+    counts = defaultdict(int)
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_SOCK_DIAG)
+    try:
+        request = INET_DIAG_REQ.pack(family, protocol, 0, 0xFFFFFFFF)
+        header = NLMSG_HEADER.pack(
+            NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY,
+            NLM_F_REQUEST | NLM_F_DUMP, 1, 0
+        )
+        sock.sendall(header + request)
+
+        buffer = bytearray(1024 * 1024)
+        view = memoryview(buffer)
+        while True:
+            size = sock.recv_into(view)
+            offset = 0
+            while offset + NLMSG_HEADER.size <= size:
+                length, msg_type = struct.unpack_from("=IH", buffer, offset)
+                if msg_type == NLMSG_DONE:
+                    return counts
+                if msg_type == NLMSG_ERROR:
+                    error = -struct.unpack_from("=i", buffer, offset + NLMSG_HEADER.size)[0]
+                    raise OSError(error, f"sock_diag error: {errno.errorcode.get(error, error)}")
+                if length < NLMSG_HEADER.size:
+                    raise OSError("Malformed netlink message")
+                counts[buffer[offset + INET_DIAG_STATE_OFFSET]] += 1
+                offset += (length + 3) & ~3
+    finally:
+        sock.close()
+
+def count_netlink():
+    """Count connections per protocol and status via netlink sock_diag."""
+    grouped = defaultdict(lambda: defaultdict(int))
+    for proto, protocol in (("TCP", socket.IPPROTO_TCP), ("UDP", socket.IPPROTO_UDP)):
+        for family in (socket.AF_INET, socket.AF_INET6):
+            for state, count in count_netlink_family(family, protocol).items():
+                status = UDP_STATUS if proto == "UDP" else TCP_STATES.get(state, "UNKNOWN")
+                grouped[proto][status] += count
+    return grouped
+
+def count_connections(snapshot=None):
+    """Count connections per protocol and status as cheaply as possible.
+
+    A snapshot that was already taken is counted as is. Otherwise tries
+    netlink sock_diag, then a bulk read of /proc/net, and finally takes
+    a psutil-based network snapshot, which also resolves owning processes.
+    """
+    if snapshot is not None:
+        return snapshot.counts()
+    if hasattr(socket, "AF_NETLINK"):
+        for counter in (count_netlink, count_proc_net):
+            try:
+                return counter()
+            except Exception as e:
+                logger.debug(f"Connection counter {counter.__name__} failed: {e}")
+
+    return NetworkSnapshot.collect().counts()
@@ -5,7 +5,11 @@ Disk usage monitoring
 import os
 import logging
 import psutil
-import subprocess
+
+from muninn.monitors.diskprobe import disk_prober
+from muninn.monitors.mounts import mount_table
+from muninn.monitors.sampler import WINDOWS
+from muninn.monitors.snapshots import CollectorError, Disk, Partition
 
 logger = logging.getLogger(__name__)
 
@@ -26,122 +30,63 @@ def should_skip_partition(mountpoint, fstype):
     
     return False
 
-def get_additional_partitions():
-    """Get partitions that might be missed by psutil."""
-    try:
-        # Run df command to get all mounted filesystems
-        result = subprocess.run(['df', '-h'], capture_output=True, text=True, check=True)
-        
-        # Parse the output to find important partitions
-        lines = result.stdout.strip().split('\n')[1:]  # Skip header
-        
-        additional_partitions = []
-        for line in lines:
-            parts = line.split()
-            if len(parts) >= 6:
-                device = parts[0]
-                mountpoint = parts[5]
-                
-                # Skip if it's likely a special filesystem
-                if should_skip_partition(mountpoint, ""):
-                    continue
-                
-                # Add to list if it's a real disk partition
-                if device.startswith('/dev/'):
-                    additional_partitions.append(mountpoint)
-        
-        return additional_partitions
-    
-    except Exception as e:
-        logger.error(f"Error getting additional partitions: {e}")
-        return []
-
-def format_partition_info(mountpoint, total_gb, used_gb, free_gb, percent):
-    """Format the partition information string, highlighting high usage."""
-    # Highlight partitions with high usage
-    is_critical = percent >= 90
-    highlight = "*" if is_critical else ""
-    
-    # Format the partition info
-    info = f"{highlight}*Partition:* `{mountpoint}`{highlight}\n"
-    
-    if is_critical:
-        info += f"├─ Total: `{total_gb:.2f} GB`\n"
-        info += f"├─ Used: `{used_gb:.2f} GB` (*{percent}%* ⚠️)\n"
-        info += f"└─ Free: `{free_gb:.2f} GB`\n\n"
-    else:
-        info += f"├─ Total: `{total_gb:.2f} GB`\n"
-        info += f"├─ Used: `{used_gb:.2f} GB` ({percent}%)\n"
-        info += f"└─ Free: `{free_gb:.2f} GB`\n\n"
-    
-    return info
+def get_disk_info(sampler=None, diskstats=None):
+    """Get disk usage information as a Disk snapshot.
 
-def get_disk_info():
-    """Get disk usage information."""
+    Live I/O rates are included when a sampler is given, and per-device
+    IOPS, throughput, await and utilisation with a DiskStats collector.
+    """
     try:
-        partitions = psutil.disk_partitions(all=False)
+        if diskstats is not None:
+            diskstats.sample()
         
-        reply = "💾 *Disk Usage Information:*\n\n"
-        processed_mountpoints = set()
-        
-        # Process partitions from psutil
-        for partition in partitions:
+        mounts = []
+        for mount in mount_table.get():
             if os.name == 'nt':
-                if 'cdrom' in partition.opts or partition.fstype == '':
+                if 'cdrom' in mount.options or mount.fstype == '':
                     # Skip CD-ROM drives on Windows
                     continue
             
             # Skip certain partitions
-            if should_skip_partition(partition.mountpoint, partition.fstype):
+            if should_skip_partition(mount.mountpoint, mount.fstype):
                 continue
             
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                
-                # Convert to GB
-                total_gb = usage.total / (1024 ** 3)
-                used_gb = usage.used / (1024 ** 3)
-                free_gb = usage.free / (1024 ** 3)
-                
-                reply += format_partition_info(
-                    partition.mountpoint, total_gb, used_gb, free_gb, usage.percent
-                )
-                
-                processed_mountpoints.add(partition.mountpoint)
-                
-            except PermissionError:
-                continue
+            mounts.append(mount)
         
-        # Add any missing partitions
-        additional_mountpoints = get_additional_partitions()
-        for mountpoint in additional_mountpoints:
-            if mountpoint not in processed_mountpoints:
-                try:
-                    usage = psutil.disk_usage(mountpoint)
-                    
-                    # Convert to GB
-                    total_gb = usage.total / (1024 ** 3)
-                    used_gb = usage.used / (1024 ** 3)
-                    free_gb = usage.free / (1024 ** 3)
-                    
-                    reply += format_partition_info(
-                        mountpoint, total_gb, used_gb, free_gb, usage.percent
-                    )
-                except Exception:
-                    continue
+        # Probe every partition concurrently so a hung mount cannot block the rest
+        usages, unresponsive = disk_prober.probe([mount.mountpoint for mount in mounts])
+        
+        partitions = []
+        for mount in mounts:
+            mountpoint = mount.mountpoint
+            if mountpoint in usages:
+                usage = usages[mountpoint]
+                io = diskstats.for_mount(mount) if diskstats is not None else None
+                partitions.append(Partition(
+                    mountpoint, usage.total, usage.used, usage.free, usage.percent, io, False, None
+                ))
+            elif mountpoint in unresponsive:
+                partitions.append(Partition(
+                    mountpoint, unresponsive=True, retry_in=disk_prober.retry_in(mountpoint)
+                ))
         
-        # Add total I/O statistics
+        # Total I/O since boot
         io_counters = psutil.disk_io_counters()
-        if io_counters:
-            read_mb = io_counters.read_bytes / (1024 ** 2)
-            write_mb = io_counters.write_bytes / (1024 ** 2)
-            
-            reply += f"*Disk I/O (since boot):*\n"
-            reply += f"├─ Read: `{read_mb:.2f} MB`\n"
-            reply += f"└─ Written: `{write_mb:.2f} MB`\n"
+        read_total = io_counters.read_bytes if io_counters else None
+        write_total = io_counters.write_bytes if io_counters else None
+        
+        # Current I/O rates from the sampler
+        read_rate = write_rate = io_windows = None
+        if sampler is not None and sampler.has_data():
+            read_rate = sampler.rate("disk.read_bytes")
+            write_rate = sampler.rate("disk.write_bytes")
+            io_windows = [
+                (label, sampler.rate("disk.read_bytes", seconds), sampler.rate("disk.write_bytes", seconds))
+                for label, seconds in WINDOWS
+            ]
         
-        return reply
+        return Disk(partitions, read_total, write_total, read_rate, write_rate, io_windows)
     
     except Exception as e:
         logger.error(f"Error in get_disk_info: {e}")
-        return f"Error retrieving disk information: {e}" 
\ No newline at end of file
+        return CollectorError("disk", f"Error retrieving disk information: {e}")
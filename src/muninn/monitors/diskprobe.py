@@ -0,0 +1,170 @@
+"""
+Disk usage probing that survives hung network mounts
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, wait
+
+import psutil
+
+from muninn.utils.config import env_int, env_float
+
+logger = logging.getLogger(__name__)
+
+# Worker threads probing mounts concurrently
+DISK_PROBE_WORKERS = env_int("DISK_PROBE_WORKERS", 4)
+# Seconds a mount has to answer before it is marked unresponsive
+DISK_PROBE_TIMEOUT = env_float("DISK_PROBE_TIMEOUT", 2.0)
+# Longest quarantine of an unresponsive mount, in seconds
+DISK_QUARANTINE_MAX = env_float("DISK_QUARANTINE_MAX", 600.0)
+# First quarantine of an unresponsive mount, doubled on every new timeout
+DISK_QUARANTINE_BASE = 30.0
+
+class Quarantine:
+    """Backoff state of one unresponsive mount."""
+
+    __slots__ = ("failures", "until")
+
+    def __init__(self):
+        self.failures = 0
+        self.until = 0.0
+
+class DiskProber:
+    """Run ``statvfs`` (via ``psutil.disk_usage``) on worker threads with deadlines.
+
+    A stat on a hung NFS or CIFS mount blocks in the kernel and cannot be
+    cancelled, so a probe that misses its deadline keeps its thread while
+    a replacement worker is started, and the mount is quarantined with
+    exponential backoff. A quarantined mount, or one whose previous probe
+    is still stuck, is reported as unresponsive without being probed.
+    """
+
+    def __init__(self, workers=DISK_PROBE_WORKERS, timeout=DISK_PROBE_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.tasks = queue.Queue()
+        self.pending = {}
+        self.stuck = set()
+        self.quarantine = {}
+        self.threads = 0
+        self.lock = threading.Lock()
+
+    def _spawn(self):
+        self.threads += 1
+        threading.Thread(target=self._work, name="muninn-diskprobe", daemon=True).start()
+
+    def _work(self):
+        while True:
+            mountpoint, future = self.tasks.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(psutil.disk_usage(mountpoint))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self.lock:
+                if self.pending.get(mountpoint, (None,))[0] is future:
+                    del self.pending[mountpoint]
+                if mountpoint in self.stuck:
+                    # A replacement was started when this probe timed out
+                    self.stuck.discard(mountpoint)
+                    self.threads -= 1
+                    logger.info(f"Mount {mountpoint} answered again")
+                    return
+
+    def _submit(self, mountpoint):
+        future = Future()
+        self.pending[mountpoint] = (future, time.monotonic())
+        if self.threads < self.workers + len(self.stuck):
+            self._spawn()
+        self.tasks.put((mountpoint, future))
+        return future
+
+    def _timed_out(self, mountpoint, now):
+        """Quarantine a mount whose probe missed its deadline."""
+        state = self.quarantine.setdefault(mountpoint, Quarantine())
+        if now < state.until:
+            # A concurrent caller already quarantined it
+            return
+        state.failures += 1
+        backoff = min(DISK_QUARANTINE_BASE * 2 ** (state.failures - 1), DISK_QUARANTINE_MAX)
+        state.until = now + backoff
+        future, _ = self.pending.get(mountpoint, (None, None))
+        if future is not None and future.running() and mountpoint not in self.stuck:
+            self.stuck.add(mountpoint)
+            self._spawn()
+        logger.warning(f"Mount {mountpoint} is unresponsive; retrying in {backoff:g}s")
+
+    def retry_in(self, mountpoint):
+        """Seconds until a quarantined mount is probed again, or None."""
+        state = self.quarantine.get(mountpoint)
+        if state is None:
+            return None
+        return max(0.0, state.until - time.monotonic())
+
+    def probe(self, mountpoints):
+        """Get disk usage of the mountpoints concurrently.
+
+        Returns ``(usages, unresponsive)``: a dict of mountpoint to usage and
+        the list of mountpoints that did not answer in time. Mounts that fail
+        with an OSError (e.g. permission denied) are left out of both.
+        """
+        now = time.monotonic()
+        futures = {}
+        unresponsive = []
+        with self.lock:
+            for mountpoint in mountpoints:
+                state = self.quarantine.get(mountpoint)
+                if state is not None and now < state.until:
+                    unresponsive.append(mountpoint)
+                elif mountpoint in self.pending:
+                    future, started = self.pending[mountpoint]
+                    if now - started < self.timeout:
+                        # Share the probe of a concurrent caller
+                        futures[mountpoint] = future
+                    else:
+                        # The previous probe is still blocked
+                        self._timed_out(mountpoint, now)
+                        unresponsive.append(mountpoint)
+                else:
+                    futures[mountpoint] = self._submit(mountpoint)
+
+        wait(set(futures.values()), timeout=self.timeout)
+
+        # Probes stuck behind hung ones get another window on the fresh workers
+        with self.lock:
+            now = time.monotonic()
+            for mountpoint, future in futures.items():
+                if future.running():
+                    self._timed_out(mountpoint, now)
+        queued = {future for future in futures.values() if not future.done() and not future.running()}
+        if queued:
+            wait(queued, timeout=self.timeout)
+
+        usages = {}
+        now = time.monotonic()
+        with self.lock:
+            for mountpoint, future in futures.items():
+                if not future.done():
+                    if future.cancel():
+                        # Never started because every worker was busy
+                        self.pending.pop(mountpoint, None)
+                    else:
+                        self._timed_out(mountpoint, now)
+                    unresponsive.append(mountpoint)
+                    continue
+                if future.cancelled():
+                    unresponsive.append(mountpoint)
+                    continue
+                self.quarantine.pop(mountpoint, None)
+                error = future.exception()
+                if error is None:
+                    usages[mountpoint] = future.result()
+                elif not isinstance(error, OSError):
+                    logger.error(f"Error probing {mountpoint}: {error}")
+        return usages, unresponsive
+
+# Shared prober used by the disk monitor
+disk_prober = DiskProber()
@@ -0,0 +1,124 @@
+"""
+Per-device disk I/O rates from /proc/diskstats deltas
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DISKSTATS_FILE = "/proc/diskstats"
+# Minimum seconds between two samples; closer calls reuse the last one
+DISKSTATS_MIN_INTERVAL = 1.0
+# Size of a sector as counted by /proc/diskstats, whatever the device
+SECTOR_SIZE = 512
+
+class DeviceIO:
+    """Live I/O of one block device."""
+
+    __slots__ = ("name", "read_iops", "write_iops", "read_rate", "write_rate", "await_ms", "util")
+
+    def __init__(self, name, read_iops, write_iops, read_rate, write_rate, await_ms, util):
+        self.name = name
+        self.read_iops = read_iops
+        self.write_iops = write_iops
+        self.read_rate = read_rate
+        self.write_rate = write_rate
+        self.await_ms = await_ms
+        self.util = util
+
+def parse_diskstats(text):
+    """Parse /proc/diskstats into {"major:minor": (name, counters)}.
+
+    The counters are reads, read sectors, read ms, writes, written sectors,
+    write ms and ms spent doing I/O.
+    """
+    devices = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) < 14:
+            continue
+        devices[f"{fields[0]}:{fields[1]}"] = (fields[2], (
+            int(fields[3]), int(fields[5]), int(fields[6]),
+            int(fields[7]), int(fields[9]), int(fields[10]),
+            int(fields[12]),
+        ))
+    return devices
+
+class DiskStats:
+    """Per-device IOPS, throughput, await and utilisation.
+
+    ``/proc/diskstats`` is read in one pass per sample and rates come from
+    the deltas between consecutive samples. Devices are keyed by
+    "major:minor", the same id the mount table uses.
+    """
+
+    def __init__(self, path=DISKSTATS_FILE):
+        self.path = path
+        self.previous = None
+        self.sampled = 0.0
+        self.devices = {}
+        self.lock = threading.Lock()
+
+    def read(self):
+        with open(self.path) as f:
+            return parse_diskstats(f.read())
+
+    def sample(self):
+        """Take a sample and update the rates, at most once per second."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.sampled < DISKSTATS_MIN_INTERVAL:
+                return
+            try:
+                current = self.read()
+            except OSError as e:
+                logger.debug(f"Cannot read {self.path}: {e}")
+                return
+
+            devices = {}
+            if self.previous is not None:
+                elapsed = now - self.sampled
+                previous = self.previous
+                for key, (name, counters) in current.items():
+                    before = previous.get(key)
+                    if before is None:
+                        continue
+                    reads, read_sectors, read_ms, writes, write_sectors, write_ms, io_ms = (
+                        max(0, a - b) for a, b in zip(counters, before[1])
+                    )
+                    ios = reads + writes
+                    devices[key] = DeviceIO(
+                        name,
+                        reads / elapsed,
+                        writes / elapsed,
+                        read_sectors * SECTOR_SIZE / elapsed,
+                        write_sectors * SECTOR_SIZE / elapsed,
+                        (read_ms + write_ms) / ios if ios else 0.0,
+                        min(100.0, io_ms / (elapsed * 10)),
+                    )
+            self.previous = current
+            self.sampled = now
+            self.devices = devices
+
+    def get(self, device):
+        """Get the live I/O of a "major:minor" device, or None."""
+        return self.devices.get(device)
+
+    def for_mount(self, mount):
+        """Get the live I/O of the device behind a mount, or None.
+
+        Filesystems such as btrfs report an anonymous device id, so the
+        source device node is looked up when the id is unknown.
+        """
+        devices = self.devices
+        io = devices.get(mount.device)
+        if io is None and mount.source.startswith("/dev/"):
+            try:
+                rdev = os.stat(mount.source).st_rdev
+            except OSError:
+                return None
+            io = devices.get(f"{os.major(rdev)}:{os.minor(rdev)}")
+        return io
@@ -2,54 +2,325 @@
 Docker containers monitoring
 """
 
+import os
+import time
 import logging
+import threading
+
 import docker
 from docker.errors import DockerException
 
+from muninn.monitors.snapshots import CollectorError, Container, Docker
+from muninn.utils.config import env_int
+
 logger = logging.getLogger(__name__)
 
-def get_docker_info():
-    """Get information about running Docker containers."""
+# Docker daemon address
+DOCKER_URL = os.getenv("DOCKER_HOST", "unix://var/run/docker.sock")
+# Connections kept open to the daemon
+DOCKER_POOL_SIZE = env_int("DOCKER_POOL_SIZE", 4)
+# Seconds to wait for a daemon response
+DOCKER_TIMEOUT = env_int("DOCKER_TIMEOUT", 10)
+# Maximum seconds between reconnection attempts to the events stream
+DOCKER_EVENTS_MAX_BACKOFF = 60
+
+# Container events that change the container table
+DOCKER_EVENTS = [
+    "start", "kill", "stop", "die", "destroy", "pause", "unpause", "rename", "health_status", "oom"
+]
+# Signals conventionally sent to reload or poke a process rather than stop it (HUP, USR1, USR2)
+RELOAD_SIGNALS = {"1", "10", "12", "SIGHUP", "SIGUSR1", "SIGUSR2", "HUP", "USR1", "USR2"}
+# Seconds after an OOM event in which the container exiting is part of the same kill
+OOM_DIE_WINDOW = 10
+
+class DockerMonitor:
+    """Long-lived, connection-pooled access to the Docker daemon.
+
+    Containers are listed with a single low-level ``/containers/json``
+    call; image tags come from a cache that is refreshed with one
+    ``/images/json`` call whenever an unknown image id shows up.
+
+    Once ``start()`` is called, a background thread seeds a table of
+    running containers and keeps it current from the ``/events`` stream,
+    so listing becomes a memory read. Listeners registered with
+    ``add_listener`` are called with ``(kind, container)`` for crashes
+    ("die" with a non-zero exit code), OOM kills and unhealthy containers.
+    """
+
+    def __init__(self, base_url=DOCKER_URL, pool_size=DOCKER_POOL_SIZE, timeout=DOCKER_TIMEOUT):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.client = None
+        self.image_tags = {}
+        self.lock = threading.Lock()
+
+        self.containers = {}
+        self.killed = set()
+        # Container id -> monotonic time of its last OOM event
+        self.oom_killed = {}
+        self.synced = False
+        self.listeners = []
+        self.stream = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def api(self):
+        """Get the shared low-level client, connecting on first use."""
+        with self.lock:
+            if self.client is None:
+                self.client = docker.APIClient(
+                    base_url=self.base_url, version="auto",
+                    timeout=self.timeout, max_pool_size=self.pool_size,
+                )
+            return self.client
+
+    def reset(self):
+        """Drop the client so the next call reconnects."""
+        with self.lock:
+            client, self.client = self.client, None
+        if client is not None:
+            client.close()
+
+    def refresh_images(self):
+        """Reload the image id to tags map in one request."""
+        tags = {}
+        for image in self.api().images():
+            repo_tags = [tag for tag in image.get("RepoTags") or [] if tag != "<none>:<none>"]
+            tags[image["Id"]] = repo_tags
+        self.image_tags = tags
+
+    def image_name(self, container):
+        """Get a readable image name for a container."""
+        image_id = container.get("ImageID", "")
+        tags = self.image_tags.get(image_id)
+        if tags:
+            return tags[0]
+        image = container.get("Image", "")
+        if image and not image.startswith("sha256:"):
+            return image
+        return image_id.split(":")[-1][:12]
+
+    def fetch_containers(self, all=False, filters=None):
+        """List containers from the daemon with their image names resolved."""
+        try:
+            containers = self.api().containers(all=all, filters=filters)
+            if any(c.get("ImageID") not in self.image_tags for c in containers):
+                self.refresh_images()
+        except Exception:
+            # Reconnect on the next call in case the daemon restarted
+            self.reset()
+            raise
+        for container in containers:
+            container["ImageName"] = self.image_name(container)
+            container["Health"] = parse_health(container.get("Status", ""))
+        return containers
+
+    def list_containers(self):
+        """List running containers, from the event-fed table when it is in sync."""
+        with self.lock:
+            if self.synced:
+                return sorted(self.containers.values(), key=lambda c: c.get("Created", 0), reverse=True)
+        return self.fetch_containers()
+
+    def add_listener(self, callback):
+        """Call ``callback(kind, container)`` on crashes, OOM kills and failed health checks."""
+        self.listeners.append(callback)
+
+    def _notify(self, kind, container):
+        for callback in self.listeners:
+            try:
+                callback(kind, container)
+            except Exception as e:
+                logger.error(f"Error in Docker event listener: {e}")
+
+    def _resync(self):
+        """Reload the container table from the daemon."""
+        containers = self.fetch_containers()
+        with self.lock:
+            self.containers = {container["Id"]: container for container in containers}
+            self.synced = True
+
+    def _refresh_container(self, container_id):
+        """Reload one container into the table."""
+        containers = self.fetch_containers(filters={"id": container_id})
+        with self.lock:
+            for container in containers:
+                self.containers[container["Id"]] = container
+
+    def handle_event(self, event):
+        """Apply one container event to the table."""
+        action = event.get("Action", "")
+        container_id = event.get("id") or event.get("Actor", {}).get("ID", "")
+        attributes = event.get("Actor", {}).get("Attributes", {})
+        with self.lock:
+            container = self.containers.get(container_id)
+        if container is None:
+            container = {
+                "Id": container_id,
+                "Names": ["/" + attributes.get("name", container_id[:12])],
+                "ImageName": attributes.get("image", ""),
+            }
+
+        if action in ("start", "unpause", "rename"):
+            self.killed.discard(container_id)
+            self.oom_killed.pop(container_id, None)
+            self._refresh_container(container_id)
+        elif action == "kill":
+            # A signalled container exiting is an expected stop, not a crash
+            if attributes.get("signal", "") not in RELOAD_SIGNALS:
+                self.killed.add(container_id)
+        elif action in ("stop", "die", "destroy"):
+            with self.lock:
+                self.containers.pop(container_id, None)
+            # Each mark covers the next exit only, so it never hides a later crash
+            expected = container_id in self.killed
+            self.killed.discard(container_id)
+            oom = self.oom_killed.pop(container_id, None)
+            # The OOM kill was already alerted on when its event came in
+            expected = expected or (oom is not None and time.monotonic() - oom < OOM_DIE_WINDOW)
+            if action == "die" and not expected and attributes.get("exitCode", "0") != "0":
+                container = dict(container, ExitCode=attributes.get("exitCode"))
+                self._notify("crash", container)
+        elif action == "pause":
+            with self.lock:
+                if container_id in self.containers:
+                    self.containers[container_id]["State"] = "paused"
+        elif action.startswith("health_status"):
+            health = action.partition(":")[2].strip()
+            with self.lock:
+                if container_id in self.containers:
+                    self.containers[container_id]["Health"] = health
+            if health == "unhealthy":
+                self._notify("unhealthy", container)
+        elif action == "oom":
+            self.oom_killed[container_id] = time.monotonic()
+            self._notify("oom", container)
+
+    def _watch_events(self):
+        """Follow the events stream, resyncing after every reconnect."""
+        backoff = 1
+        while not self.stop_event.is_set():
+            client = None
+            try:
+                client = docker.APIClient(base_url=self.base_url, version="auto", timeout=None)
+                since = int(time.time())
+                self._resync()
+                self.stream = client.events(
+                    since=since, decode=True,
+                    filters={"type": "container", "event": DOCKER_EVENTS},
+                )
+                backoff = 1
+                logger.info(f"Following Docker events ({len(self.containers)} running containers)")
+                for event in self.stream:
+                    self.handle_event(event)
+                    if self.stop_event.is_set():
+                        break
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    logger.warning(f"Docker events stream lost: {e}; reconnecting in {backoff}s")
+            finally:
+                with self.lock:
+                    self.synced = False
+                self.stream = None
+                if client is not None:
+                    client.close()
+            if self.stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, DOCKER_EVENTS_MAX_BACKOFF)
+
+    def start(self):
+        """Start following the events stream in a background thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._watch_events, name="muninn-docker-events", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stop following events and close the pooled connections."""
+        self.stop_event.set()
+        stream = self.stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        self.reset()
+
+def parse_health(status):
+    """Get the health state from a container status such as 'Up 2 hours (healthy)'."""
+    if "(unhealthy)" in status:
+        return "unhealthy"
+    if "(healthy)" in status:
+        return "healthy"
+    if "(health: starting)" in status:
+        return "starting"
+    return None
+
+def container_name(container):
+    """Get the name of a container from a low-level listing."""
+    names = container.get("Names") or []
+    return names[0].lstrip("/") if names else container.get("Id", "")[:12]
+
+def format_ports(ports):
+    """Format the port list of a low-level container listing."""
+    port_info = []
+    for port in ports or []:
+        private = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+        if port.get("PublicPort"):
+            host_ip = port.get("IP", "")
+            if host_ip == '0.0.0.0' or not host_ip:
+                host_ip = 'localhost'
+            entry = f"{host_ip}:{port['PublicPort']}->{private}"
+        else:
+            entry = private
+        if entry not in port_info:
+            port_info.append(entry)
+    return port_info
+
+def top_containers(docker, sort=None, limit=None):
+    """Keep the top ``limit`` containers of a Docker snapshot by "cpu" or "mem" usage."""
+    if sort not in ("cpu", "mem"):
+        return docker
+
+    def sort_key(container):
+        if container.usage is None:
+            return 0
+        return (container.usage.memory if sort == "mem" else container.usage.cpu_percent) or 0
+
+    return Docker(sorted(docker.containers, key=sort_key, reverse=True)[:limit], sort)
+
+def get_docker_info(monitor=None, cgroups=None, sort=None, limit=None):
+    """Get the running Docker containers as a Docker snapshot.
+
+    With a cgroup collector, per-container CPU, memory and IO are included;
+    ``sort`` ("cpu" or "mem") and ``limit`` keep only the top containers.
+    """
+    owned = monitor is None
+    if owned:
+        monitor = DockerMonitor()
     try:
-        # Use unix socket connection instead of http+docker
-        client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-        containers = client.containers.list()
-        
-        if not containers:
-            return "No Docker containers are currently running."
-        
-        reply = "🐳 *Running Docker containers:*\n\n"
+        containers = monitor.list_containers()
+        usage = cgroups.sample(c["Id"] for c in containers) if cgroups is not None and containers else {}
+
+        result = []
         for container in containers:
-            name = container.name
-            image = container.image.tags[0] if container.image.tags else container.image.id[:12]
-            status = container.status
-            
-            reply += f"*{name}*\n"
-            reply += f"├─ Image: `{image}`\n"
-            reply += f"├─ Status: `{status}`\n"
-            
-            ports = container.ports
-            if ports:
-                port_info = []
-                for port, bindings in ports.items():
-                    if bindings:
-                        for binding in bindings:
-                            host_ip = binding.get('HostIp', '')
-                            host_port = binding.get('HostPort', '')
-                            if host_ip == '0.0.0.0' or not host_ip:
-                                host_ip = 'localhost'
-                            port_info.append(f"{host_ip}:{host_port}->{port}")
-                    else:
-                        port_info.append(f"{port}")
-                reply += f"└─ Ports: `{', '.join(port_info)}`\n\n"
-            else:
-                reply += f"└─ Ports: None\n\n"
-            
-        return reply
-    
+            status = container.get("State", "unknown")
+            if container.get("Health"):
+                status += f" ({container['Health']})"
+            result.append(Container(
+                container["Id"], container_name(container), container["ImageName"], status,
+                usage.get(container["Id"]), format_ports(container.get("Ports")),
+            ))
+        return top_containers(Docker(result, None), sort, limit)
+
     except DockerException as e:
         logger.error(f"Error in get_docker_info: {e}")
-        return f"Error connecting to Docker: {e}"
+        return CollectorError("docker", f"Error connecting to Docker: {e}")
     except Exception as e:
         logger.error(f"Error in get_docker_info: {e}")
-        return f"Error retrieving Docker information: {e}" 
\ No newline at end of file
+        return CollectorError("docker", f"Error retrieving Docker information: {e}")
+    finally:
+        if owned:
+            monitor.close()
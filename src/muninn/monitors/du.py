@@ -0,0 +1,256 @@
+"""
+Parallel "what is filling this disk" directory scanner
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from muninn.monitors.snapshots import CollectorError
+from muninn.utils.config import env_int, env_float
+from muninn.utils.formatting import format_bytes
+
+logger = logging.getLogger(__name__)
+
+# Threads listing directories concurrently
+DU_WORKERS = env_int("DU_WORKERS", 8)
+# Seconds a scan may run before it reports what it has
+DU_TIME_BUDGET = env_float("DU_TIME_BUDGET", 30.0)
+# Filesystem calls (directory listings and stats) a scan may make
+DU_IO_BUDGET = env_int("DU_IO_BUDGET", 2000000)
+# Directories whose listing and file sizes are kept between scans
+DU_CACHE_SIZE = env_int("DU_CACHE_SIZE", 200000)
+# Seconds a cached directory is trusted while its mtime is unchanged
+DU_CACHE_MAX_AGE = env_float("DU_CACHE_MAX_AGE", 3600.0)
+# Directory depth below the scanned path listed among the largest directories
+DU_REPORT_DEPTH = 2
+
+class DirectoryEntry:
+    """Size of one directory and the files directly inside it, and its subdirectories."""
+
+    __slots__ = ("mtime", "scanned", "files", "own_bytes", "largest", "subdirs")
+
+    def __init__(self, mtime, scanned, files, own_bytes, largest, subdirs):
+        self.mtime = mtime
+        self.scanned = scanned
+        self.files = files
+        self.own_bytes = own_bytes
+        self.largest = largest
+        self.subdirs = subdirs
+
+def disk_bytes(st):
+    """Get the space a file takes on disk, like du."""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+class ScanResult:
+    """Outcome of one scan."""
+
+    def __init__(self, path):
+        self.path = path
+        self.totals = {}
+        self.largest_files = []
+        self.dirs = 0
+        self.files = 0
+        self.cached = 0
+        self.io = 0
+        self.elapsed = 0.0
+        self.partial = None
+
+class DirectoryScanner:
+    """Walk a tree with parallel ``os.scandir`` calls, staying on one filesystem.
+
+    Every directory is a job on the worker pool; sizes are summed bottom-up
+    once the walk ends. The listing and file sizes of each directory are
+    cached with its mtime, so a rescan only pays one stat for a directory
+    whose entries did not change. Because growing an existing file does
+    not touch its directory's mtime, cached entries are only trusted for
+    ``DU_CACHE_MAX_AGE`` seconds.
+    """
+
+    def __init__(self, workers=DU_WORKERS, cache_size=DU_CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+
+    def _cached(self, path, mtime, now, limit):
+        with self.cache_lock:
+            entry = self.cache.get(path)
+            if entry is None or entry.mtime != mtime or now - entry.scanned > DU_CACHE_MAX_AGE:
+                return None
+            if len(entry.largest) < min(limit, entry.files):
+                # Cached by a scan that kept fewer of the largest files
+                return None
+            self.cache.move_to_end(path)
+            return entry
+
+    def _store(self, path, entry):
+        with self.cache_lock:
+            self.cache[path] = entry
+            self.cache.move_to_end(path)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _scan_dir(self, path, device, limit, state):
+        """List one directory, or reuse its cached listing.
+
+        Returns ``(entry, cached, io)`` or None if the directory is on
+        another filesystem, vanished or the scan was aborted.
+        """
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return None
+        if st.st_dev != device:
+            return None
+        now = time.monotonic()
+        entry = self._cached(path, st.st_mtime_ns, now, limit)
+        if entry is not None:
+            return entry, True, 1
+
+        io = 2
+        files = 0
+        # Like du, count the blocks of the directory itself
+        own_bytes = disk_bytes(st)
+        largest = []
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for item in entries:
+                    if state["stop"].is_set():
+                        return None
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            subdirs.append(item.path)
+                            continue
+                        if item.is_symlink():
+                            continue
+                        size = disk_bytes(item.stat(follow_symlinks=False))
+                    except OSError:
+                        continue
+                    io += 1
+                    files += 1
+                    own_bytes += size
+                    # Bounded heap of this directory's largest files
+                    if len(largest) < limit:
+                        heapq.heappush(largest, (size, item.path))
+                    elif size > largest[0][0]:
+                        heapq.heapreplace(largest, (size, item.path))
+        except OSError:
+            return None
+        entry = DirectoryEntry(st.st_mtime_ns, now, files, own_bytes, largest, subdirs)
+        self._store(path, entry)
+        return entry, False, io
+
+    def scan(self, path, limit=10, time_budget=DU_TIME_BUDGET, io_budget=DU_IO_BUDGET):
+        """Scan the tree under ``path`` and return a ScanResult."""
+        path = os.path.abspath(path)
+        device = os.lstat(path).st_dev
+        result = ScanResult(path)
+        start = time.monotonic()
+        deadline = start + time_budget
+        state = {"stop": threading.Event()}
+        parents = {path: None}
+        own = {}
+        largest = []
+
+        with self.scan_lock, ThreadPoolExecutor(self.workers, thread_name_prefix="muninn-du") as executor:
+            running = {executor.submit(self._scan_dir, path, device, limit, state): path}
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    result.partial = "time budget reached"
+                    break
+                done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory = running.pop(future)
+                    scanned = future.result()
+                    if scanned is None:
+                        continue
+                    entry, cached, io = scanned
+                    result.dirs += 1
+                    result.files += entry.files
+                    result.cached += cached
+                    result.io += io
+                    own[directory] = entry.own_bytes
+                    for item in entry.largest:
+                        if len(largest) < limit:
+                            heapq.heappush(largest, item)
+                        elif item[0] > largest[0][0]:
+                            heapq.heapreplace(largest, item)
+                    if result.io >= io_budget:
+                        result.partial = "IO budget reached"
+                        continue
+                    for subdir in entry.subdirs:
+                        parents[subdir] = directory
+                        running[executor.submit(self._scan_dir, subdir, device, limit, state)] = subdir
+                if result.partial:
+                    break
+            state["stop"].set()
+            for future in running:
+                future.cancel()
+
+        # Sum sizes bottom-up: deeper directories first
+        totals = dict(own)
+        for directory in sorted(own, key=lambda d: d.count(os.sep), reverse=True):
+            parent = parents.get(directory)
+            if parent is not None and parent in totals:
+                totals[parent] += totals[directory]
+        result.totals = totals
+        result.largest_files = sorted(largest, reverse=True)
+        result.elapsed = time.monotonic() - start
+        return result
+
+def code_name(name):
+    """Make a file name safe inside a Markdown code span, which has no escaping."""
+    return name.replace("`", "'").replace("\n", " ")
+
+def get_du_info(scanner, path, limit=10):
+    """Get the largest directories and files under a path."""
+    try:
+        if not os.path.isabs(path) or not os.path.isdir(path):
+            return CollectorError("du", f"Error: `{code_name(path)}` is not an absolute path to a directory.")
+        if scanner.scan_lock.locked():
+            return "A directory scan is already running, please try again later."
+
+        result = scanner.scan(path, limit)
+        root = result.path
+        base_depth = root.rstrip(os.sep).count(os.sep)
+        dirs = [
+            (size, directory) for directory, size in result.totals.items()
+            if directory != root and directory.count(os.sep) - base_depth <= DU_REPORT_DEPTH
+        ]
+
+        reply = f"📂 *Disk usage of* `{code_name(root)}`\n"
+        reply += f"├─ Total: `{format_bytes(result.totals.get(root, 0))}`\n"
+        reply += f"├─ Scanned: `{result.dirs}` dirs, `{result.files}` files ({result.cached} dirs cached)\n"
+        reply += f"└─ Time: `{result.elapsed:.1f}s`\n"
+        if result.partial:
+            reply += f"⚠️ Partial scan: {result.partial}\n"
+
+        reply += "\n*Largest directories:*\n"
+        top_dirs = heapq.nlargest(limit, dirs)
+        for i, (size, directory) in enumerate(top_dirs):
+            branch = "└─" if i == len(top_dirs) - 1 else "├─"
+            reply += f"{branch} `{code_name(os.path.relpath(directory, root))}` {format_bytes(size)}\n"
+        if not top_dirs:
+            reply += "└─ None\n"
+
+        reply += "\n*Largest files:*\n"
+        for i, (size, file_path) in enumerate(result.largest_files):
+            branch = "└─" if i == len(result.largest_files) - 1 else "├─"
+            reply += f"{branch} `{code_name(os.path.relpath(file_path, root))}` {format_bytes(size)}\n"
+        if not result.largest_files:
+            reply += "└─ None\n"
+
+        return reply
+
+    except Exception as e:
+        logger.error(f"Error in get_du_info: {e}")
+        return CollectorError("du", f"Error scanning directory: {e}")
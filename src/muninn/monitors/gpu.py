@@ -0,0 +1,205 @@
+"""
+Streaming NVIDIA GPU sampler backed by long-running nvidia-smi processes
+"""
+
+import os
+import time
+import logging
+import threading
+import subprocess
+from collections import deque
+from shutil import which
+
+from muninn.utils.config import env_int
+
+logger = logging.getLogger(__name__)
+
+# nvidia-smi executable (a fake script can be used for testing)
+NVIDIA_SMI = os.getenv("NVIDIA_SMI", "nvidia-smi")
+# Milliseconds between GPU samples
+GPU_SAMPLE_INTERVAL_MS = env_int("GPU_SAMPLE_INTERVAL_MS", 2000)
+# Samples of history kept per GPU
+GPU_HISTORY = env_int("GPU_HISTORY", 900)
+# Maximum seconds between restarts of a dead nvidia-smi
+GPU_MAX_BACKOFF = 60
+
+GPU_QUERY = (
+    "timestamp,index,uuid,name,temperature.gpu,utilization.gpu,utilization.memory,"
+    "memory.used,memory.total,power.draw"
+)
+APPS_QUERY = "timestamp,gpu_uuid,pid,process_name,used_memory"
+
+def parse_number(value):
+    """Parse a numeric nvidia-smi field, or None for '[N/A]' and friends."""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+class NvidiaStream:
+    """Keep one ``nvidia-smi ... --loop-ms`` process alive and feed its lines to a callback."""
+
+    def __init__(self, query_args, on_line, interval_ms=GPU_SAMPLE_INTERVAL_MS, executable=NVIDIA_SMI):
+        self.args = [executable, *query_args, "--format=csv,noheader,nounits", f"--loop-ms={interval_ms}"]
+        self.on_line = on_line
+        self.process = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def run(self):
+        backoff = 1
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.process = subprocess.Popen(
+                    self.args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                    text=True, bufsize=1,
+                )
+                for line in self.process.stdout:
+                    line = line.strip()
+                    if line:
+                        self.on_line([part.strip() for part in line.split(",")])
+                self.process.wait()
+            except Exception as e:
+                logger.error(f"Error reading {self.args[0]}: {e}")
+            finally:
+                if self.process is not None and self.process.poll() is None:
+                    self.process.kill()
+            if self.stop_event.is_set():
+                break
+            # Reset the backoff after a process that ran for a while
+            if time.monotonic() - started > GPU_MAX_BACKOFF:
+                backoff = 1
+            logger.warning(f"{self.args[0]} exited; restarting in {backoff}s")
+            if self.stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, GPU_MAX_BACKOFF)
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="muninn-nvidia-smi", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+class GPUSampler:
+    """Latest values and bounded history of every GPU and its compute processes.
+
+    One nvidia-smi process streams GPU metrics and another streams compute
+    applications; both are restarted with backoff if they die.
+    """
+
+    def __init__(self, interval_ms=GPU_SAMPLE_INTERVAL_MS, history=GPU_HISTORY, executable=NVIDIA_SMI):
+        self.interval = interval_ms / 1000
+        self.executable = executable
+        self.gpus = {}
+        self.history = {}
+        self.history_size = history
+        self.apps = []
+        self.apps_batch = []
+        self.apps_timestamp = None
+        self.apps_updated = 0.0
+        self.lock = threading.Lock()
+        self.streams = [
+            NvidiaStream([f"--query-gpu={GPU_QUERY}"], self.on_gpu_line, interval_ms, executable),
+            NvidiaStream([f"--query-compute-apps={APPS_QUERY}"], self.on_app_line, interval_ms, executable),
+        ]
+        self.running = False
+
+    @property
+    def available(self):
+        """Whether nvidia-smi can be found."""
+        return which(self.executable) is not None
+
+    def on_gpu_line(self, parts):
+        """Parse one line of GPU metrics."""
+        if len(parts) < 10:
+            return
+        gpu = {
+            'index': parts[1],
+            'uuid': parts[2],
+            'name': parts[3],
+            'temp': parts[4],
+            'gpu_util': parts[5],
+            'mem_util': parts[6],
+            'mem_used': parts[7],
+            'mem_total': parts[8],
+            'power': parts[9],
+            'updated': time.monotonic(),
+        }
+        with self.lock:
+            self.gpus[gpu['index']] = gpu
+            history = self.history.get(gpu['index'])
+            if history is None:
+                history = self.history[gpu['index']] = deque(maxlen=self.history_size)
+            history.append((gpu['updated'], parse_number(gpu['gpu_util']), parse_number(gpu['mem_used'])))
+
+    def on_app_line(self, parts):
+        """Parse one line of compute applications, grouped by sample timestamp."""
+        if len(parts) < 5:
+            return
+        with self.lock:
+            if parts[0] != self.apps_timestamp:
+                # A new sample started; the previous batch is complete
+                if self.apps_timestamp is not None:
+                    self.apps = self.apps_batch
+                self.apps_batch = []
+                self.apps_timestamp = parts[0]
+            self.apps_batch.append({
+                'gpu_uuid': parts[1],
+                'pid': parts[2],
+                'name': parts[3],
+                'mem_used': parts[4],
+            })
+            self.apps_updated = time.monotonic()
+
+    def latest(self):
+        """Get the latest GPU values sorted by index, or None without data."""
+        with self.lock:
+            if not self.gpus:
+                return None
+            stale = time.monotonic() - 3 * max(self.interval, 1)
+            gpus = [dict(gpu) for gpu in self.gpus.values() if gpu['updated'] >= stale]
+        return sorted(gpus, key=lambda gpu: int(gpu['index'])) or None
+
+    def processes(self):
+        """Get the compute processes of the latest sample."""
+        with self.lock:
+            # nvidia-smi prints nothing when no process uses a GPU
+            if time.monotonic() - self.apps_updated > 3 * max(self.interval, 1):
+                return []
+            # Until a sample is complete, fall back to the one being read
+            return list(self.apps or self.apps_batch)
+
+    def window(self, index, seconds):
+        """Get (avg, max) GPU utilisation of one GPU over the last ``seconds``."""
+        with self.lock:
+            history = list(self.history.get(index, ()))
+        cutoff = time.monotonic() - seconds
+        values = [util for updated, util, _ in history if updated >= cutoff and util is not None]
+        if not values:
+            return None
+        return sum(values) / len(values), max(values)
+
+    def start(self):
+        """Start the nvidia-smi streams if nvidia-smi is installed."""
+        if self.running or not self.available:
+            return
+        for stream in self.streams:
+            stream.start()
+        self.running = True
+        logger.info(f"GPU sampler started every {self.interval:g}s")
+
+    def stop(self):
+        """Stop the nvidia-smi streams."""
+        if not self.running:
+            return
+        for stream in self.streams:
+            stream.stop()
+        self.running = False
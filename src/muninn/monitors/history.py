@@ -0,0 +1,74 @@
+"""
+Metric history from the persistent store
+"""
+
+import time
+import logging
+from datetime import datetime
+
+from muninn.monitors.snapshots import CollectorError
+from muninn.utils.formatting import format_rate
+
+logger = logging.getLogger(__name__)
+
+# Human readable labels and value formatters for stored metrics
+HISTORY_METRICS = {
+    "cpu": ("CPU Usage", lambda value: f"{value:.1f}%"),
+    "mem": ("Memory Usage", lambda value: f"{value:.1f}%"),
+    "load": ("Load Average (1 min)", lambda value: f"{value:.2f}"),
+    "disk_read": ("Disk Read", format_rate),
+    "disk_write": ("Disk Write", format_rate),
+    "net_sent": ("Network Sent", format_rate),
+    "net_recv": ("Network Received", format_rate),
+}
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+SPARK_WIDTH = 24
+
+def sparkline(values, width=SPARK_WIDTH):
+    """Render values as a fixed-width sparkline of bin averages."""
+    if not values:
+        return ""
+    bins = []
+    count = min(width, len(values))
+    for i in range(count):
+        chunk = values[i * len(values) // count:(i + 1) * len(values) // count]
+        bins.append(sum(chunk) / len(chunk))
+    low, high = min(bins), max(bins)
+    span = (high - low) or 1
+    return "".join(SPARK_CHARS[int((value - low) / span * (len(SPARK_CHARS) - 1))] for value in bins)
+
+def get_history_info(store, metric, seconds):
+    """Get a summary of a stored metric over the last ``seconds``."""
+    if store is None:
+        return "Metric history is not available: the metrics store is disabled."
+    if metric not in HISTORY_METRICS:
+        # The argument is not echoed: Markdown has no escaping inside code spans
+        return f"Unknown metric. Available: {', '.join(HISTORY_METRICS)}"
+
+    try:
+        end = time.time()
+        tier, points = store.query(metric, end - seconds, end)
+        label, fmt = HISTORY_METRICS[metric]
+
+        if not points:
+            return f"No history recorded for *{label}* in this range yet."
+
+        low = min(point[1] for point in points)
+        high = max(point[3] for point in points)
+        avg = sum(point[2] for point in points) / len(points)
+        first = datetime.fromtimestamp(points[0][0]).strftime("%Y-%m-%d %H:%M")
+        last = datetime.fromtimestamp(points[-1][0]).strftime("%Y-%m-%d %H:%M")
+
+        reply = f"📈 *{label} History:*\n\n"
+        reply += f"`{sparkline([point[2] for point in points])}`\n\n"
+        reply += f"├─ Min: `{fmt(low)}`\n"
+        reply += f"├─ Avg: `{fmt(avg)}`\n"
+        reply += f"├─ Max: `{fmt(high)}`\n"
+        reply += f"├─ From: `{first}` to `{last}`\n"
+        reply += f"└─ Resolution: `{tier}` ({len(points)} points)\n"
+        return reply
+
+    except Exception as e:
+        logger.error(f"Error in get_history_info: {e}")
+        return CollectorError("history", f"Error retrieving metric history: {e}")
@@ -8,16 +8,20 @@ import subprocess
 import re
 from shutil import which
 
+from muninn.monitors.gpu import NVIDIA_SMI
+from muninn.monitors.sampler import WINDOWS
+from muninn.monitors.snapshots import CollectorError, GPU, GPUProcess, Load
+
 logger = logging.getLogger(__name__)
 
 def get_nvidia_gpu_info():
-    """Get information about NVIDIA GPUs using nvidia-smi."""
-    if not which('nvidia-smi'):
+    """Get information about NVIDIA GPUs with a one-off nvidia-smi call."""
+    if not which(NVIDIA_SMI):
         return None
     
     try:
         result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=index,name,temperature.gpu,utilization.gpu,utilization.memory,memory.used,memory.total,power.draw', 
+            [NVIDIA_SMI, '--query-gpu=index,name,temperature.gpu,utilization.gpu,utilization.memory,memory.used,memory.total,power.draw', 
              '--format=csv,noheader,nounits'],
             capture_output=True, text=True, check=True
         )
@@ -49,57 +53,59 @@ def get_nvidia_gpu_info():
         logger.error(f"Error getting GPU info: {e}")
         return None
 
-def get_load_info():
-    """Get server load information."""
+def get_load_info(sampler=None, gpu_sampler=None):
+    """Get server load information as a Load snapshot.
+
+    When a running sampler is given, CPU usage comes from its latest sample
+    instead of a blocking one-second measurement, and min/avg/max windows
+    are included. GPU data likewise comes from a running GPU sampler when
+    there is one, with per-process GPU memory.
+    """
     try:
         # Get load averages for the past 1, 5, and 15 minutes
         load1, load5, load15 = psutil.getloadavg()
         cpu_count = psutil.cpu_count()
         
-        # Calculate percentage
-        load1_percent = (load1 / cpu_count) * 100
-        load5_percent = (load5 / cpu_count) * 100
-        load15_percent = (load15 / cpu_count) * 100
-        
         # Get CPU usage percentage
-        cpu_percent = psutil.cpu_percent(interval=1)
+        sampled = sampler is not None and sampler.has_data()
+        busiest_core = cpu_windows = memory_window = None
+        if sampled:
+            cpu_percent = sampler.latest("cpu")
+            cores = [sampler.latest(f"cpu.{i}") for i in range(sampler.cpu_count)]
+            cores = [core for core in cores if core is not None]
+            busiest_core = max(cores) if cores else None
+            cpu_windows = [(label, sampler.window("cpu", seconds)) for label, seconds in WINDOWS]
+            memory_window = sampler.window("mem.percent", 3600)
+        else:
+            cpu_percent = psutil.cpu_percent(interval=1)
         
-        # Memory usage
         memory = psutil.virtual_memory()
-        memory_used_gb = memory.used / (1024 ** 3)
-        memory_total_gb = memory.total / (1024 ** 3)
-        memory_percent = memory.percent
-        
-        # Format response
-        reply = "⚡ *Server Load Information:*\n\n"
-        reply += f"*CPU Load Averages:*\n"
-        reply += f"├─ 1 min: `{load1:.2f}` ({load1_percent:.1f}%)\n"
-        reply += f"├─ 5 min: `{load5:.2f}` ({load5_percent:.1f}%)\n"
-        reply += f"└─ 15 min: `{load15:.2f}` ({load15_percent:.1f}%)\n\n"
-        
-        reply += f"*CPU Usage:* `{cpu_percent}%`\n\n"
-        
-        reply += f"*Memory Usage:*\n"
-        reply += f"├─ Used: `{memory_used_gb:.2f} GB` of `{memory_total_gb:.2f} GB`\n"
-        reply += f"└─ Percentage: `{memory_percent}%`\n"
         
-        # Get GPU information if available
-        gpus = get_nvidia_gpu_info()
-        if gpus:
-            reply += f"\n*GPU Information:*\n"
-            for i, gpu in enumerate(gpus):
-                reply += f"*GPU {gpu['index']}: {gpu['name']}*\n"
-                reply += f"├─ Temperature: `{gpu['temp']}°C`\n"
-                reply += f"├─ GPU Usage: `{gpu['gpu_util']}%`\n"
-                reply += f"├─ Memory: `{gpu['mem_used']} MB` / `{gpu['mem_total']} MB` (`{gpu['mem_util']}%`)\n"
-                reply += f"└─ Power: `{gpu['power']} W`\n"
-                
-                # Add a separator between GPUs except for the last one
-                if i < len(gpus) - 1:
-                    reply += "\n"
-        
-        return reply
+        return Load(
+            load1, load5, load15, cpu_count, cpu_percent, busiest_core, cpu_windows,
+            memory.used, memory.total, memory.percent, memory_window, get_gpus(gpu_sampler),
+        )
     
     except Exception as e:
         logger.error(f"Error in get_load_info: {e}")
-        return f"Error retrieving load information: {e}" 
\ No newline at end of file
+        return CollectorError("load", f"Error retrieving load information: {e}")
+
+def get_gpus(gpu_sampler=None):
+    """Get the GPUs from a running GPU sampler, or from a one-off nvidia-smi call."""
+    gpus = gpu_sampler.latest() if gpu_sampler is not None and gpu_sampler.running else None
+    processes = gpu_sampler.processes() if gpus else []
+    if gpus is None:
+        gpus = get_nvidia_gpu_info()
+    result = []
+    for gpu in gpus or []:
+        # Only streamed samples carry a uuid and history
+        window = gpu_sampler.window(gpu['index'], 300) if 'uuid' in gpu else None
+        gpu_processes = [
+            GPUProcess(process['pid'], process['name'], process['mem_used'])
+            for process in processes if process['gpu_uuid'] == gpu.get('uuid')
+        ]
+        result.append(GPU(
+            gpu['index'], gpu['name'], gpu['temp'], gpu['gpu_util'], gpu['mem_util'],
+            gpu['mem_used'], gpu['mem_total'], gpu['power'], window, gpu_processes,
+        ))
+    return result
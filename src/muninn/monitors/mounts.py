@@ -0,0 +1,155 @@
+"""
+Mount table read from /proc/self/mountinfo with change notification
+"""
+
+import re
+import select
+import logging
+import threading
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+MOUNTINFO_FILE = "/proc/self/mountinfo"
+# The kernel flags POLLPRI on this file whenever the mount table changes
+MOUNTS_FILE = "/proc/self/mounts"
+FILESYSTEMS_FILE = "/proc/filesystems"
+
+# Network filesystems are listed as "nodev" but are real storage
+NETWORK_FS_TYPES = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "ceph", "glusterfs", "9p", "fuse.sshfs")
+
+# Octal escapes used for spaces, tabs, newlines and backslashes in paths
+ESCAPE_RE = re.compile(r"\\([0-7]{3})")
+
+def unescape(path):
+    """Undo the octal escaping of a mountinfo path."""
+    if "\\" not in path:
+        return path
+    return ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 8)), path)
+
+class Mount:
+    """One entry of the mount table."""
+
+    __slots__ = ("mount_id", "device", "root", "mountpoint", "fstype", "source", "options")
+
+    def __init__(self, mount_id, device, root, mountpoint, fstype, source, options):
+        self.mount_id = mount_id
+        self.device = device
+        self.root = root
+        self.mountpoint = mountpoint
+        self.fstype = fstype
+        self.source = source
+        self.options = options
+
+def parse_mountinfo(text):
+    """Parse the content of a mountinfo file into Mount entries."""
+    mounts = []
+    for line in text.splitlines():
+        # mount_id parent_id major:minor root mountpoint options [optional...] - fstype source superoptions
+        left, sep, right = line.partition(" - ")
+        if not sep:
+            continue
+        fields = left.split()
+        tail = right.split()
+        if len(fields) < 6 or len(tail) < 2:
+            continue
+        mounts.append(Mount(
+            int(fields[0]), fields[2], unescape(fields[3]), unescape(fields[4]),
+            tail[0], unescape(tail[1]), fields[5],
+        ))
+    return mounts
+
+def read_nodev_types(path=FILESYSTEMS_FILE):
+    """Get the filesystem types that are not backed by a block device."""
+    try:
+        with open(path) as f:
+            return {line.split()[-1] for line in f if line.startswith("nodev")}
+    except OSError:
+        return set()
+
+class MountTable:
+    """Cached table of storage mounts.
+
+    ``/proc/self/mountinfo`` is parsed once and re-parsed only after the
+    kernel signals a mount change with POLLPRI on ``/proc/self/mounts``,
+    so an unchanged table costs a single non-blocking poll. Bind mounts
+    are collapsed to one entry per device id.
+    """
+
+    def __init__(self, mountinfo=MOUNTINFO_FILE, mounts=MOUNTS_FILE):
+        self.mountinfo = mountinfo
+        self.mounts_path = mounts
+        self.nodev = read_nodev_types()
+        self.entries = None
+        self.watch = None
+        self.poller = None
+        self.lock = threading.Lock()
+
+    def _open_watch(self):
+        """Open the file polled for mount changes, if the platform has one."""
+        try:
+            self.watch = open(self.mounts_path, "rb")
+            self.poller = select.poll()
+            self.poller.register(self.watch, select.POLLPRI | select.POLLERR)
+        except (OSError, AttributeError) as e:
+            logger.info(f"Mount change notification unavailable: {e}")
+            self.close()
+
+    def changed(self):
+        """Whether the mount table changed since the last check."""
+        if self.poller is None:
+            return True
+        return any(events & (select.POLLPRI | select.POLLERR) for _, events in self.poller.poll(0))
+
+    def is_storage(self, mount):
+        """Whether a mount is backed by a block device or a network share."""
+        if mount.fstype in NETWORK_FS_TYPES:
+            return True
+        return mount.source.startswith("/dev/") or (bool(self.nodev) and mount.fstype not in self.nodev)
+
+    def _load(self):
+        """Parse mountinfo into the deduplicated list of storage mounts."""
+        try:
+            with open(self.mountinfo) as f:
+                mounts = parse_mountinfo(f.read())
+        except OSError:
+            # No procfs (e.g. Windows or macOS): fall back to psutil
+            return [
+                Mount(None, partition.device, "/", partition.mountpoint,
+                      partition.fstype, partition.device, partition.opts)
+                for partition in psutil.disk_partitions(all=False)
+            ]
+
+        # Keep one mount per device, preferring the mount of the filesystem
+        # root and then the shortest mountpoint
+        by_device = {}
+        for mount in mounts:
+            if not self.is_storage(mount):
+                continue
+            key = (mount.device, mount.source) if mount.fstype in NETWORK_FS_TYPES else mount.device
+            best = by_device.get(key)
+            rank = (mount.root != "/", len(mount.mountpoint))
+            if best is None or rank < (best.root != "/", len(best.mountpoint)):
+                by_device[key] = mount
+        return sorted(by_device.values(), key=lambda m: m.mount_id)
+
+    def get(self):
+        """Get the storage mounts, re-parsing only after a change."""
+        with self.lock:
+            if self.watch is None and self.entries is None:
+                # Watch before the first parse so no change is missed
+                self._open_watch()
+            if self.entries is None or self.changed():
+                self.entries = self._load()
+            return list(self.entries)
+
+    def close(self):
+        """Stop watching for mount changes."""
+        if self.watch is not None:
+            self.watch.close()
+        self.watch = None
+        self.poller = None
+
+# Shared mount table used by the disk monitor
+mount_table = MountTable()
@@ -0,0 +1,83 @@
+"""
+Shared snapshot of the host's network connections
+"""
+
+import time
+import socket
+from collections import defaultdict
+
+import psutil
+
+def local_port(conn):
+    """Get the local port of a connection, or None."""
+    # Handle both namedtuple and tuple formats for compatibility
+    if hasattr(conn.laddr, 'port'):
+        return conn.laddr.port
+    if len(conn.laddr) >= 2:
+        return conn.laddr[1]
+    return None
+
+def local_address(conn):
+    """Get the local address of a connection, or None."""
+    if hasattr(conn.laddr, 'ip'):
+        return conn.laddr.ip
+    if len(conn.laddr) >= 1:
+        return conn.laddr[0]
+    return None
+
+def protocol_name(conn):
+    """Get 'TCP' or 'UDP' for a connection."""
+    return "TCP" if conn.type == socket.SOCK_STREAM else "UDP"
+
+class NetworkSnapshot:
+    """A single ``psutil.net_connections`` scan, indexed by port, status and pid.
+
+    Walking every process's file descriptors is the expensive part of a
+    connection scan, so one snapshot is taken per request (or sampler tick)
+    and shared by every network view.
+    """
+
+    __slots__ = ("timestamp", "connections", "by_port", "by_status", "by_pid")
+
+    def __init__(self, connections, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.connections = connections
+        self.by_port = defaultdict(list)
+        self.by_status = defaultdict(list)
+        self.by_pid = defaultdict(list)
+        for conn in connections:
+            port = local_port(conn)
+            if port is not None:
+                self.by_port[port].append(conn)
+            self.by_status[conn.status or "UNKNOWN"].append(conn)
+            if conn.pid:
+                self.by_pid[conn.pid].append(conn)
+
+    @classmethod
+    def collect(cls, kind="inet"):
+        """Scan the host's connections once."""
+        return cls(psutil.net_connections(kind=kind))
+
+    def listening(self):
+        """Get listening sockets sorted by port."""
+        return sorted(self.by_status.get(psutil.CONN_LISTEN, []), key=local_port)
+
+    def for_port(self, port, protocol=None):
+        """Get connections bound to a local port, optionally for one protocol."""
+        connections = self.by_port.get(port, [])
+        if protocol is None:
+            return list(connections)
+        protocol = protocol.upper()
+        return [conn for conn in connections if protocol_name(conn) == protocol]
+
+    def for_pid(self, pid):
+        """Get the connections owned by a process."""
+        return list(self.by_pid.get(pid, []))
+
+    def counts(self):
+        """Count connections per protocol and status."""
+        grouped = defaultdict(lambda: defaultdict(int))
+        for status, connections in self.by_status.items():
+            for conn in connections:
+                grouped[protocol_name(conn)][status] += 1
+        return grouped
@@ -0,0 +1,104 @@
+"""
+Cached process metadata for port-to-process resolution
+"""
+
+import re
+import logging
+import threading
+from collections import OrderedDict
+
+import psutil
+
+from muninn.utils.config import env_int
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of processes kept in the cache
+PROCESS_CACHE_SIZE = env_int("PROCESS_CACHE_SIZE", 1024)
+
+# Container ids as they appear in /proc/<pid>/cgroup (docker, containerd, cri-o)
+CONTAINER_ID_RE = re.compile(r"([0-9a-f]{64})")
+
+class ProcessInfo:
+    """Metadata of one process."""
+
+    __slots__ = ("pid", "name", "cmdline", "username", "container_id")
+
+    def __init__(self, pid, name, cmdline, username, container_id):
+        self.pid = pid
+        self.name = name
+        self.cmdline = cmdline
+        self.username = username
+        self.container_id = container_id
+
+def read_container_id(pid):
+    """Get the container id of a process from its cgroup, or None."""
+    try:
+        with open(f"/proc/{pid}/cgroup") as f:
+            match = CONTAINER_ID_RE.search(f.read())
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+class ProcessCache:
+    """Bounded LRU cache of process metadata keyed by (pid, create_time).
+
+    Including the creation time in the key means a reused pid is seen as a
+    new process. A hit costs the single stat read psutil needs to create a
+    Process object; a miss reads everything in one ``oneshot()`` batch.
+    """
+
+    def __init__(self, maxsize=PROCESS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, pid):
+        """Get the metadata of a process, or None if it is gone or inaccessible."""
+        if not pid:
+            return None
+        try:
+            process = psutil.Process(pid)
+            key = (pid, process.create_time())
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+        with self.lock:
+            info = self.entries.get(key)
+            if info is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return info
+            self.misses += 1
+
+        try:
+            with process.oneshot():
+                name = process.name()
+                try:
+                    cmdline = process.cmdline()
+                except psutil.AccessDenied:
+                    cmdline = []
+                try:
+                    username = process.username()
+                except (psutil.AccessDenied, KeyError):
+                    username = None
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        info = ProcessInfo(pid, name, cmdline, username, read_container_id(pid))
+
+        with self.lock:
+            self.entries[key] = info
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return info
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self.lock:
+            self.entries.clear()
+
+# Shared cache used by the network monitor
+process_cache = ProcessCache()
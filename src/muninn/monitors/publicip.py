@@ -0,0 +1,109 @@
+"""
+Public IP resolution with concurrent providers and a TTL cache
+"""
+
+import math
+import time
+import logging
+import ipaddress
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+
+from muninn.utils.config import env_list, env_float
+
+logger = logging.getLogger(__name__)
+
+# HTTP endpoints that answer with the caller's IP address as plain text
+PUBLIC_IP_PROVIDERS = env_list(
+    "PUBLIC_IP_PROVIDERS",
+    "https://ifconfig.me/ip,https://ipinfo.io/ip,https://api.ipify.org,https://icanhazip.com",
+)
+# Seconds a resolved address is served before being refreshed
+PUBLIC_IP_TTL = env_float("PUBLIC_IP_TTL", 3600.0)
+# Seconds to wait for the providers
+PUBLIC_IP_TIMEOUT = env_float("PUBLIC_IP_TIMEOUT", 5.0)
+# Seconds to wait before retrying after every provider failed
+PUBLIC_IP_RETRY = 60.0
+
+class PublicIPResolver:
+    """Resolve the public IP by racing HTTP providers in-process.
+
+    The first valid answer wins and is cached for ``ttl`` seconds. Once the
+    cached address is stale it is still returned while a background
+    refresh runs, so callers only wait when there is no address at all.
+    """
+
+    def __init__(self, providers=None, ttl=PUBLIC_IP_TTL, timeout=PUBLIC_IP_TIMEOUT):
+        self.providers = list(PUBLIC_IP_PROVIDERS if providers is None else providers)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.address = None
+        self.fetched = 0.0
+        self.failed = -math.inf
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.resolved = threading.Condition(self.lock)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.providers)), thread_name_prefix="muninn-publicip"
+        )
+
+    def fetch(self, url):
+        """Ask one provider for the address."""
+        request = urllib.request.Request(url, headers={"User-Agent": "curl/8.0 (Muninn)"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            text = response.read(64).decode("ascii", "replace").strip()
+        return str(ipaddress.ip_address(text))
+
+    def race(self):
+        """Query every provider concurrently and return the first valid address."""
+        futures = {self.executor.submit(self.fetch, url): url for url in self.providers}
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.debug(f"Public IP provider {futures[future]} failed: {e}")
+        except TimeoutError:
+            pass
+        finally:
+            for future in futures:
+                future.cancel()
+        logger.warning("No public IP provider answered")
+        return None
+
+    def refresh(self):
+        """Resolve the address now and update the cache."""
+        address = self.race()
+        with self.lock:
+            if address:
+                self.address = address
+                self.fetched = time.monotonic()
+            else:
+                self.failed = time.monotonic()
+            self.refreshing = False
+            self.resolved.notify_all()
+        return address
+
+    def get(self):
+        """Get the public IP address, or None if it cannot be determined."""
+        now = time.monotonic()
+        with self.lock:
+            if self.address and now - self.fetched < self.ttl:
+                return self.address
+            if self.refreshing and not self.address:
+                # Another caller is resolving; share its answer
+                self.resolved.wait(self.timeout)
+                return self.address
+            if self.refreshing or now - self.failed < PUBLIC_IP_RETRY:
+                return self.address
+            self.refreshing = True
+            stale = self.address
+
+        if stale:
+            threading.Thread(target=self.refresh, name="muninn-publicip-refresh", daemon=True).start()
+            return stale
+        return self.refresh()
+
+# Shared resolver used by the network monitor
+public_ip_resolver = PublicIPResolver()
@@ -0,0 +1,245 @@
+"""
+Background metric sampler backed by fixed-size ring buffers
+"""
+
+import time
+import math
+import logging
+import threading
+from array import array
+
+import psutil
+
+from muninn.utils.config import env_int, env_float
+
+logger = logging.getLogger(__name__)
+
+# Seconds between samples (0 disables the sampler)
+SAMPLER_INTERVAL = env_float("SAMPLER_INTERVAL", 5.0)
+# Seconds of history kept in memory
+SAMPLER_RETENTION = env_int("SAMPLER_RETENTION", 86400)
+# Maximum number of network interfaces tracked
+SAMPLER_MAX_NICS = env_int("SAMPLER_MAX_NICS", 16)
+
+# Windows shown by the monitors, as (label, seconds)
+WINDOWS = (("1m", 60), ("15m", 900), ("1h", 3600))
+
+NAN = float("nan")
+
+class MetricSampler:
+    """Periodically record host metrics into preallocated ring buffers.
+
+    Every series is an ``array('d')`` of ``capacity`` slots sharing one
+    timestamp ring, so memory is fixed when the series are created:
+    ``8 * capacity`` bytes per series. Counter series (disk and network
+    bytes) store raw totals; rates are derived on read.
+    """
+
+    def __init__(self, interval=SAMPLER_INTERVAL, retention=SAMPLER_RETENTION,
+                 max_nics=SAMPLER_MAX_NICS):
+        self.interval = interval
+        self.capacity = max(2, int(retention / interval)) if interval > 0 else 2
+        self.max_nics = max_nics
+        self.timestamps = array("d", [NAN]) * self.capacity
+        self.series = {}
+        self.counters = set()
+        self.nics = []
+        self.head = 0
+        self.count = 0
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.cpu_count = psutil.cpu_count() or 1
+        for name in ("cpu", "mem.percent", "mem.used", "mem.total",
+                     "load1", "load5", "load15"):
+            self._add_series(name)
+        for i in range(self.cpu_count):
+            self._add_series(f"cpu.{i}")
+        for name in ("disk.read_bytes", "disk.write_bytes"):
+            self._add_series(name, counter=True)
+
+    @property
+    def enabled(self):
+        """Whether the sampler is configured to run."""
+        return self.interval > 0
+
+    @property
+    def memory_bytes(self):
+        """Bytes allocated by the ring buffers."""
+        return 8 * self.capacity * (len(self.series) + 1)
+
+    def _add_series(self, name, counter=False):
+        self.series[name] = array("d", [NAN]) * self.capacity
+        if counter:
+            self.counters.add(name)
+
+    def _track_nic(self, nic):
+        """Start tracking a network interface if there is room for it."""
+        if nic in self.nics:
+            return True
+        if len(self.nics) >= self.max_nics:
+            return False
+        self.nics.append(nic)
+        self._add_series(f"net.{nic}.bytes_sent", counter=True)
+        self._add_series(f"net.{nic}.bytes_recv", counter=True)
+        return True
+
+    def add_listener(self, callback):
+        """Call ``callback(timestamp, values)`` after every sample."""
+        self.listeners.append(callback)
+
+    def read(self):
+        """Read the current metric values from the system."""
+        values = {}
+        values["cpu"] = psutil.cpu_percent(interval=None)
+        for i, percent in enumerate(psutil.cpu_percent(interval=None, percpu=True)):
+            values[f"cpu.{i}"] = percent
+
+        memory = psutil.virtual_memory()
+        values["mem.percent"] = memory.percent
+        values["mem.used"] = memory.used
+        values["mem.total"] = memory.total
+
+        values["load1"], values["load5"], values["load15"] = psutil.getloadavg()
+
+        disk = psutil.disk_io_counters()
+        if disk:
+            values["disk.read_bytes"] = disk.read_bytes
+            values["disk.write_bytes"] = disk.write_bytes
+
+        for nic, counters in psutil.net_io_counters(pernic=True).items():
+            values[f"net.{nic}.bytes_sent"] = counters.bytes_sent
+            values[f"net.{nic}.bytes_recv"] = counters.bytes_recv
+        return values
+
+    def record(self, timestamp, values):
+        """Store one sample in the ring buffers."""
+        with self.lock:
+            for name in values:
+                if name.startswith("net.") and name not in self.series:
+                    self._track_nic(name[4:].rsplit(".", 1)[0])
+
+            slot = self.head
+            self.timestamps[slot] = timestamp
+            for name, ring in self.series.items():
+                ring[slot] = values.get(name, NAN)
+            self.head = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+        for callback in self.listeners:
+            try:
+                callback(timestamp, values)
+            except Exception as e:
+                logger.error(f"Error in sampler listener: {e}")
+
+    def sample(self):
+        """Take and record one sample."""
+        self.record(time.time(), self.read())
+
+    def _slots(self, seconds=None):
+        """Get ring slots from oldest to newest, limited to the last ``seconds``."""
+        if self.count == 0:
+            return []
+        newest = (self.head - 1) % self.capacity
+        cutoff = self.timestamps[newest] - seconds if seconds else -math.inf
+        slots = []
+        for offset in range(self.count):
+            slot = (newest - offset) % self.capacity
+            if self.timestamps[slot] < cutoff:
+                break
+            slots.append(slot)
+        slots.reverse()
+        return slots
+
+    def has_data(self):
+        """Whether at least one sample has been recorded."""
+        return self.count > 0
+
+    def latest(self, name):
+        """Get the most recent value of a series, or None."""
+        with self.lock:
+            if self.count == 0 or name not in self.series:
+                return None
+            value = self.series[name][(self.head - 1) % self.capacity]
+        return None if math.isnan(value) else value
+
+    def rate(self, name, seconds=None):
+        """Get the per-second rate of a counter series.
+
+        Uses the last two samples, or the first and last samples of the
+        last ``seconds`` when given.
+        """
+        with self.lock:
+            if name not in self.series:
+                return None
+            if seconds:
+                slots = self._slots(seconds)
+                if len(slots) < 2:
+                    return None
+                first, last = slots[0], slots[-1]
+            else:
+                if self.count < 2:
+                    return None
+                last = (self.head - 1) % self.capacity
+                first = (self.head - 2) % self.capacity
+            ring = self.series[name]
+            elapsed = self.timestamps[last] - self.timestamps[first]
+            delta = ring[last] - ring[first]
+        if elapsed <= 0 or math.isnan(delta) or delta < 0:
+            return None
+        return delta / elapsed
+
+    def window(self, name, seconds):
+        """Get (min, avg, max) of a series over the last ``seconds``.
+
+        Counter series are summarised as per-second rates.
+        """
+        with self.lock:
+            if name not in self.series:
+                return None
+            ring = self.series[name]
+            slots = self._slots(seconds)
+            if name in self.counters:
+                values = []
+                for prev, slot in zip(slots, slots[1:]):
+                    elapsed = self.timestamps[slot] - self.timestamps[prev]
+                    delta = ring[slot] - ring[prev]
+                    if elapsed > 0 and delta >= 0:
+                        values.append(delta / elapsed)
+            else:
+                values = [ring[slot] for slot in slots if not math.isnan(ring[slot])]
+        if not values:
+            return None
+        return min(values), sum(values) / len(values), max(values)
+
+    def run(self):
+        """Sampling loop run by the background thread."""
+        # Prime psutil's CPU counters so the first sample is meaningful
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        while not self.stop_event.wait(self.interval - time.time() % self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error taking metric sample: {e}")
+        logger.info("Metric sampler stopped")
+
+    def start(self):
+        """Start sampling in a background thread."""
+        if not self.enabled or (self.thread and self.thread.is_alive()):
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="muninn-sampler", daemon=True)
+        self.thread.start()
+        logger.info(
+            f"Metric sampler started: every {self.interval:g}s, {self.capacity} slots, "
+            f"{self.memory_bytes / 1024 ** 2:.1f} MB"
+        )
+
+    def stop(self):
+        """Stop the background thread."""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
@@ -0,0 +1,94 @@
+"""
+Port to service name lookup backed by /etc/services
+"""
+
+import os
+import time
+import logging
+import threading
+
+from muninn.utils.config import env_map
+
+logger = logging.getLogger(__name__)
+
+SERVICES_FILE = "/etc/services"
+# Custom names for ports, e.g. "8080/tcp=internal-api,9100=node-exporter"
+SERVICE_OVERRIDES = env_map("SERVICE_OVERRIDES")
+# Minimum seconds between checks of the services file for changes
+SERVICES_CHECK_INTERVAL = 5.0
+
+def parse_overrides(overrides):
+    """Turn 'port[/protocol]' -> name entries into (port, protocol) keys."""
+    index = {}
+    for key, name in overrides.items():
+        port, _, protocol = key.partition("/")
+        if not port.isdigit():
+            logger.warning(f"Ignoring invalid service override: {key}={name}")
+            continue
+        protocols = [protocol.lower()] if protocol else ["tcp", "udp"]
+        for proto in protocols:
+            index[(int(port), proto)] = name
+    return index
+
+class ServiceIndex:
+    """Index of service names keyed by (port, protocol).
+
+    The services file is parsed once and re-parsed only when its inode,
+    mtime or size changes. Configured overrides take precedence.
+    """
+
+    def __init__(self, path=SERVICES_FILE, overrides=None):
+        self.path = path
+        self.overrides = parse_overrides(SERVICE_OVERRIDES if overrides is None else overrides)
+        self.index = {}
+        self.signature = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        index = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    parts = line.split("#", 1)[0].split()
+                    if len(parts) < 2:
+                        continue
+                    port, _, protocol = parts[1].partition("/")
+                    if port.isdigit() and protocol:
+                        # Keep the first name listed for a port, like getservbyport
+                        index.setdefault((int(port), protocol), parts[0])
+        except OSError as e:
+            logger.warning(f"Could not read {self.path}: {e}")
+        return index
+
+    def refresh(self, force=False):
+        """Reload the services file if it changed since the last check."""
+        now = time.monotonic()
+        if not force and now - self.checked < SERVICES_CHECK_INTERVAL:
+            return
+        with self.lock:
+            self.checked = now
+            signature = self._signature()
+            if force or signature != self.signature:
+                self.index = self._load()
+                self.signature = signature
+                logger.debug(f"Loaded {len(self.index)} services from {self.path}")
+
+    def lookup(self, port, protocol="tcp"):
+        """Get the service name for a port, or None."""
+        key = (port, protocol.lower())
+        name = self.overrides.get(key)
+        if name is not None:
+            return name
+        self.refresh()
+        return self.index.get(key)
+
+# Shared index used by the network monitor
+service_index = ServiceIndex()
@@ -0,0 +1,108 @@
+"""
+Typed results of the monitors, independent of how they are displayed
+"""
+
+class Snapshot:
+    """Base class of monitor results: compact objects built from ``__slots__``."""
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name in self.__slots__[len(args):]:
+            setattr(self, name, kwargs.pop(name, None))
+        if kwargs:
+            raise TypeError(f"Unknown fields for {type(self).__name__}: {', '.join(kwargs)}")
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class CollectorError(Snapshot):
+    """A monitor that failed or timed out."""
+
+    __slots__ = ("section", "message")
+
+class Status(Snapshot):
+    """The bot is up and answering."""
+
+    __slots__ = ("online",)
+
+class GPU(Snapshot):
+    """One NVIDIA GPU; ``window`` is the 5 minute (avg, max) utilisation of a streamed GPU."""
+
+    __slots__ = (
+        "index", "name", "temp", "gpu_util", "mem_util", "mem_used", "mem_total", "power",
+        "window", "processes",
+    )
+
+class GPUProcess(Snapshot):
+    """A compute process running on a GPU."""
+
+    __slots__ = ("pid", "name", "mem_used")
+
+class Load(Snapshot):
+    """Load averages, CPU, memory and GPU usage.
+
+    ``cpu_windows`` holds (label, (min, avg, max)) tuples and, like
+    ``busiest_core`` and ``memory_window``, is only set when sampled.
+    """
+
+    __slots__ = (
+        "load1", "load5", "load15", "cpu_count", "cpu_percent", "busiest_core", "cpu_windows",
+        "memory_used", "memory_total", "memory_percent", "memory_window", "gpus",
+    )
+
+class Partition(Snapshot):
+    """Usage of one mounted partition; ``io`` is a DeviceIO or None."""
+
+    __slots__ = ("mountpoint", "total", "used", "free", "percent", "io", "unresponsive", "retry_in")
+
+class Disk(Snapshot):
+    """Partitions and disk I/O; ``io_windows`` holds (label, read rate, write rate) tuples."""
+
+    __slots__ = ("partitions", "read_total", "write_total", "read_rate", "write_rate", "io_windows")
+
+class Container(Snapshot):
+    """One running container; ``usage`` is a ContainerUsage or None."""
+
+    __slots__ = ("id", "name", "image", "status", "usage", "ports")
+
+class Docker(Snapshot):
+    """Running containers, sorted by ``sort`` ("cpu", "mem") when set."""
+
+    __slots__ = ("containers", "sort")
+
+class Interface(Snapshot):
+    """One network interface; ``addresses`` holds (kind, address) tuples."""
+
+    __slots__ = (
+        "name", "is_up", "speed", "addresses", "bytes_sent", "bytes_recv",
+        "sent_rate", "recv_rate", "sent_peak", "recv_peak",
+    )
+
+class ListeningPort(Snapshot):
+    """A listening socket and what owns it."""
+
+    __slots__ = ("address", "port", "protocol", "service", "process", "container_id", "command")
+
+class Network(Snapshot):
+    """Public IP, interfaces, listening ports and connection counts by protocol and state."""
+
+    __slots__ = ("public_ip", "interfaces", "ports", "connections")
+
+class FleetHost(Snapshot):
+    """Summary of one agent reporting to the aggregator; ``age`` is the seconds since its last update."""
+
+    __slots__ = ("name", "online", "age", "load1", "cpu_percent", "memory_percent", "disk_percent", "containers")
+
+class Fleet(Snapshot):
+    """One page of the hosts reporting to the aggregator, out of ``total``."""
+
+    __slots__ = ("hosts", "total", "online")
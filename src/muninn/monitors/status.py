@@ -2,6 +2,8 @@
 Server status monitor
 """
 
+from muninn.monitors.snapshots import Status
+
 def get_status_info():
-    """Get server status information."""
-    return "✅ Server is online!" 
\ No newline at end of file
+    """Get server status information as a Status snapshot."""
+    return Status(True)
@@ -0,0 +1,6 @@
+"""
+Renderers turning monitor snapshots into Telegram Markdown, HTML or JSON
+"""
+
+from muninn.render.text import render_markdown, render_html
+from muninn.render.data import to_data, from_data, render_json
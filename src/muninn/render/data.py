@@ -0,0 +1,51 @@
+"""
+JSON-compatible data of monitor snapshots, for exporting and transferring them
+"""
+
+import json
+
+from muninn.monitors import snapshots
+from muninn.monitors.cgroups import ContainerUsage
+from muninn.monitors.diskstats import DeviceIO
+
+# Classes that can be rebuilt from their data, by name
+TYPES = {
+    cls.__name__: cls
+    for cls in (
+        snapshots.CollectorError, snapshots.Status, snapshots.GPU, snapshots.GPUProcess,
+        snapshots.Load, snapshots.Partition, snapshots.Disk, snapshots.Container,
+        snapshots.Docker, snapshots.Interface, snapshots.ListeningPort, snapshots.Network,
+        snapshots.FleetHost, snapshots.Fleet,
+        ContainerUsage, DeviceIO,
+    )
+}
+
+def to_data(value):
+    """Convert a snapshot into plain dicts, lists and scalars.
+
+    Objects become dicts tagged with their class name under "type".
+    """
+    if type(value).__name__ in TYPES:
+        data = {"type": type(value).__name__}
+        for name in value.__slots__:
+            data[name] = to_data(getattr(value, name))
+        return data
+    if isinstance(value, (list, tuple)):
+        return [to_data(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_data(item) for key, item in value.items()}
+    return value
+
+def from_data(data):
+    """Rebuild a snapshot from ``to_data()`` output; tuples come back as lists."""
+    if isinstance(data, list):
+        return [from_data(item) for item in data]
+    if isinstance(data, dict):
+        fields = {key: from_data(item) for key, item in data.items() if key != "type"}
+        cls = TYPES.get(data.get("type"))
+        return cls(**fields) if cls is not None else fields
+    return data
+
+def render_json(snapshot):
+    """Render a snapshot as a JSON document."""
+    return json.dumps(to_data(snapshot), ensure_ascii=False)
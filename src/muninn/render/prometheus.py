@@ -0,0 +1,232 @@
+"""
+Prometheus text exposition of monitor snapshots
+"""
+
+from muninn.monitors.gpu import parse_number
+from muninn.monitors.snapshots import CollectorError
+
+# Prometheus text format 0.0.4, which OpenMetrics scrapers accept too
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape_label(value):
+    """Escape a label value for the text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+class MetricFamily:
+    """One metric name with its help, type and samples.
+
+    At most ``max_series`` labelled samples are kept; the rest are counted
+    in ``dropped`` so a host with thousands of containers or ports cannot
+    blow up the scraper's series count.
+    """
+
+    __slots__ = ("name", "help", "type", "max_series", "samples", "dropped")
+
+    def __init__(self, name, help, type="gauge", max_series=None):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.max_series = max_series
+        self.samples = []
+        self.dropped = 0
+
+    def add(self, value, **labels):
+        """Add a sample; None values are skipped."""
+        if value is None:
+            return
+        if labels and self.max_series is not None and len(self.samples) >= self.max_series:
+            self.dropped += 1
+            return
+        self.samples.append((labels, value))
+
+    def render(self, parts):
+        if not self.samples:
+            return
+        parts.append(f"# HELP {self.name} {self.help}\n")
+        parts.append(f"# TYPE {self.name} {self.type}\n")
+        for labels, value in self.samples:
+            if labels:
+                label_text = ",".join(f'{key}="{escape_label(item)}"' for key, item in labels.items())
+                parts.append(f"{self.name}{{{label_text}}} {format_value(value)}\n")
+            else:
+                parts.append(f"{self.name} {format_value(value)}\n")
+
+class MetricSet:
+    """Metric families in the order they were first used."""
+
+    def __init__(self, max_series):
+        self.max_series = max_series
+        self.families = {}
+
+    def family(self, metric, description, kind="gauge", capped=False):
+        family = self.families.get(metric)
+        if family is None:
+            max_series = self.max_series if capped else None
+            family = self.families[metric] = MetricFamily(metric, description, kind, max_series)
+        return family
+
+    def add(self, metric, description, value, kind="gauge", capped=False, **labels):
+        """Add a sample to a metric, creating the metric on first use.
+
+        ``capped`` metrics keep at most ``max_series`` samples.
+        """
+        self.family(metric, description, kind, capped).add(value, **labels)
+
+    def dropped(self):
+        """Get the number of samples dropped by the series cap, by metric name."""
+        return {name: family.dropped for name, family in self.families.items() if family.dropped}
+
+    def render(self):
+        parts = []
+        for family in self.families.values():
+            family.render(parts)
+        return "".join(parts)
+
+def add_load(metrics, load):
+    metrics.add("muninn_load1", "1 minute load average", load.load1)
+    metrics.add("muninn_load5", "5 minute load average", load.load5)
+    metrics.add("muninn_load15", "15 minute load average", load.load15)
+    metrics.add("muninn_cpu_count", "Number of logical CPUs", load.cpu_count)
+    metrics.add("muninn_cpu_usage_percent", "CPU usage across all cores", load.cpu_percent)
+    metrics.add("muninn_cpu_busiest_core_percent", "Usage of the busiest CPU core", load.busiest_core)
+    metrics.add("muninn_memory_used_bytes", "Memory in use", load.memory_used)
+    metrics.add("muninn_memory_total_bytes", "Total memory", load.memory_total)
+    metrics.add("muninn_memory_usage_percent", "Memory usage", load.memory_percent)
+
+    for gpu in load.gpus or []:
+        labels = {"gpu": gpu.index, "name": gpu.name}
+        mem_used = parse_number(gpu.mem_used)
+        mem_total = parse_number(gpu.mem_total)
+        metrics.add("muninn_gpu_temperature_celsius", "GPU temperature", parse_number(gpu.temp), **labels)
+        metrics.add("muninn_gpu_utilization_percent", "GPU utilisation", parse_number(gpu.gpu_util), **labels)
+        metrics.add(
+            "muninn_gpu_memory_utilization_percent", "GPU memory controller utilisation",
+            parse_number(gpu.mem_util), **labels
+        )
+        metrics.add(
+            "muninn_gpu_memory_used_bytes", "GPU memory in use",
+            mem_used * 1024 ** 2 if mem_used is not None else None, **labels
+        )
+        metrics.add(
+            "muninn_gpu_memory_total_bytes", "Total GPU memory",
+            mem_total * 1024 ** 2 if mem_total is not None else None, **labels
+        )
+        metrics.add("muninn_gpu_power_watts", "GPU power draw", parse_number(gpu.power), **labels)
+
+def add_disk(metrics, disk):
+    devices = set()
+    for partition in disk.partitions:
+        labels = {"mountpoint": partition.mountpoint}
+        metrics.add(
+            "muninn_filesystem_unresponsive", "Whether the filesystem did not answer in time",
+            partition.unresponsive, **labels
+        )
+        if partition.unresponsive:
+            continue
+        metrics.add("muninn_filesystem_size_bytes", "Filesystem size", partition.total, **labels)
+        metrics.add("muninn_filesystem_used_bytes", "Filesystem space in use", partition.used, **labels)
+        metrics.add("muninn_filesystem_free_bytes", "Filesystem space available", partition.free, **labels)
+
+        io = partition.io
+        if io is None or io.name in devices:
+            continue
+        devices.add(io.name)
+        labels = {"device": io.name}
+        metrics.add("muninn_disk_read_iops", "Completed reads per second", io.read_iops, **labels)
+        metrics.add("muninn_disk_write_iops", "Completed writes per second", io.write_iops, **labels)
+        metrics.add("muninn_disk_read_bytes_per_second", "Bytes read per second", io.read_rate, **labels)
+        metrics.add("muninn_disk_write_bytes_per_second", "Bytes written per second", io.write_rate, **labels)
+        metrics.add(
+            "muninn_disk_await_seconds", "Average time per completed request",
+            io.await_ms / 1000, **labels
+        )
+        metrics.add("muninn_disk_utilization_percent", "Time the device was busy", io.util, **labels)
+
+    metrics.add("muninn_disk_read_bytes_total", "Bytes read from all disks since boot", disk.read_total, "counter")
+    metrics.add(
+        "muninn_disk_written_bytes_total", "Bytes written to all disks since boot", disk.write_total, "counter"
+    )
+
+def add_docker(metrics, docker):
+    metrics.add("muninn_containers_running", "Running Docker containers", len(docker.containers))
+    # Keep the biggest containers when there are more than the series cap
+    containers = sorted(
+        docker.containers, key=lambda c: (c.usage.memory or 0) if c.usage is not None else 0, reverse=True
+    )
+    for container in containers:
+        usage = container.usage
+        if usage is None:
+            continue
+        labels = {"name": container.name, "image": container.image}
+        samples = (
+            ("muninn_container_cpu_percent", "Container CPU usage", usage.cpu_percent, "gauge"),
+            ("muninn_container_memory_bytes", "Container memory in use", usage.memory, "gauge"),
+            ("muninn_container_memory_limit_bytes", "Container memory limit", usage.memory_limit or None, "gauge"),
+            ("muninn_container_oom_kills_total", "Container processes killed for lack of memory",
+             usage.oom_kills, "counter"),
+            ("muninn_container_read_bytes_per_second", "Container bytes read per second", usage.read_rate, "gauge"),
+            ("muninn_container_write_bytes_per_second", "Container bytes written per second",
+             usage.write_rate, "gauge"),
+        )
+        for metric, description, value, kind in samples:
+            metrics.add(metric, description, value, kind, capped=True, **labels)
+
+def add_network(metrics, network):
+    for interface in network.interfaces:
+        labels = {"interface": interface.name}
+        metrics.add("muninn_network_up", "Whether the interface is up", interface.is_up, **labels)
+        metrics.add(
+            "muninn_network_receive_bytes_total", "Bytes received by the interface",
+            interface.bytes_recv, "counter", **labels
+        )
+        metrics.add(
+            "muninn_network_transmit_bytes_total", "Bytes sent by the interface",
+            interface.bytes_sent, "counter", **labels
+        )
+
+    for port in network.ports:
+        metrics.add(
+            "muninn_listening_port_info", "Listening socket and the process owning it", 1,
+            capped=True, address=port.address, port=port.port, protocol=port.protocol, process=port.process,
+        )
+
+    for proto, statuses in (network.connections or {}).items():
+        for status, count in statuses.items():
+            metrics.add("muninn_network_connections", "Connections by protocol and state", count,
+                        protocol=proto, state=status)
+
+ADDERS = {
+    "load": add_load,
+    "disk": add_disk,
+    "docker": add_docker,
+    "network": add_network,
+}
+
+def render_metrics(results, ages=None, max_series=None, extra=None):
+    """Render collector results as Prometheus metrics.
+
+    ``results`` maps collector names to snapshots, ``ages`` to the age of
+    the cached result in seconds, and ``extra`` is called with the
+    MetricSet before rendering, to add self-metrics.
+    """
+    metrics = MetricSet(max_series)
+    for name, result in results.items():
+        ok = not isinstance(result, CollectorError)
+        metrics.add("muninn_collector_up", "Whether the collector succeeded", ok, collector=name)
+        if ages is not None:
+            metrics.add(
+                "muninn_collector_age_seconds", "Age of the collected data", ages.get(name) or 0.0,
+                collector=name,
+            )
+        if ok:
+            ADDERS[name](metrics, result)
+    if extra is not None:
+        extra(metrics)
+    return metrics.render()
@@ -0,0 +1,343 @@
+"""
+Telegram Markdown and HTML rendering of monitor snapshots
+"""
+
+from muninn.monitors.snapshots import CollectorError, Status, Load, Disk, Docker, Network, Fleet
+from muninn.utils.formatting import format_bytes, format_rate, format_window
+
+# Telegram rejects messages longer than 4096 characters
+MAX_MESSAGE_LENGTH = 4000
+TRUNCATED_LENGTH = 3950
+
+def escape_html(text):
+    """Escape HTML special characters."""
+    if not isinstance(text, str):
+        text = str(text)
+
+    # Replace special characters with their HTML entities
+    text = text.replace('&', '&amp;')
+    text = text.replace('<', '&lt;')
+    text = text.replace('>', '&gt;')
+
+    return text
+
+class MarkdownStyle:
+    """Telegram's legacy Markdown; it has no escaping, so text is used as is."""
+
+    name = "Markdown"
+
+    @staticmethod
+    def escape(text):
+        return str(text)
+
+    @staticmethod
+    def bold(text):
+        return f"*{text}*"
+
+    @staticmethod
+    def code(text):
+        return f"`{text}`"
+
+    @staticmethod
+    def critical(text):
+        return f"*{text}*"
+
+class HTMLStyle:
+    """Telegram HTML."""
+
+    name = "HTML"
+    escape = staticmethod(escape_html)
+
+    @staticmethod
+    def bold(text):
+        return f"<b>{text}</b>"
+
+    @staticmethod
+    def code(text):
+        return f"<code>{text}</code>"
+
+    @staticmethod
+    def critical(text):
+        return f"<u>{text}</u>"
+
+def branches(lines):
+    """Prefix lines with tree branches, the last one closing the tree."""
+    return [
+        f"{'└─' if i == len(lines) - 1 else '├─'} {line}\n" for i, line in enumerate(lines)
+    ]
+
+def render_error(error, style):
+    return style.escape(error.message)
+
+def render_status(status, style):
+    return "✅ Server is online!" if status.online else "❌ Server is offline!"
+
+def render_load(load, style):
+    b, c, e = style.bold, style.code, style.escape
+    parts = [
+        f"⚡ {b('Server Load Information:')}\n\n",
+        f"{b('CPU Load Averages:')}\n",
+    ]
+    averages = (("1 min", load.load1), ("5 min", load.load5), ("15 min", load.load15))
+    parts += branches([
+        f"{label}: {c(f'{value:.2f}')} ({value / load.cpu_count * 100:.1f}%)" for label, value in averages
+    ])
+    parts.append("\n")
+
+    parts.append(f"{b('CPU Usage:')} {c(f'{load.cpu_percent}%')}\n")
+    if load.cpu_windows is not None:
+        details = []
+        if load.busiest_core is not None:
+            details.append(f"Busiest core: {c(f'{load.busiest_core:.1f}%')}")
+        for label, stats in load.cpu_windows:
+            details.append(f"{label} min/avg/max: {c(f'{format_window(stats)}%')}")
+        parts += branches(details)
+    parts.append("\n")
+
+    used_gb = load.memory_used / (1024 ** 3)
+    total_gb = load.memory_total / (1024 ** 3)
+    memory = [
+        f"Used: {c(f'{used_gb:.2f} GB')} of {c(f'{total_gb:.2f} GB')}",
+        f"Percentage: {c(f'{load.memory_percent}%')}",
+    ]
+    if load.memory_window is not None:
+        memory.append(f"1h min/avg/max: {c(f'{format_window(load.memory_window)}%')}")
+    parts.append(f"{b('Memory Usage:')}\n")
+    parts += branches(memory)
+
+    if load.gpus:
+        parts.append(f"\n{b('GPU Information:')}\n")
+        for i, gpu in enumerate(load.gpus):
+            parts.append(f"{b(e(f'GPU {gpu.index}: {gpu.name}'))}\n")
+            lines = [
+                f"Temperature: {c(f'{gpu.temp}°C')}",
+                f"GPU Usage: {c(f'{gpu.gpu_util}%')}",
+            ]
+            if gpu.window:
+                lines.append(f"5m avg/max: {c(f'{gpu.window[0]:.1f}/{gpu.window[1]:.0f}%')}")
+            for process in gpu.processes or []:
+                lines.append(
+                    f"Process: {c(e(process.name))} ({process.pid}) {c(f'{process.mem_used} MB')}"
+                )
+            lines.append(
+                f"Memory: {c(f'{gpu.mem_used} MB')} / {c(f'{gpu.mem_total} MB')} ({c(f'{gpu.mem_util}%')})"
+            )
+            lines.append(f"Power: {c(f'{gpu.power} W')}")
+            parts += branches(lines)
+
+            # Add a separator between GPUs except for the last one
+            if i < len(load.gpus) - 1:
+                parts.append("\n")
+
+    return "".join(parts)
+
+def render_partition(partition, style):
+    b, c = style.bold, style.code
+    title = f"{b('Partition:')} {c(style.escape(partition.mountpoint))}"
+    if partition.unresponsive:
+        status = f"Status: {c('unresponsive')} ⚠️"
+        if partition.retry_in:
+            status += f" (retry in {partition.retry_in:.0f}s)"
+        return f"{title}\n{branches([status])[0]}\n"
+
+    # Highlight partitions with high usage
+    is_critical = partition.percent >= 90
+    if is_critical:
+        title = style.critical(title)
+        percent = f"({b(f'{partition.percent}%')} ⚠️)"
+    else:
+        percent = f"({partition.percent}%)"
+
+    lines = [
+        f"Total: {c(f'{partition.total / (1024 ** 3):.2f} GB')}",
+        f"Used: {c(f'{partition.used / (1024 ** 3):.2f} GB')} {percent}",
+        f"Free: {c(f'{partition.free / (1024 ** 3):.2f} GB')}",
+    ]
+    io = partition.io
+    if io is not None:
+        lines.append(
+            f"I/O ({style.escape(io.name)}): {c(f'R {io.read_iops:.0f} IOPS {format_rate(io.read_rate)}')} · "
+            f"{c(f'W {io.write_iops:.0f} IOPS {format_rate(io.write_rate)}')}"
+        )
+        busy = " ⚠️" if io.util >= 90 else ""
+        lines.append(f"Await: {c(f'{io.await_ms:.1f} ms')} · Util: {c(f'{io.util:.0f}%')}{busy}")
+    return f"{title}\n{''.join(branches(lines))}\n"
+
+def render_disk(disk, style):
+    b, c = style.bold, style.code
+    parts = [f"💾 {b('Disk Usage Information:')}\n\n"]
+    parts += [render_partition(partition, style) for partition in disk.partitions]
+
+    if disk.read_total is not None:
+        parts.append(f"{b('Disk I/O (since boot):')}\n")
+        parts += branches([
+            f"Read: {c(f'{disk.read_total / (1024 ** 2):.2f} MB')}",
+            f"Written: {c(f'{disk.write_total / (1024 ** 2):.2f} MB')}",
+        ])
+
+    if disk.io_windows is not None:
+        lines = [
+            f"Read: {c(format_rate(disk.read_rate))}",
+            f"Write: {c(format_rate(disk.write_rate))}",
+        ]
+        for label, read_avg, write_avg in disk.io_windows:
+            lines.append(f"{label} avg R/W: {c(format_rate(read_avg))} / {c(format_rate(write_avg))}")
+        parts.append(f"\n{b('Disk I/O (current):')}\n")
+        parts += branches(lines)
+
+    return "".join(parts)
+
+def render_docker(docker, style):
+    b, c, e = style.bold, style.code, style.escape
+    if not docker.containers:
+        return "No Docker containers are currently running."
+
+    if docker.sort is not None:
+        title = "CPU" if docker.sort == "cpu" else "memory"
+        parts = [f"🐳 {b(f'Top Docker containers by {title}:')}\n\n"]
+    else:
+        parts = [f"🐳 {b('Running Docker containers:')}\n\n"]
+
+    for container in docker.containers:
+        lines = [
+            f"Image: {c(e(container.image))}",
+            f"Status: {c(e(container.status))}",
+        ]
+        usage = container.usage
+        if usage is not None:
+            cpu = "N/A" if usage.cpu_percent is None else f"{usage.cpu_percent:.1f}%"
+            memory = format_bytes(usage.memory)
+            if usage.memory_limit:
+                memory += f" / {format_bytes(usage.memory_limit)}"
+            lines.append(f"CPU: {c(cpu)} · Memory: {c(memory)}")
+            if usage.read_rate is not None:
+                lines.append(f"IO: {c(f'R {format_rate(usage.read_rate)}')} · {c(f'W {format_rate(usage.write_rate)}')}")
+        if container.ports:
+            lines.append(f"Ports: {c(e(', '.join(container.ports)))}")
+        else:
+            lines.append("Ports: None")
+        parts.append(f"{b(e(container.name))}\n")
+        parts += branches(lines)
+        parts.append("\n")
+
+    return "".join(parts)
+
+def render_network(network, style):
+    b, c, e = style.bold, style.code, style.escape
+    parts = [
+        f"🌐 {b('Network Information:')}\n\n",
+        f"{b('Public IP:')} {c(e(network.public_ip))}\n\n",
+        f"{b('Network Interfaces:')}\n\n",
+    ]
+
+    for interface in network.interfaces:
+        status_icon = "🟢" if interface.is_up else "🔴"
+        speed = f" ({interface.speed} Mbps)" if interface.speed > 0 else ""
+        parts.append(f"{status_icon} {b(e(interface.name))}{speed}\n")
+        lines = [f"{kind}: {c(e(address))}" for kind, address in interface.addresses]
+        if interface.bytes_sent is None:
+            lines.append("No traffic statistics available")
+        else:
+            lines.append(f"Sent: {c(f'{interface.bytes_sent / (1024 * 1024):.2f} MB')}")
+            lines.append(f"Received: {c(f'{interface.bytes_recv / (1024 * 1024):.2f} MB')}")
+            if interface.sent_rate is not None or interface.recv_rate is not None:
+                lines.append(
+                    f"Rate: {c(f'↑ {format_rate(interface.sent_rate)} ↓ {format_rate(interface.recv_rate)}')}"
+                )
+                lines.append(
+                    f"15m peak: {c(f'↑ {format_rate(interface.sent_peak)} ↓ {format_rate(interface.recv_peak)}')}"
+                )
+        parts += branches(lines)
+        parts.append("\n")
+
+    if not network.ports:
+        parts.append(b("No listening ports found"))
+    else:
+        parts.append(f"{b('Open Ports:')}\n")
+        for port in network.ports:
+            command = port.command or "N/A"
+            if len(command) > 40:
+                command = command[:37] + "..."
+            service = port.service if port.service != port.process else "N/A"
+            lines = [
+                f"Service: {c(e(service))}",
+                f"Process: {c(e(port.process))}",
+            ]
+            if port.container_id:
+                lines.append(f"Container: {c(port.container_id[:12])}")
+            lines.append(f"Command: {c(e(command))}")
+            parts.append(f"{b(e(f'{port.address}:{port.port} ({port.protocol})'))}\n")
+            parts += branches(lines)
+            parts.append("\n")
+
+    if network.connections is None:
+        parts.append("Error retrieving connection information")
+    else:
+        parts.append(f"{b('Connection Statistics:')}\n")
+        for proto, statuses in network.connections.items():
+            counts = ", ".join(f"{status}: {count}" for status, count in statuses.items())
+            parts.append(f"{b(f'{proto}:')} {counts}\n")
+
+    return "".join(parts)
+
+def format_age(seconds):
+    """Format an age in seconds with its largest unit, e.g. '5m'."""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds // size:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+def render_fleet(fleet, style):
+    b, c = style.bold, style.code
+    parts = [f"🛰 {b(f'Fleet: {fleet.online} of {fleet.total} hosts online')}\n\n"]
+    if not fleet.hosts:
+        parts.append("No agents have connected yet.")
+    for host in fleet.hosts:
+        name = c(style.escape(host.name))
+        if not host.online:
+            seen = f"last seen {format_age(host.age)} ago" if host.age is not None else "never reported"
+            parts.append(f"🔴 {name} · {seen}\n")
+            continue
+        details = []
+        if host.load1 is not None:
+            details.append(f"load {c(f'{host.load1:.2f}')}")
+        if host.cpu_percent is not None:
+            details.append(f"CPU {c(f'{host.cpu_percent:.0f}%')}")
+        if host.memory_percent is not None:
+            details.append(f"mem {c(f'{host.memory_percent:.0f}%')}")
+        if host.disk_percent is not None:
+            busy = " ⚠️" if host.disk_percent >= 90 else ""
+            details.append(f"disk {c(f'{host.disk_percent:.0f}%')}{busy}")
+        if host.containers is not None:
+            details.append(f"🐳 {c(host.containers)}")
+        parts.append(f"🟢 {name} · {' · '.join(details)}\n")
+    return "".join(parts)
+
+RENDERERS = {
+    CollectorError: render_error,
+    Status: render_status,
+    Load: render_load,
+    Disk: render_disk,
+    Docker: render_docker,
+    Network: render_network,
+    Fleet: render_fleet,
+}
+
+def render(snapshot, style):
+    """Render a snapshot in a style; text results (history, du) pass through unchanged."""
+    if isinstance(snapshot, str):
+        return snapshot
+    text = RENDERERS[type(snapshot)](snapshot, style)
+    # Truncate if too long for Telegram, at a line so no entity is cut in half
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:TRUNCATED_LENGTH].rsplit("\n", 1)[0]
+        text += f"\n\n... {style.bold('Output truncated due to size limits')} ..."
+    return text
+
+def render_markdown(snapshot):
+    """Render a snapshot as Telegram Markdown."""
+    return render(snapshot, MarkdownStyle)
+
+def render_html(snapshot):
+    """Render a snapshot as Telegram HTML."""
+    return render(snapshot, HTMLStyle)
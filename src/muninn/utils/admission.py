@@ -0,0 +1,204 @@
+"""
+Admission control: per-user rate limits and concurrency limits for commands
+"""
+
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from functools import wraps
+
+from muninn.utils.config import env_int, env_float, env_map
+
+logger = logging.getLogger(__name__)
+
+# Tokens a user regains per second; 0 disables the per-user limit
+ADMISSION_RATE = env_float("ADMISSION_RATE", 0.5)
+# Tokens a user can spend at once
+ADMISSION_BURST = env_float("ADMISSION_BURST", 10.0)
+# Tokens a command of each class costs
+DEFAULT_ADMISSION_COSTS = {"light": 1, "heavy": 3, "scan": 5}
+ADMISSION_COSTS = dict(DEFAULT_ADMISSION_COSTS, **env_map("ADMISSION_COSTS", float))
+# Commands of each class running at the same time across all users
+DEFAULT_ADMISSION_CONCURRENCY = {"light": 8, "heavy": 2, "scan": 1}
+ADMISSION_CONCURRENCY = dict(DEFAULT_ADMISSION_CONCURRENCY, **env_map("ADMISSION_CONCURRENCY", int))
+# Commands of each class waiting for a slot before new ones are turned away
+DEFAULT_ADMISSION_QUEUE = {"light": 32, "heavy": 8, "scan": 2}
+ADMISSION_QUEUE = dict(DEFAULT_ADMISSION_QUEUE, **env_map("ADMISSION_QUEUE", int))
+# Users whose buckets are kept before full ones are pruned
+ADMISSION_MAX_USERS = env_int("ADMISSION_MAX_USERS", 1000)
+
+class RateLimiter:
+    """Token buckets per user that answer at once instead of waiting."""
+
+    def __init__(self, rate, burst, max_users=ADMISSION_MAX_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        # User id -> (tokens, monotonic time they were counted)
+        self.buckets = {}
+
+    def _tokens(self, user_id, now):
+        tokens, updated = self.buckets.get(user_id, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def take(self, user_id, cost):
+        """Take ``cost`` tokens, returning 0 or the seconds until the user has enough."""
+        if self.rate <= 0:
+            return 0.0
+        # A command costing more than the burst could never run otherwise
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        tokens = self._tokens(user_id, now)
+        if tokens < cost:
+            self.buckets[user_id] = (tokens, now)
+            return (cost - tokens) / self.rate
+        self.buckets[user_id] = (tokens - cost, now)
+        if len(self.buckets) > self.max_users:
+            self.prune(now)
+        return 0.0
+
+    def refund(self, user_id, cost):
+        """Give back tokens of a command that was turned away after all."""
+        if self.rate > 0 and user_id in self.buckets:
+            now = time.monotonic()
+            self.buckets[user_id] = (min(self.burst, self._tokens(user_id, now) + min(cost, self.burst)), now)
+
+    def prune(self, now):
+        """Forget users whose bucket has refilled."""
+        for user_id in list(self.buckets):
+            if self._tokens(user_id, now) >= self.burst:
+                del self.buckets[user_id]
+
+class CommandClass:
+    """Concurrency slots and the queue of one class of commands."""
+
+    __slots__ = ("name", "cost", "limit", "queue_size", "running", "waiters", "duration")
+
+    def __init__(self, name, cost, limit, queue_size):
+        self.name = name
+        self.cost = cost
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.running = 0
+        self.waiters = deque()
+        # Moving average of the run time, to estimate when a slot frees up
+        self.duration = 1.0
+
+    def retry_after(self):
+        """Estimate the seconds until a new command would get a slot."""
+        return self.duration * (len(self.waiters) + 1) / self.limit
+
+class AdmissionControl:
+    """Decide whether a command runs now, waits for a slot or is turned away.
+
+    Every command first pays its class's cost from the user's token bucket;
+    a user out of tokens is told when to try again. A paid command then
+    takes one of its class's slots, waits in the class's bounded queue
+    while all slots are busy, or is turned away (and refunded) when the
+    queue is full too. ``stats`` counts the outcomes per class.
+    """
+
+    def __init__(self, rate=ADMISSION_RATE, burst=ADMISSION_BURST, costs=ADMISSION_COSTS,
+                 concurrency=ADMISSION_CONCURRENCY, queues=ADMISSION_QUEUE):
+        self.limiter = RateLimiter(rate, burst)
+        self.classes = {
+            name: CommandClass(name, cost, concurrency.get(name, 1), queues.get(name, 0))
+            for name, cost in costs.items()
+        }
+        self.stats = {
+            name: {"admitted": 0, "queued": 0, "rate_limited": 0, "busy": 0} for name in self.classes
+        }
+        # User id -> monotonic time until which rejections are not answered again
+        self.notified = {}
+
+    async def acquire(self, user_id, kind):
+        """Wait for a slot of the class.
+
+        Returns None once the command may run, or a ``(reason, seconds)``
+        pair when it was turned away; reason is 'rate_limited' or 'busy'.
+        """
+        command_class = self.classes[kind]
+        stats = self.stats[kind]
+        wait = self.limiter.take(user_id, command_class.cost)
+        if wait:
+            stats["rate_limited"] += 1
+            return "rate_limited", wait
+        if command_class.running < command_class.limit and not command_class.waiters:
+            command_class.running += 1
+            stats["admitted"] += 1
+            return None
+        if len(command_class.waiters) >= command_class.queue_size:
+            self.limiter.refund(user_id, command_class.cost)
+            stats["busy"] += 1
+            return "busy", command_class.retry_after()
+
+        waiter = asyncio.get_running_loop().create_future()
+        command_class.waiters.append(waiter)
+        stats["queued"] += 1
+        try:
+            # release() hands its slot over by resolving the future
+            await waiter
+        except asyncio.CancelledError:
+            if waiter in command_class.waiters:
+                command_class.waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release(kind)
+            raise
+        stats["admitted"] += 1
+        return None
+
+    def release(self, kind, duration=None):
+        """Free a slot, handing it to the next waiting command."""
+        command_class = self.classes[kind]
+        if duration is not None:
+            command_class.duration = 0.8 * command_class.duration + 0.2 * duration
+        while command_class.waiters:
+            waiter = command_class.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        command_class.running -= 1
+
+    def should_notify(self, user_id, seconds):
+        """Whether to answer a rejection; a client retrying in a loop gets one answer per wait."""
+        now = time.monotonic()
+        if self.notified.get(user_id, 0.0) > now:
+            return False
+        if len(self.notified) > ADMISSION_MAX_USERS:
+            self.notified = {user: until for user, until in self.notified.items() if until > now}
+        self.notified[user_id] = now + seconds
+        return True
+
+# Shared by every command, like the authorized user list
+ADMISSION = AdmissionControl()
+
+def admitted(kind):
+    """Decorator applying admission control for a class of commands.
+
+    Use it below ``restricted`` so unauthorized users are turned away first.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapped(update, context, *args, **kwargs):
+            user_id = update.effective_user.id
+            rejection = await ADMISSION.acquire(user_id, kind)
+            if rejection is not None:
+                reason, seconds = rejection
+                seconds = max(1, math.ceil(seconds))
+                if ADMISSION.should_notify(user_id, seconds):
+                    logger.warning(f"Turned away {func.__name__} from user {user_id} ({reason})")
+                    if reason == "busy":
+                        text = f"⏳ The server is busy with other requests. Try again in {seconds}s."
+                    else:
+                        text = f"⏳ Too many requests. Try again in {seconds}s."
+                    await update.message.reply_text(text)
+                return
+            started = time.monotonic()
+            try:
+                return await func(update, context, *args, **kwargs)
+            finally:
+                ADMISSION.release(kind, time.monotonic() - started)
+        return wrapped
+    return decorator
@@ -0,0 +1,53 @@
+"""
+Immediate alerts for container failures
+"""
+
+import asyncio
+import logging
+
+from muninn.monitors.docker import container_name
+from muninn.utils.config import env_list
+
+logger = logging.getLogger(__name__)
+
+# Chats that receive container alerts
+ALERT_CHAT_IDS = [int(chat_id) for chat_id in env_list("ALERT_CHAT_IDS")]
+
+def format_container_alert(kind, container):
+    """Format an alert message for a container event."""
+    name = container_name(container)
+    image = container.get("ImageName", "")
+    if kind == "crash":
+        headline = f"💥 *Container crashed:* `{name}`"
+        detail = f"└─ Exit code: `{container.get('ExitCode')}`"
+    elif kind == "oom":
+        headline = f"🧠 *Container OOM-killed:* `{name}`"
+        detail = "└─ The kernel killed a process for exceeding the memory limit"
+    else:
+        headline = f"🩺 *Container unhealthy:* `{name}`"
+        detail = "└─ Health check is failing"
+    return f"{headline}\n├─ Image: `{image}`\n{detail}"
+
+def container_alert_listener(delivery, loop, chat_ids=None):
+    """Create a Docker event listener that sends alerts through the delivery queue.
+
+    The queue runs in the bot's event loop, so alerts share its flood
+    limits and RetryAfter pauses with every other outgoing message.
+    """
+    chat_ids = ALERT_CHAT_IDS if chat_ids is None else chat_ids
+
+    async def send(text):
+        for chat_id in chat_ids:
+            try:
+                if not await delivery.send(chat_id, text, parse_mode="Markdown"):
+                    logger.error(f"Could not deliver container alert to {chat_id}")
+            except Exception as e:
+                logger.error(f"Error sending container alert to {chat_id}: {e}")
+
+    def listener(kind, container):
+        # Called from the Docker events thread
+        logger.warning(f"Container {kind}: {container_name(container)}")
+        if chat_ids:
+            asyncio.run_coroutine_threadsafe(send(format_container_alert(kind, container)), loop)
+
+    return listener
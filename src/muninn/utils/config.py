@@ -0,0 +1,71 @@
+"""
+Configuration helpers for Muninn
+"""
+
+import os
+import logging
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Make .env values visible to every module that reads its settings on import
+load_dotenv()
+
+def env_int(name, default):
+    """Read an integer setting from the environment."""
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid integer for {name}: {value!r}, using {default}")
+        return default
+
+def env_float(name, default):
+    """Read a float setting from the environment."""
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid number for {name}: {value!r}, using {default}")
+        return default
+
+def env_list(name, default=""):
+    """Read a comma-separated list setting from the environment."""
+    value = os.getenv(name, default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def env_map(name, convert=str, default=""):
+    """Read a comma-separated 'key=value' setting from the environment."""
+    result = {}
+    for item in env_list(name, default):
+        key, sep, value = item.partition("=")
+        if not sep:
+            logger.warning(f"Ignoring malformed entry in {name}: {item!r}")
+            continue
+        try:
+            result[key.strip()] = convert(value.strip())
+        except ValueError:
+            logger.warning(f"Ignoring invalid value in {name}: {item!r}")
+    return result
+
+# Units accepted by parse_duration, in seconds
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+def parse_duration(text):
+    """Parse a duration such as '90s', '15m', '24h' or '7d' into seconds."""
+    text = text.strip().lower()
+    if text.isdigit():
+        return int(text)
+    number, unit = text[:-1], text[-1:]
+    if unit not in DURATION_UNITS or not number.replace(".", "", 1).isdigit():
+        raise ValueError(f"Invalid duration: {text!r}")
+    return int(float(number) * DURATION_UNITS[unit])
+
+# Directory for persistent state (metrics, schedules)
+DATA_DIR = os.path.expanduser(
+    os.getenv("MUNINN_DATA_DIR", os.path.join("~", ".local", "share", "muninn"))
+)
@@ -0,0 +1,207 @@
+"""
+Rate-limited message delivery that respects Telegram's flood limits
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+
+from telegram.error import RetryAfter, TimedOut, NetworkError, Forbidden, BadRequest
+
+from muninn.utils.config import env_int, env_float
+
+logger = logging.getLogger(__name__)
+
+# Messages per second across all chats (Telegram allows about 30)
+DELIVERY_GLOBAL_RATE = env_float("DELIVERY_GLOBAL_RATE", 25.0)
+# Seconds between two messages to the same chat (Telegram allows about 1/s)
+DELIVERY_CHAT_INTERVAL = env_float("DELIVERY_CHAT_INTERVAL", 1.0)
+# Messages waiting for delivery before senders are made to wait
+DELIVERY_QUEUE_SIZE = env_int("DELIVERY_QUEUE_SIZE", 1000)
+# Concurrent send requests
+DELIVERY_WORKERS = env_int("DELIVERY_WORKERS", 8)
+# Attempts per message on timeouts and network errors
+DELIVERY_ATTEMPTS = 3
+
+class TokenBucket:
+    """Token bucket for an asyncio loop; ``acquire()`` waits for a token."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # No token is handed out before this time, see pause()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Take one token, returning the seconds spent waiting for it."""
+        async with self.lock:
+            waited = 0.0
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+                # Checked again after the sleep, as a pause may have started meanwhile
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def pause(self, seconds):
+        """Hand out no token for ``seconds``; the bucket refills from empty afterwards."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+class Message:
+    """One message waiting for delivery."""
+
+    __slots__ = ("chat_id", "text", "parse_mode", "queued", "attempts", "done")
+
+    def __init__(self, chat_id, text, parse_mode, done):
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+        self.queued = time.monotonic()
+        self.attempts = 0
+        self.done = done
+
+class DeliveryQueue:
+    """Send messages through a global token bucket and a per-chat interval.
+
+    Messages to one chat are sent in order; different chats are served
+    concurrently by a few worker tasks. ``RetryAfter`` pauses the chat (and
+    the global bucket) for the time Telegram asks, then the message is
+    retried. ``send()`` waits while the queue is full, so producers slow
+    down instead of piling up messages. ``stats`` holds backpressure counters.
+    """
+
+    def __init__(self, bot, rate=DELIVERY_GLOBAL_RATE, chat_interval=DELIVERY_CHAT_INTERVAL,
+                 size=DELIVERY_QUEUE_SIZE, workers=DELIVERY_WORKERS):
+        self.bot = bot
+        # No burst, so no one-second window ever exceeds the rate
+        self.bucket = TokenBucket(rate, burst=1)
+        self.chat_interval = chat_interval
+        self.size = size
+        self.workers = workers
+        self.chats = {}
+        self.next_send = {}
+        self.ready = None
+        self.slots = None
+        self.tasks = []
+        self.stats = {
+            "queued": 0, "sent": 0, "failed": 0, "retried": 0, "rate_limited": 0,
+            "blocked": 0, "depth": 0, "max_depth": 0, "wait_seconds": 0.0,
+        }
+
+    def start(self):
+        """Start the worker tasks in the running loop."""
+        self.ready = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.size)
+        loop = asyncio.get_running_loop()
+        self.tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers, dropping undelivered messages."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def send(self, chat_id, text, parse_mode=None):
+        """Queue a message and wait until it is delivered or given up.
+
+        Returns whether the message was delivered.
+        """
+        if self.slots.locked():
+            self.stats["blocked"] += 1
+        await self.slots.acquire()
+        done = asyncio.get_running_loop().create_future()
+        message = Message(chat_id, text, parse_mode, done)
+        self.stats["queued"] += 1
+        self.stats["depth"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.stats["depth"])
+        queue = self.chats.get(chat_id)
+        if queue is None:
+            queue = self.chats[chat_id] = deque()
+        queue.append(message)
+        if len(queue) == 1:
+            self._schedule(chat_id)
+        return await done
+
+    def _schedule(self, chat_id):
+        """Mark a chat ready once its per-chat interval has passed."""
+        delay = self.next_send.get(chat_id, 0.0) - time.monotonic()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.ready.put_nowait, chat_id)
+        else:
+            self.next_send.pop(chat_id, None)
+            self.ready.put_nowait(chat_id)
+
+    def _forget(self, chat_id):
+        """Drop the interval of a chat with nothing queued once it has passed."""
+        if chat_id not in self.chats and self.next_send.get(chat_id, 0.0) <= time.monotonic():
+            self.next_send.pop(chat_id, None)
+
+    def _finish(self, message, delivered):
+        self.stats["depth"] -= 1
+        self.stats["sent" if delivered else "failed"] += 1
+        self.stats["wait_seconds"] += time.monotonic() - message.queued
+        self.slots.release()
+        if not message.done.done():
+            message.done.set_result(delivered)
+
+    async def _work(self):
+        while True:
+            chat_id = await self.ready.get()
+            queue = self.chats.get(chat_id)
+            if not queue:
+                continue
+            message = queue[0]
+            await self.bucket.acquire()
+            delivered = None
+            try:
+                message.attempts += 1
+                await self.bot.send_message(chat_id=chat_id, text=message.text, parse_mode=message.parse_mode)
+                delivered = True
+            except RetryAfter as e:
+                # Flood control: wait as long as Telegram asks, then retry
+                retry_after = float(e.retry_after)
+                self.stats["rate_limited"] += 1
+                self.stats["retried"] += 1
+                self.bucket.pause(retry_after)
+                self.next_send[chat_id] = time.monotonic() + retry_after
+                logger.warning(f"Flood limit hit sending to chat {chat_id}; retrying in {retry_after:g}s")
+            except (Forbidden, BadRequest) as e:
+                logger.error(f"Dropping message to chat {chat_id}: {e}")
+                delivered = False
+            except (TimedOut, NetworkError) as e:
+                if message.attempts >= DELIVERY_ATTEMPTS:
+                    logger.error(f"Giving up sending to chat {chat_id}: {e}")
+                    delivered = False
+                else:
+                    self.stats["retried"] += 1
+                    self.next_send[chat_id] = time.monotonic() + 2 ** message.attempts
+            except Exception as e:
+                logger.error(f"Error sending to chat {chat_id}: {e}")
+                delivered = False
+
+            if delivered is not None:
+                queue.popleft()
+                self._finish(message, delivered)
+                self.next_send[chat_id] = time.monotonic() + self.chat_interval
+            if queue:
+                self._schedule(chat_id)
+            else:
+                del self.chats[chat_id]
+                # Forget the chat's interval once it has passed, so idle chats take no memory
+                delay = self.next_send.get(chat_id, 0.0) - time.monotonic()
+                asyncio.get_running_loop().call_later(max(0.0, delay), self._forget, chat_id)
@@ -0,0 +1,129 @@
+"""
+Prometheus metrics endpoint served from the bot's event loop
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+from muninn.render.prometheus import CONTENT_TYPE, render_metrics
+from muninn.utils.admission import ADMISSION
+from muninn.utils.config import env_int, env_float
+from muninn.utils.http import HTTPError, read_request, write_response
+
+logger = logging.getLogger(__name__)
+
+# Port of the /metrics endpoint; 0 disables it
+METRICS_PORT = env_int("METRICS_PORT", 0)
+# Address the endpoint listens on
+METRICS_ADDRESS = os.getenv("METRICS_ADDRESS", "127.0.0.1")
+# Seconds a cached collector result is served to scrapes before it is collected again.
+# At or above the scrape interval, most scrapes are served from the cache;
+# below it, every scrape runs a full collection.
+METRICS_MAX_AGE = env_float("METRICS_MAX_AGE", 30.0)
+# Samples kept per labelled metric, e.g. per-container or per-port series
+METRICS_MAX_SERIES = env_int("METRICS_MAX_SERIES", 200)
+# Collectors exported on every scrape
+METRICS_COLLECTORS = ("load", "disk", "docker", "network")
+# Seconds a client gets to send its request
+METRICS_REQUEST_TIMEOUT = 5.0
+
+class MetricsExporter:
+    """Minimal asyncio HTTP server answering ``GET /metrics``.
+
+    Scrapes reuse the monitors' cached results (up to ``max_age`` seconds
+    old) and share in-flight collections with bot commands, so frequent
+    scrapes cost little more than rendering text. Every labelled metric
+    is capped at ``max_series`` samples; the number dropped is exported.
+    """
+
+    def __init__(self, monitors, port=METRICS_PORT, address=METRICS_ADDRESS,
+                 max_age=METRICS_MAX_AGE, max_series=METRICS_MAX_SERIES):
+        self.monitors = monitors
+        self.port = port
+        self.address = address
+        self.max_age = max_age
+        self.max_series = max_series
+        self.delivery = None
+        self.server = None
+        self.scrapes = 0
+
+    async def start(self):
+        """Start listening in the running loop."""
+        self.server = await asyncio.start_server(self._handle, self.address, self.port)
+        logger.info(f"Serving metrics on http://{self.address}:{self.port}/metrics")
+
+    async def stop(self):
+        """Stop listening."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def collect(self):
+        """Render the current metrics."""
+        started = time.perf_counter()
+        self.scrapes += 1
+        names = METRICS_COLLECTORS
+        results = await asyncio.gather(*(self.monitors.collect(name, max_age=self.max_age) for name in names))
+        ages = {name: self.monitors.age(name, result=result) for name, result in zip(names, results)}
+
+        def add_self_metrics(metrics):
+            for metric, dropped in metrics.dropped().items():
+                metrics.add(
+                    "muninn_exporter_dropped_series", "Samples dropped by the series cap",
+                    dropped, family=metric,
+                )
+            if self.delivery is not None:
+                stats = self.delivery.stats
+                for result in ("sent", "failed", "retried", "rate_limited"):
+                    metrics.add(
+                        "muninn_delivery_messages_total", "Messages handled by the delivery queue",
+                        stats[result], "counter", result=result,
+                    )
+                metrics.add("muninn_delivery_queue_depth", "Messages waiting for delivery", stats["depth"])
+            for kind, stats in ADMISSION.stats.items():
+                for result in ("admitted", "queued", "rate_limited", "busy"):
+                    metrics.add(
+                        "muninn_admission_requests_total", "Commands by admission outcome",
+                        stats[result], "counter", **{"class": kind}, result=result,
+                    )
+                command_class = ADMISSION.classes[kind]
+                metrics.add("muninn_admission_running", "Commands running", command_class.running, **{"class": kind})
+                metrics.add(
+                    "muninn_admission_queue_depth", "Commands waiting for a slot",
+                    len(command_class.waiters), **{"class": kind},
+                )
+            metrics.add("muninn_exporter_scrapes_total", "Scrapes served", self.scrapes, "counter")
+            metrics.add(
+                "muninn_exporter_scrape_duration_seconds", "Time spent collecting and rendering metrics",
+                time.perf_counter() - started,
+            )
+
+        return render_metrics(dict(zip(names, results)), ages, self.max_series, add_self_metrics)
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await read_request(reader, timeout=METRICS_REQUEST_TIMEOUT)
+            if request is None:
+                return
+            if request.method not in ("GET", "HEAD"):
+                await write_response(writer, "405 Method Not Allowed", "Method not allowed\n")
+            elif request.path != "/metrics":
+                await write_response(writer, "404 Not Found", "Metrics are served at /metrics\n")
+            else:
+                body = await self.collect()
+                await write_response(writer, "200 OK", body, CONTENT_TYPE, head=request.method == "HEAD")
+        except HTTPError as e:
+            await write_response(writer, e.status, f"{e.message}\n")
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Error serving metrics: {e}")
+            try:
+                await write_response(writer, "500 Internal Server Error", "Error collecting metrics\n")
+            except Exception:
+                pass
+        finally:
+            writer.close()
@@ -0,0 +1,29 @@
+"""
+Formatting helpers shared by the monitors
+"""
+
+def format_rate(bytes_per_second):
+    """Format a byte rate with a human readable unit."""
+    if bytes_per_second is None:
+        return "N/A"
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.1f} {unit}"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.1f} GB/s"
+
+def format_bytes(value):
+    """Format a byte count with a human readable unit."""
+    if value is None:
+        return "N/A"
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+def format_window(stats, fmt="{:.1f}"):
+    """Format a (min, avg, max) tuple as 'min/avg/max'."""
+    if stats is None:
+        return "N/A"
+    return "/".join(fmt.format(value) for value in stats)
@@ -0,0 +1,93 @@
+"""
+Minimal HTTP/1.1 handling for the bot's built-in asyncio listeners
+"""
+
+import asyncio
+
+# Seconds a client gets to send the head of a request
+HTTP_REQUEST_TIMEOUT = 10.0
+# Longest accepted request head
+HTTP_MAX_HEAD = 16 * 1024
+
+class HTTPError(Exception):
+    """A request that must be answered with an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    """One parsed HTTP request; header names are lower case."""
+
+    __slots__ = ("method", "path", "query", "version", "headers", "body")
+
+    def __init__(self, method, path, query, version, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+async def read_request(reader, max_body=0, timeout=HTTP_REQUEST_TIMEOUT):
+    """Read one request, or return None when the client closed the connection.
+
+    Raises HTTPError for malformed requests and bodies over ``max_body`` bytes.
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HTTPError("400 Bad Request", "Incomplete request")
+    except asyncio.LimitOverrunError:
+        raise HTTPError("431 Request Header Fields Too Large", "Request head is too large")
+    if len(head) > HTTP_MAX_HEAD:
+        raise HTTPError("431 Request Header Fields Too Large", "Request head is too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise HTTPError("400 Bad Request", "Malformed request line")
+    method, target, version = parts
+    path, _, query = target.partition("?")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers:
+        raise HTTPError("411 Length Required", "Chunked requests are not supported")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError("400 Bad Request", "Invalid Content-Length")
+    if length < 0 or length > max_body:
+        raise HTTPError("413 Payload Too Large", "Request body is too large")
+    body = b""
+    if length:
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), timeout)
+        except asyncio.IncompleteReadError:
+            raise HTTPError("400 Bad Request", "Incomplete request body")
+    return Request(method, path, query, version, headers, body)
+
+async def write_response(writer, status, body="", content_type="text/plain; charset=utf-8",
+                         keep_alive=False, head=False):
+    """Write a complete response with a Content-Length."""
+    data = body.encode("utf-8") if isinstance(body, str) else body
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+    )
+    if not head:
+        writer.write(data)
+    await writer.drain()
@@ -3,117 +3,107 @@ Reporting utilities for scheduled reports
 """
 
 import time
-import logging
-import threading
 import asyncio
+import logging
 from datetime import datetime
 
-logger = logging.getLogger(__name__)
+from muninn.monitors.snapshots import CollectorError
+from muninn.render import render_markdown, render_html
+from muninn.utils.config import env_float
 
-# Global variable to store report schedule configuration
-report_config = {
-    "enabled": False,
-    "interval": "hourly",  # "hourly" or "daily"
-    "chat_id": None,
-    "last_report_time": 0,
-    "report_thread": None,
-}
+logger = logging.getLogger(__name__)
 
-report_thread = None
-thread_stop_event = threading.Event()
+# Collectors that make up a full report
+REPORT_COLLECTORS = ("status", "load", "disk", "docker", "network")
+# Seconds a built report is shared by the scheduled deliveries that follow;
+# keep it above SCHEDULE_JITTER so jittered runs reuse the same snapshot
+REPORT_SNAPSHOT_TTL = env_float("REPORT_SNAPSHOT_TTL", 60.0)
 
-def get_full_report(monitors):
-    """Get a comprehensive server report."""
-    report = "📊 *FULL SERVER REPORT*\n\n"
-    
-    # Basic server status
-    report += monitors.get_status_info() + "\n\n"
-    
-    # Load information
-    report += monitors.get_load_info() + "\n\n"
+def get_full_report(results):
+    """Get a comprehensive server report from collected monitor results, as Markdown."""
+    parts = ["📊 *FULL SERVER REPORT*\n\n"]
     
-    # Disk usage
-    report += monitors.get_disk_info() + "\n\n"
+    # Basic server status, load information and disk usage
+    for name in ("status", "load", "disk"):
+        parts.append(render_markdown(results[name]) + "\n\n")
     
-    # Docker containers
-    docker_info = monitors.get_docker_info()
-    if "Error" not in docker_info and "No Docker" not in docker_info:
-        report += docker_info + "\n\n"
+    # Docker containers, when there are any
+    docker_info = results["docker"]
+    if not isinstance(docker_info, CollectorError) and docker_info.containers:
+        parts.append(render_markdown(docker_info) + "\n\n")
     
-    report += "\n\n⏰ Report generated at: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    parts.append("\n\n⏰ Report generated at: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     
-    return report
+    return "".join(parts)
+
+async def collect_full_report(monitors, refresh=False):
+    """Collect all report sections in parallel.
+
+    Returns the Markdown report and the HTML network section, or None for
+    the latter when network information could not be retrieved. With
+    ``refresh``, cached monitor results are not reused.
+    """
+    results = await monitors.collect_many(*REPORT_COLLECTORS, refresh=refresh)
+    return render_report(results)
+
+def render_report(results):
+    """Render collected report sections as the Markdown report and HTML network section."""
+    network_info = results["network"]
+    if isinstance(network_info, CollectorError):
+        network_info = None
+    else:
+        network_info = render_html(network_info)
+    return get_full_report(results), network_info
+
+class ReportBuilder:
+    """Build the full report once and share it between scheduled deliveries.
+
+    Callers arriving while a report is being collected wait for that same
+    collection, and a finished report is reused for ``ttl`` seconds, so any
+    number of subscribers due together cost one collection pass and one
+    rendering per format.
+    """
+
+    def __init__(self, monitors, ttl=REPORT_SNAPSHOT_TTL):
+        self.monitors = monitors
+        self.ttl = ttl
+        self.report = None
+        self.built = 0.0
+        self.building = None
+        self.builds = 0
 
-async def send_report(bot, chat_id, monitors):
-    """Send a report asynchronously to the specified chat."""
+    async def _build(self):
+        try:
+            report = await collect_full_report(self.monitors)
+            self.report = report
+            self.built = time.monotonic()
+            self.builds += 1
+            return report
+        finally:
+            self.building = None
+
+    async def get(self):
+        """Get the Markdown report and HTML network section."""
+        if self.report is not None and time.monotonic() - self.built < self.ttl:
+            return self.report
+        if self.building is None:
+            self.building = asyncio.ensure_future(self._build())
+        # Shielded so one cancelled caller does not cancel the others' build
+        return await asyncio.shield(self.building)
+
+async def send_report(reports, delivery, chat_id):
+    """Send the shared report to a chat through the delivery queue."""
     try:
+        report, network_info = await reports.get()
+        
         # Send main report with Markdown
-        report = get_full_report(monitors)
-        await bot.send_message(chat_id=chat_id, text=report, parse_mode="Markdown")
+        delivered = await delivery.send(chat_id, report, parse_mode="Markdown")
         
         # Send network info separately with HTML
-        network_info = monitors.get_network_info()
-        if "Error" not in network_info:
-            await bot.send_message(chat_id=chat_id, text=network_info, parse_mode="HTML")
-        
-        logger.info(f"Report sent to chat {chat_id}")
+        if network_info:
+            delivered = await delivery.send(chat_id, network_info, parse_mode="HTML") and delivered
         
-        # Update last report time
-        report_config["last_report_time"] = time.time()
+        if delivered:
+            logger.info(f"Report sent to chat {chat_id}")
     except Exception as e:
         logger.error(f"Error sending report: {e}")
-
-def report_thread_function(bot, monitors):
-    """Background thread for periodic reporting."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    while not thread_stop_event.is_set():
-        try:
-            # Check if reporting is enabled
-            if not report_config["enabled"] or not report_config["chat_id"]:
-                time.sleep(60)
-                continue
-            
-            current_time = time.time()
-            last_report_time = report_config["last_report_time"]
-            interval = report_config["interval"]
-            
-            # Determine the reporting interval in seconds
-            interval_seconds = 3600  # Default: hourly
-            if interval == "daily":
-                interval_seconds = 86400
-            
-            # Check if it's time to send a report
-            if current_time - last_report_time >= interval_seconds:
-                loop.run_until_complete(
-                    send_report(bot, report_config["chat_id"], monitors)
-                )
-            
-            # Sleep for 60 seconds before checking again
-            time.sleep(60)
-            
-        except Exception as e:
-            logger.error(f"Error in report thread: {e}")
-            time.sleep(60)
-    
-    logger.info("Report thread stopped")
-
-def restart_report_thread(bot, monitors):
-    """Start or restart the reporting thread."""
-    global report_thread, thread_stop_event
-    
-    # Stop existing thread if running
-    if report_thread and report_thread.is_alive():
-        thread_stop_event.set()
-        report_thread.join(timeout=5)
-        thread_stop_event.clear()
-    
-    # Start new thread
-    report_thread = threading.Thread(
-        target=report_thread_function,
-        args=(bot, monitors),
-        daemon=True
-    )
-    report_thread.start()
-    logger.info("Report thread started/restarted") 
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""
+Report scheduler running inside the bot's event loop
+"""
+
+import os
+import json
+import heapq
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from muninn.utils.config import DATA_DIR, env_float, parse_duration
+
+logger = logging.getLogger(__name__)
+
+# File the subscriptions are persisted to
+SCHEDULES_FILE = os.path.join(DATA_DIR, "schedules.json")
+# Maximum random delay in seconds added to every run, so jobs due at the
+# same time do not all fire at once
+SCHEDULE_JITTER = env_float("SCHEDULE_JITTER", 30.0)
+# Longest sleep between two checks, so wall-clock changes are noticed
+SCHEDULER_MAX_SLEEP = 300.0
+# Shortest accepted interval between two runs of a subscription
+SCHEDULE_MIN_INTERVAL = 60
+
+# Shorthands accepted in place of a schedule
+SCHEDULE_ALIASES = {
+    "hourly": "every 1h",
+    "daily": "every 24h",
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+def parse_cron_field(field, low, high):
+    """Parse one cron field such as '*/15', '1-5' or '0,30' into a set."""
+    values = set()
+    for part in field.split(","):
+        expr, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start, end = (int(x) for x in expr.split("-", 1))
+        else:
+            start = end = int(expr)
+            if step > 1:
+                end = high
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field: {field!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+# Longest length of each month, counting leap years
+MONTH_DAYS = {1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day month weekday), in local time."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("A cron schedule needs 5 fields: minute hour day month weekday")
+        self.expression = expression
+        self.minutes = parse_cron_field(fields[0], 0, 59)
+        self.hours = parse_cron_field(fields[1], 0, 23)
+        self.days = parse_cron_field(fields[2], 1, 31)
+        self.months = parse_cron_field(fields[3], 1, 12)
+        weekdays = parse_cron_field(fields[4], 0, 7)
+        # 0 and 7 are both Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+        # Refuse schedules such as '0 0 31 2 *' up front instead of searching for them
+        if (self.any_day or self.any_weekday) and not any(
+            min(self.days) <= MONTH_DAYS[month] for month in self.months
+        ):
+            raise ValueError(f"Cron schedule never fires: {expression!r}")
+
+    def day_matches(self, moment):
+        weekday = (moment.weekday() + 1) % 7
+        if self.any_day or self.any_weekday:
+            return moment.day in self.days and weekday in self.weekdays
+        # Like cron, a restricted day and weekday match either
+        return moment.day in self.days or weekday in self.weekdays
+
+    def next_after(self, timestamp):
+        """Get the first matching time after a timestamp."""
+        moment = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Jumping field by field needs at most a few thousand steps for any year
+        for _ in range(100000):
+            if moment.month not in self.months:
+                month = moment.month % 12 + 1
+                moment = moment.replace(
+                    year=moment.year + (month == 1), month=month, day=1, hour=0, minute=0
+                )
+            elif not self.day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ValueError(f"Cron schedule never fires: {self.expression!r}")
+
+    def describe(self):
+        return f"cron {self.expression}"
+
+class IntervalSchedule:
+    """Fixed interval between runs."""
+
+    def __init__(self, seconds):
+        if seconds < SCHEDULE_MIN_INTERVAL:
+            raise ValueError(f"The interval must be at least {SCHEDULE_MIN_INTERVAL}s")
+        self.seconds = seconds
+
+    def next_after(self, timestamp):
+        return timestamp + self.seconds
+
+    def describe(self):
+        return f"every {format_interval(self.seconds)}"
+
+def format_interval(seconds):
+    """Format an interval with its largest whole unit, e.g. 3600 -> '1h'."""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+def parse_schedule(spec):
+    """Parse 'every <duration>', a cron expression or an alias into a schedule."""
+    spec = " ".join(spec.split())
+    spec = SCHEDULE_ALIASES.get(spec.lower(), spec)
+    if spec.lower().startswith("every "):
+        return IntervalSchedule(parse_duration(spec[6:]))
+    if spec.lower().startswith("cron "):
+        spec = spec[5:]
+    return CronSchedule(spec)
+
+class Subscription:
+    """One scheduled report for one chat."""
+
+    __slots__ = ("id", "chat_id", "spec", "schedule", "due", "next_run", "last_run")
+
+    def __init__(self, id, chat_id, spec, due, next_run, last_run=None):
+        self.id = id
+        self.chat_id = chat_id
+        self.spec = spec
+        self.schedule = parse_schedule(spec)
+        # Nominal time of the next run, and the same with jitter added
+        self.due = due
+        self.next_run = next_run
+        self.last_run = last_run
+
+    def to_dict(self):
+        return {
+            "id": self.id, "chat_id": self.chat_id, "spec": self.spec,
+            "due": self.due, "next_run": self.next_run, "last_run": self.last_run,
+        }
+
+class Scheduler:
+    """Subscriptions kept in a heap of next-run times.
+
+    The scheduler task sleeps until the earliest run is due (or until a
+    subscription changes), hands due subscriptions to the callback as
+    separate tasks and reschedules them. Subscriptions are saved to a JSON
+    file after every change and reloaded on start; runs missed while the
+    bot was down fire once, shortly after the restart.
+    """
+
+    def __init__(self, path=SCHEDULES_FILE, jitter=SCHEDULE_JITTER):
+        self.path = path
+        self.jitter = jitter
+        self.subscriptions = {}
+        self.heap = []
+        self.next_id = 1
+        self.changed = None
+        self.task = None
+
+    def _jittered(self, due):
+        return due + random.uniform(0, self.jitter) if self.jitter > 0 else due
+
+    def _push(self, subscription):
+        heapq.heappush(self.heap, (subscription.next_run, subscription.id))
+        if self.changed is not None:
+            self.changed.set()
+
+    def load(self):
+        """Load the persisted subscriptions."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load schedules from {self.path}: {e}")
+            return
+
+        now = datetime.now().timestamp()
+        for item in data.get("subscriptions", []):
+            try:
+                subscription = Subscription(
+                    item["id"], item["chat_id"], item["spec"],
+                    item["due"], item["next_run"], item.get("last_run"),
+                )
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Ignoring invalid schedule {item!r}: {e}")
+                continue
+            if subscription.next_run < now:
+                # Missed while the bot was down: run once, then resume
+                subscription.due = now
+                subscription.next_run = self._jittered(now)
+            self.subscriptions[subscription.id] = subscription
+            self._push(subscription)
+        self.next_id = max([self.next_id, data.get("next_id", 1)] + [s + 1 for s in self.subscriptions])
+        logger.info(f"Loaded {len(self.subscriptions)} report schedules")
+
+    def save(self):
+        """Persist the subscriptions atomically."""
+        data = {
+            "next_id": self.next_id,
+            "subscriptions": [s.to_dict() for s in self.subscriptions.values()],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = self.path + ".tmp"
+            with open(temporary, "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.error(f"Could not save schedules to {self.path}: {e}")
+
+    def add(self, chat_id, spec):
+        """Add a subscription; raises ValueError for an invalid schedule."""
+        schedule = parse_schedule(spec)
+        due = schedule.next_after(datetime.now().timestamp())
+        subscription = Subscription(self.next_id, chat_id, spec, due, self._jittered(due))
+        self.next_id += 1
+        self.subscriptions[subscription.id] = subscription
+        self._push(subscription)
+        self.save()
+        return subscription
+
+    def remove(self, chat_id, subscription_id):
+        """Remove one subscription of a chat; returns whether it existed."""
+        subscription = self.subscriptions.get(subscription_id)
+        if subscription is None or subscription.chat_id != chat_id:
+            return False
+        # The heap entry is dropped lazily when it comes up
+        del self.subscriptions[subscription_id]
+        self.save()
+        return True
+
+    def clear(self, chat_id):
+        """Remove every subscription of a chat and return how many there were."""
+        ids = [s.id for s in self.subscriptions.values() if s.chat_id == chat_id]
+        for subscription_id in ids:
+            del self.subscriptions[subscription_id]
+        if ids:
+            self.save()
+        return len(ids)
+
+    def list(self, chat_id):
+        """Get the subscriptions of a chat, by next run."""
+        return sorted(
+            (s for s in self.subscriptions.values() if s.chat_id == chat_id),
+            key=lambda s: s.next_run,
+        )
+
+    def pop_due(self, now):
+        """Remove and reschedule the subscriptions due by ``now``."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            next_run, subscription_id = heapq.heappop(self.heap)
+            subscription = self.subscriptions.get(subscription_id)
+            if subscription is None or subscription.next_run != next_run:
+                # Removed or rescheduled since it was pushed
+                continue
+            subscription.last_run = now
+            subscription.due = subscription.schedule.next_after(max(subscription.due, now - self.jitter))
+            subscription.next_run = self._jittered(subscription.due)
+            heapq.heappush(self.heap, (subscription.next_run, subscription.id))
+            due.append(subscription)
+        if due:
+            self.save()
+        return due
+
+    async def run(self, callback):
+        """Call ``callback(subscription)`` whenever a subscription is due."""
+        self.changed = asyncio.Event()
+        while True:
+            now = datetime.now().timestamp()
+            for subscription in self.pop_due(now):
+                asyncio.create_task(self._fire(callback, subscription))
+            delay = self.heap[0][0] - now if self.heap else SCHEDULER_MAX_SLEEP
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), min(max(delay, 0), SCHEDULER_MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, callback, subscription):
+        try:
+            await callback(subscription)
+        except Exception as e:
+            logger.error(f"Error running schedule {subscription.id} for chat {subscription.chat_id}: {e}")
+
+    def start(self, callback):
+        """Load the subscriptions and start the scheduler task in the running loop."""
+        self.load()
+        self.task = asyncio.get_running_loop().create_task(self.run(callback))
+
+    async def stop(self):
+        """Stop the scheduler task."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
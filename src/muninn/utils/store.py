@@ -0,0 +1,270 @@
+"""
+Persistent metrics store with downsampled tiers
+"""
+
+import os
+import math
+import mmap
+import struct
+import logging
+import threading
+
+from muninn.utils.config import DATA_DIR, env_map, parse_duration
+
+logger = logging.getLogger(__name__)
+
+# Metrics kept in the store, in on-disk column order
+STORE_METRICS = ("cpu", "mem", "load", "disk_read", "disk_write", "net_sent", "net_recv")
+
+# Tiers as (name, bucket seconds, default retention)
+STORE_TIERS = (("1m", 60, "7d"), ("1h", 3600, "90d"), ("1d", 86400, "730d"))
+
+# Per-tier retention overrides, e.g. "1m=3d,1h=30d"
+STORE_RETENTION = env_map("STORE_RETENTION")
+
+# Maximum rows read to answer one query; longer ranges use a coarser tier
+STORE_MAX_POINTS = 1500
+
+MAGIC = b"MNNS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+HEADER_SIZE = 64
+# Bucket start, sample count, then (min, avg, max) for each metric
+ROW = struct.Struct("<IH" + "fff" * len(STORE_METRICS))
+
+NAN = float("nan")
+
+class Bucket:
+    """Running min/avg/max aggregate of one bucket."""
+
+    __slots__ = ("start", "count", "counts", "mins", "sums", "maxs")
+
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        size = len(STORE_METRICS)
+        # Samples per metric; a metric may be missing (NaN) from some samples
+        self.counts = [0] * size
+        self.mins = [math.inf] * size
+        self.sums = [0.0] * size
+        self.maxs = [-math.inf] * size
+
+    def add(self, mins, avgs, maxs, count=1, counts=None):
+        """Merge a sample (count=1) or an aggregated row into the bucket.
+
+        ``counts`` gives the samples behind each metric's average when they
+        differ from ``count``.
+        """
+        for i in range(len(STORE_METRICS)):
+            if math.isnan(avgs[i]):
+                continue
+            weight = counts[i] if counts is not None else count
+            self.mins[i] = min(self.mins[i], mins[i])
+            self.maxs[i] = max(self.maxs[i], maxs[i])
+            self.sums[i] += avgs[i] * weight
+            self.counts[i] += weight
+        self.count += count
+
+    def row(self):
+        """Pack the bucket into a fixed-width record."""
+        values = []
+        for i in range(len(STORE_METRICS)):
+            if not self.counts[i]:
+                values.extend((NAN, NAN, NAN))
+            else:
+                values.extend((self.mins[i], self.sums[i] / self.counts[i], self.maxs[i]))
+        return ROW.pack(self.start, min(self.count, 0xFFFF), *values)
+
+class TierFile:
+    """Memory-mapped ring of fixed-width rows for one downsampling tier.
+
+    The row for a bucket lives at slot ``(start // bucket) % capacity``, so
+    rows are written in time order and any time range maps directly to at
+    most two contiguous byte ranges. The file size is fixed by retention.
+    """
+
+    def __init__(self, path, bucket, capacity):
+        self.path = path
+        self.bucket = bucket
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * ROW.size
+
+        header = HEADER.pack(MAGIC, VERSION, len(STORE_METRICS), bucket, capacity)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                existing = f.read(HEADER.size)
+            if existing != header or os.path.getsize(path) != size:
+                logger.warning(f"Metrics file {path} has an incompatible layout, recreating it")
+                os.remove(path)
+
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+                f.truncate(size)
+
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def offset(self, start):
+        """Get the byte offset of the row for a bucket start."""
+        return HEADER_SIZE + (start // self.bucket) % self.capacity * ROW.size
+
+    def write(self, bucket):
+        """Write an aggregated bucket to its slot."""
+        offset = self.offset(bucket.start)
+        self.map[offset:offset + ROW.size] = bucket.row()
+
+    def read(self, start, end):
+        """Read the rows for buckets in [start, end], oldest first."""
+        first = start // self.bucket
+        last = end // self.bucket
+        if last - first >= self.capacity:
+            first = last - self.capacity + 1
+
+        rows = []
+        index = first
+        while index <= last:
+            slot = index % self.capacity
+            count = min(last - index + 1, self.capacity - slot)
+            offset = HEADER_SIZE + slot * ROW.size
+            chunk = self.map[offset:offset + count * ROW.size]
+            for expected, row in enumerate(ROW.iter_unpack(chunk), start=index):
+                # Skip empty slots and rows left over from a previous lap
+                if row[1] and row[0] == expected * self.bucket:
+                    rows.append(row)
+            index += count
+        return rows
+
+    def close(self):
+        """Flush and unmap the file."""
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+class MetricsStore:
+    """Downsampled on-disk history fed by the metric sampler.
+
+    Samples are aggregated into 1-minute buckets; each finished bucket is
+    written to its tier file and merged into the next coarser tier.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(DATA_DIR, "metrics")
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.previous = None
+
+        self.tiers = []
+        for name, bucket, retention in STORE_TIERS:
+            seconds = parse_duration(STORE_RETENTION.get(name, retention))
+            capacity = max(1, seconds // bucket)
+            path = os.path.join(self.directory, f"metrics-{name}.dat")
+            self.tiers.append((name, TierFile(path, bucket, capacity)))
+        self.pending = [None] * len(self.tiers)
+
+    def _values(self, timestamp, values):
+        """Derive the stored metrics from a raw sampler sample."""
+        counters = {
+            key: value for key, value in values.items()
+            if key in ("disk.read_bytes", "disk.write_bytes") or (
+                key.startswith("net.") and not key.startswith("net.lo.")
+                and key.endswith((".bytes_sent", ".bytes_recv"))
+            )
+        }
+        # Rate of each counter on its own, so an interface that appears,
+        # disappears or resets does not skew the totals
+        rates = {}
+        if self.previous is not None:
+            elapsed = timestamp - self.previous[0]
+            for key, current in counters.items():
+                before = self.previous[1].get(key)
+                if elapsed > 0 and before is not None and current >= before:
+                    rates[key] = (current - before) / elapsed
+        self.previous = (timestamp, counters)
+
+        def total(suffix):
+            matching = [rate for key, rate in rates.items() if key.startswith("net.") and key.endswith(suffix)]
+            return sum(matching) if matching else NAN
+
+        return [
+            values.get("cpu", NAN), values.get("mem.percent", NAN), values.get("load1", NAN),
+            rates.get("disk.read_bytes", NAN), rates.get("disk.write_bytes", NAN),
+            total(".bytes_sent"), total(".bytes_recv"),
+        ]
+
+    def _merge(self, level, start, mins, avgs, maxs, count, counts=None):
+        """Merge data into the pending bucket of a tier, flushing finished buckets."""
+        tier = self.tiers[level][1]
+        start -= start % tier.bucket
+        pending = self.pending[level]
+        if pending is not None and pending.start != start:
+            self._flush(level)
+            pending = None
+        if pending is None:
+            pending = self.pending[level] = Bucket(start)
+        pending.add(mins, avgs, maxs, count, counts)
+
+    def _flush(self, level):
+        """Write the pending bucket of a tier and roll it up into the next one."""
+        pending = self.pending[level]
+        if pending is None or pending.count == 0:
+            return
+        self.tiers[level][1].write(pending)
+        self.pending[level] = None
+        if level + 1 < len(self.tiers):
+            row = ROW.unpack(pending.row())
+            self._merge(level + 1, pending.start, row[2::3], row[3::3], row[4::3], pending.count, pending.counts)
+
+    def add(self, timestamp, values):
+        """Add a sampler sample (usable as a sampler listener)."""
+        with self.lock:
+            metrics = self._values(timestamp, values)
+            self._merge(0, int(timestamp), metrics, metrics, metrics, 1)
+
+    def resume(self, now):
+        """Rebuild the in-progress buckets of coarser tiers after a restart."""
+        with self.lock:
+            now = int(now)
+            for level in range(1, len(self.tiers)):
+                bucket = self.tiers[level][1].bucket
+                finer = self.tiers[level - 1][1].bucket
+                # The current finer bucket is still open and rolls up when it closes
+                open_start = now - now % finer
+                for row in self.tiers[level - 1][1].read(now - now % bucket, now):
+                    if row[0] < open_start:
+                        self._merge(level, row[0], row[2::3], row[3::3], row[4::3], row[1])
+
+    def choose_tier(self, seconds):
+        """Pick the finest tier level that covers a range within the point budget."""
+        for level, (_, tier) in enumerate(self.tiers):
+            if seconds <= tier.bucket * tier.capacity and seconds / tier.bucket <= STORE_MAX_POINTS:
+                return level
+        return len(self.tiers) - 1
+
+    def query(self, metric, start, end):
+        """Get (tier name, [(timestamp, min, avg, max), ...]) for a metric."""
+        column = STORE_METRICS.index(metric)
+        level = self.choose_tier(end - start)
+        name, tier = self.tiers[level]
+        with self.lock:
+            rows = tier.read(int(start), int(end))
+            # Include the bucket still being aggregated
+            pending = self.pending[level]
+            if pending is not None and pending.count and start <= pending.start <= end:
+                rows.append(ROW.unpack(pending.row()))
+        points = []
+        for row in rows:
+            low, avg, high = row[2 + 3 * column:5 + 3 * column]
+            if not math.isnan(avg):
+                points.append((row[0], low, avg, high))
+        return name, points
+
+    def close(self):
+        """Write pending buckets and close the tier files."""
+        with self.lock:
+            for level in range(len(self.tiers)):
+                pending = self.pending[level]
+                if pending is not None and pending.count:
+                    self.tiers[level][1].write(pending)
+            for _, tier in self.tiers:
+                tier.close()
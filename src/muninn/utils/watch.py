@@ -0,0 +1,241 @@
+"""
+Live dashboards: one message per watch, edited in place as the data changes
+"""
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter, TimedOut, NetworkError, Forbidden, BadRequest
+
+from muninn.render import render_markdown, render_html
+from muninn.utils.config import env_int, env_float
+from muninn.utils.delivery import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Views a watch can show, mapped to their collector
+WATCH_VIEWS = {"load": "load", "disk": "disk", "docker": "docker", "net": "network"}
+# Seconds between two refreshes unless the command asks otherwise
+WATCH_INTERVAL = env_int("WATCH_INTERVAL", 10)
+# Shortest refresh interval; keeps a watched message within Telegram's edit limits
+WATCH_MIN_INTERVAL = env_int("WATCH_MIN_INTERVAL", 5)
+# Seconds after which a watch stops on its own
+WATCH_DURATION = env_int("WATCH_DURATION", 900)
+# Watches running at the same time across all chats
+WATCH_MAX = env_int("WATCH_MAX", 50)
+# Message edits per second across all watches
+WATCH_EDIT_RATE = env_float("WATCH_EDIT_RATE", 10.0)
+
+def parse_mode(view):
+    """Get the parse mode a view is rendered in."""
+    # Network tables carry characters legacy Markdown cannot escape
+    return "HTML" if WATCH_VIEWS[view] == "network" else "Markdown"
+
+def watch_keyboard(view):
+    """Build the buttons switching between views and stopping the watch."""
+    views = [
+        InlineKeyboardButton(f"• {name} •" if name == view else name, callback_data=f"watch:{name}")
+        for name in WATCH_VIEWS
+    ]
+    return InlineKeyboardMarkup([views, [InlineKeyboardButton("⏹ Stop", callback_data="watch:stop")]])
+
+class Watch:
+    """One message refreshed in place."""
+
+    __slots__ = ("chat_id", "message_id", "view", "interval", "expires", "until", "text", "mode", "due")
+
+    def __init__(self, chat_id, message_id, view, interval, duration, text, mode):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.view = view
+        self.interval = interval
+        self.expires = time.monotonic() + duration
+        self.until = datetime.fromtimestamp(time.time() + duration).strftime("%H:%M")
+        # Text the message shows now, so unchanged data is never sent again
+        self.text = text
+        self.mode = mode
+        self.due = time.monotonic() + interval
+
+class Watcher:
+    """Refresh watched messages from one loop.
+
+    Every tick collects and renders each view at most once, however many
+    messages watch it, and edits only the messages whose text changed.
+    Edits go through a token bucket; ``RetryAfter`` pauses it for the time
+    Telegram asks. Each chat has at most one watch, so a new ``/watch``
+    replaces the previous one. ``stats`` counts renders, edits and skips.
+    """
+
+    def __init__(self, monitors, rate=WATCH_EDIT_RATE, max_watches=WATCH_MAX):
+        self.monitors = monitors
+        self.max_watches = max_watches
+        self.bucket = TokenBucket(rate, burst=1)
+        self.bot = None
+        self.watches = {}
+        self.wakeup = None
+        self.task = None
+        self.stats = {"renders": 0, "edits": 0, "unchanged": 0, "rate_limited": 0, "failed": 0}
+
+    def start(self, bot):
+        """Start the refresh loop in the running loop."""
+        self.bot = bot
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """Stop refreshing; watched messages keep their last content."""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def render(self, view):
+        """Collect and render a view, returning its text and parse mode."""
+        name = WATCH_VIEWS[view]
+        result = await self.monitors.collect(name)
+        self.stats["renders"] += 1
+        mode = parse_mode(view)
+        return (render_html(result) if mode == "HTML" else render_markdown(result)), mode
+
+    @staticmethod
+    def footer(watch):
+        return f"\n\n👁 Live, every {watch.interval}s until {watch.until}"
+
+    def get(self, chat_id, message_id):
+        """Get the watch of a message, or None."""
+        watch = self.watches.get(chat_id)
+        return watch if watch is not None and watch.message_id == message_id else None
+
+    async def add(self, chat_id, view, interval):
+        """Post a live message in a chat and start refreshing it.
+
+        Raises ValueError when too many chats are watching already.
+        """
+        previous = self.watches.get(chat_id)
+        if previous is None and len(self.watches) >= self.max_watches:
+            raise ValueError(f"Too many live messages ({self.max_watches}). Try again later.")
+        # Take the chat's slot before the first await, so a concurrent /watch
+        # in the same chat replaces this watch instead of racing it
+        watch = Watch(chat_id, None, view, interval, WATCH_DURATION, "", parse_mode(view))
+        self.watches[chat_id] = watch
+        try:
+            if previous is not None:
+                await self.remove(previous, "⏹ Replaced by a newer watch")
+            text, mode = await self.render(view)
+            message = await self.bot.send_message(
+                chat_id=chat_id, text=text + self.footer(watch), parse_mode=mode,
+                reply_markup=watch_keyboard(view),
+            )
+        except BaseException:
+            self._drop(watch)
+            raise
+        watch.message_id = message.message_id
+        watch.text = text
+        watch.mode = mode
+        if self.watches.get(chat_id) is not watch:
+            # A newer watch took over the chat while this message was being sent
+            await self._edit(watch, f"{text}\n\n⏹ Replaced by a newer watch", mode, None)
+            return watch
+        self.wakeup.set()
+        return watch
+
+    def switch(self, watch, view):
+        """Show another view on a watched message at once."""
+        watch.view = view
+        watch.due = 0.0
+        self.wakeup.set()
+
+    async def remove(self, watch, reason):
+        """Stop a watch, leaving its last content and a note in the message."""
+        self._drop(watch)
+        if watch.message_id is None:
+            # Still being sent; add() closes the message once it has been posted
+            return
+        await self._edit(watch, f"{watch.text}\n\n{reason}", watch.mode, None)
+
+    def _drop(self, watch):
+        if self.watches.get(watch.chat_id) is watch:
+            del self.watches[watch.chat_id]
+
+    async def run(self):
+        """Refresh due watches until cancelled."""
+        while True:
+            try:
+                await self.tick(time.monotonic())
+            except Exception as e:
+                logger.error(f"Error refreshing live messages: {e}")
+            self.wakeup.clear()
+            now = time.monotonic()
+            due = min((watch.due for watch in self.watches.values()), default=now + 60)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(due - now, 0.1))
+            except asyncio.TimeoutError:
+                pass
+
+    async def tick(self, now):
+        """Refresh every due watch, rendering each view once."""
+        # Watches whose message is still being sent are skipped
+        due = [
+            watch for watch in self.watches.values() if watch.due <= now and watch.message_id is not None
+        ]
+        if not due:
+            return
+        expired = [watch for watch in due if watch.expires <= now]
+        views = {}
+        for watch in due:
+            if watch.expires > now:
+                views.setdefault(watch.view, []).append(watch)
+        renders = await asyncio.gather(*(self.render(view) for view in views))
+        edits = [self.remove(watch, "⏹ Watch ended") for watch in expired]
+        for (text, mode), watches in zip(renders, views.values()):
+            for watch in watches:
+                watch.due = now + watch.interval
+                if text == watch.text:
+                    self.stats["unchanged"] += 1
+                else:
+                    edits.append(self.refresh(watch, text, mode))
+        await asyncio.gather(*edits)
+
+    async def refresh(self, watch, text, mode):
+        if await self._edit(watch, text + self.footer(watch), mode, watch_keyboard(watch.view)):
+            watch.text = text
+            watch.mode = mode
+
+    async def _edit(self, watch, text, mode, keyboard):
+        """Edit a watched message, returning whether it shows the text now."""
+        await self.bucket.acquire()
+        try:
+            await self.bot.edit_message_text(
+                text, chat_id=watch.chat_id, message_id=watch.message_id,
+                parse_mode=mode, reply_markup=keyboard,
+            )
+            self.stats["edits"] += 1
+            return True
+        except RetryAfter as e:
+            retry_after = float(e.retry_after)
+            self.stats["rate_limited"] += 1
+            self.bucket.pause(retry_after)
+            # Edits already waiting on the bucket wait out the pause; also hold
+            # back the next ticks so no view is collected for edits that would wait
+            resume = time.monotonic() + retry_after
+            for other in list(self.watches.values()) + [watch]:
+                other.due = max(other.due, resume)
+            logger.warning(f"Flood limit hit editing live messages; pausing for {retry_after:g}s")
+        except (BadRequest, Forbidden) as e:
+            if "not modified" in str(e).lower():
+                return True
+            # The message was deleted, can no longer be edited or the bot was removed
+            self.stats["failed"] += 1
+            logger.warning(f"Stopping live message in chat {watch.chat_id}: {e}")
+            self._drop(watch)
+        except (TimedOut, NetworkError) as e:
+            # Tried again on the next tick
+            self.stats["failed"] += 1
+            logger.warning(f"Error editing live message in chat {watch.chat_id}: {e}")
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Error editing live message in chat {watch.chat_id}: {e}")
+        return False
@@ -0,0 +1,184 @@
+"""
+Webhook mode: receive updates on a local HTTP listener instead of long polling
+"""
+
+import os
+import hmac
+import json
+import signal
+import asyncio
+import logging
+import secrets
+from urllib.parse import urlsplit
+
+from telegram import Update
+
+from muninn.utils.config import env_int
+from muninn.utils.http import HTTPError, read_request, write_response
+
+logger = logging.getLogger(__name__)
+
+# Public HTTPS URL Telegram posts updates to; polling is used when unset
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Address and port of the local listener, usually behind a TLS reverse proxy
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = env_int("WEBHOOK_PORT", 8443)
+# Path updates are accepted on; defaults to the path of WEBHOOK_URL
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "")
+# Secret Telegram sends with every update; a random one is used when unset
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Certificate and key to serve HTTPS directly instead of behind a proxy
+WEBHOOK_CERT = os.getenv("WEBHOOK_CERT", "")
+WEBHOOK_KEY = os.getenv("WEBHOOK_KEY", "")
+# Concurrent connections Telegram opens to deliver updates
+WEBHOOK_MAX_CONNECTIONS = env_int("WEBHOOK_MAX_CONNECTIONS", 40)
+# Largest accepted update
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+class WebhookUnavailable(Exception):
+    """The webhook could not be set up; the bot should poll instead."""
+
+class WebhookServer:
+    """Accept updates posted by Telegram and hand them to the application.
+
+    Requests must carry the secret token Telegram was given when the
+    webhook was registered. Updates are queued and acknowledged at once;
+    the application processes them concurrently, so a slow command never
+    holds up Telegram's delivery of the next update.
+    """
+
+    def __init__(self, application, url=WEBHOOK_URL, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT,
+                 path=WEBHOOK_PATH, secret=WEBHOOK_SECRET, cert=WEBHOOK_CERT, key=WEBHOOK_KEY):
+        self.application = application
+        self.url = url
+        self.listen = listen
+        self.port = port
+        self.path = path or urlsplit(url).path or "/"
+        # Telegram accepts 1-256 characters of A-Z, a-z, 0-9, _ and -
+        self.secret = secret or secrets.token_urlsafe(32)
+        self.cert = cert
+        self.key = key
+        self.server = None
+        self.stats = {"updates": 0, "rejected": 0, "invalid": 0}
+
+    def _ssl_context(self):
+        if not self.cert:
+            return None
+        import ssl
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(self.cert, self.key or None)
+        return context
+
+    async def start(self):
+        """Start listening and register the webhook with Telegram.
+
+        Raises WebhookUnavailable when either fails.
+        """
+        try:
+            self.server = await asyncio.start_server(
+                self._handle, self.listen, self.port, ssl=self._ssl_context()
+            )
+        except (OSError, ValueError) as e:
+            raise WebhookUnavailable(f"cannot listen on {self.listen}:{self.port}: {e}") from e
+        try:
+            await self.application.bot.set_webhook(
+                self.url, secret_token=self.secret, allowed_updates=Update.ALL_TYPES,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+        except Exception as e:
+            await self.stop()
+            raise WebhookUnavailable(f"cannot register {self.url}: {e}") from e
+        logger.info(f"Receiving updates at {self.url} (listening on {self.listen}:{self.port}{self.path})")
+
+    async def stop(self):
+        """Stop listening."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, WEBHOOK_MAX_BODY)
+                    if request is None:
+                        break
+                    status = await self._process(request)
+                except HTTPError as e:
+                    await write_response(writer, e.status, f"{e.message}\n")
+                    break
+                await write_response(writer, status, keep_alive=request.keep_alive())
+                if not request.keep_alive():
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Error receiving update: {e}")
+        finally:
+            writer.close()
+
+    async def _process(self, request):
+        if request.path != self.path:
+            return "404 Not Found"
+        if request.method != "POST":
+            return "405 Method Not Allowed"
+        token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self.stats["rejected"] += 1
+            logger.warning("Rejected a webhook request with a wrong secret token")
+            return "403 Forbidden"
+        try:
+            update = Update.de_json(json.loads(request.body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            self.stats["invalid"] += 1
+            logger.warning(f"Ignoring an invalid update: {e}")
+            return "400 Bad Request"
+        if update is None:
+            return "400 Bad Request"
+        await self.application.update_queue.put(update)
+        self.stats["updates"] += 1
+        return "200 OK"
+
+async def run_application(application, server=None):
+    """Run the application until SIGINT or SIGTERM, on a webhook or by polling.
+
+    Mirrors ``Application.run_polling()`` on one event loop: post_init runs
+    after initialize(), post_stop and post_shutdown on the way out. With a
+    WebhookServer, updates arrive on the webhook; when it cannot be set up,
+    or without one, the updater long-polls instead.
+    """
+    await application.initialize()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    try:
+        if application.post_init is not None:
+            await application.post_init(application)
+        if server is not None:
+            try:
+                await server.start()
+            except WebhookUnavailable as e:
+                logger.error(f"Webhook unavailable, falling back to polling: {e}")
+                server = None
+        if server is None:
+            await application.updater.start_polling()
+        await application.start()
+        await stop.wait()
+    finally:
+        if server is not None:
+            await server.stop()
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop is not None:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown is not None:
+            await application.post_shutdown(application)